@@ -1,25 +1,298 @@
-from flask import Flask, render_template, request, jsonify
-import pyodbc
+import hashlib
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+from itertools import chain
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
 from sql_adapter import SQLAdapter
-from config import DATABASES
-
-# Direct drivers for comparison
-try:
-    import cx_Oracle as oracle_driver
-    import pymysql as mysql_driver
-    import psycopg2 as postgres_driver
-    DIRECT_DRIVERS_AVAILABLE = True
-except ImportError:
-    DIRECT_DRIVERS_AVAILABLE = False
+from config import (DATABASES, POOL_SETTINGS, WARMUP_SETTINGS, FANOUT_SETTINGS, BATCH_DASHBOARD_MAX_STUDENTS,
+                    BORROW_BATCH_MAX_BOOKS, BULK_IMPORT_SETTINGS, STREAMING_SETTINGS, CACHE_SETTINGS,
+                    DIRECT_DATABASES, METRICS_SETTINGS, ELIGIBILITY_SETTINGS, GRADUATION_REQUIRED_CREDITS,
+                    FEDERATED_SETTINGS, SEARCH_INDEX_SETTINGS, BREAKER_SETTINGS, HEALTH_SETTINGS,
+                    LAST_KNOWN_GOOD_SETTINGS, CONDITIONAL_SETTINGS, COMPRESSION_SETTINGS,
+                    OVERDUE_SETTINGS, CATALOG_INDEX_SETTINGS, BACKEND, EMBEDDED_SETTINGS)
+from db_pool import PoolManager, PoolTimeoutError, PoolWarmer
+from drivers import LazyModule
+from embedded_db import EmbeddedBackend
+import embedded_db
+from fanout import FanOut
+from federated import FederatedQuery, Federation, Source
+from bulk_import import ENTITIES, BulkImporter, insert_rows, read_records
+from catalog_index import BookCatalog
+from result_cache import LastKnownGood, ResultCache, Stale
+from compression import ResponseCompressor
+from cohort_report import REPORT_COLUMNS, CohortReport
+from health import CircuitBreaker, CircuitOpen, HealthMonitor
+from eligibility import EligibilityRecord, EligibilityStore, SourceUnavailable
+from metrics import InstrumentedConnection, MetricsRegistry, QueryMetrics
+from overdue import OverdueScanner
+from search_index import StudentSearch
+from streaming import csv_stream, decode_cursor, encode_cursor, iter_rows, json_array_stream, ndjson_stream
+import fast_json
+
+# Drivers are imported on first use: ODBC by the pool warm-up, the direct ones for comparison
+pyodbc = LazyModule('pyodbc')
+oracle_driver = LazyModule('cx_Oracle')
+mysql_driver = LazyModule('pymysql')
+postgres_driver = LazyModule('psycopg2')
+# The embedded backend stands in for the direct drivers too
+DIRECT_DRIVERS_AVAILABLE = BACKEND == 'embedded' or all(
+    driver.installed() for driver in (oracle_driver, mysql_driver, postgres_driver))
+if not DIRECT_DRIVERS_AVAILABLE:
     print("Direct drivers not available - install cx-Oracle, pymysql, psycopg2")
 
 app = Flask(__name__)
 adapter = SQLAdapter()
 
+def odbc_connect(db_config):
+    conn_str = f'DSN={db_config["dsn"]}'
+    return pyodbc.connect(conn_str)
+
+if BACKEND == 'embedded':
+    # SQLite files in place of the DSNs, for profiling without the databases
+    embedded_backend = EmbeddedBackend(**EMBEDDED_SETTINGS)
+    database_driver, connect_database = embedded_db, embedded_backend.connect
+else:
+    database_driver, connect_database = pyodbc, odbc_connect
+
+pools = PoolManager(DATABASES, POOL_SETTINGS, connect_database, adapter.get_validation_query)
+warmup = PoolWarmer(pools, **WARMUP_SETTINGS)
+breakers = {name: CircuitBreaker(name, **dict(BREAKER_SETTINGS, **db_config.get('breaker', {})))
+            for name, db_config in DATABASES.items()}
+
+def probe_database(db_name):
+    pool = pools.get(db_name)
+    # Idle connections a checkout never reaches expire here
+    pool.prune()
+    pool.fill()
+    try:
+        pool.ping()
+    except PoolTimeoutError:
+        # Every connection is busy, which a hung database looks like too: no result
+        return False
+
+health_monitor = HealthMonitor(probe_database, breakers, **HEALTH_SETTINGS)
+last_known_good = LastKnownGood(**LAST_KNOWN_GOOD_SETTINGS)
+compressor = ResponseCompressor(**COMPRESSION_SETTINGS)
+# ETags are only comparable within one process: its write counters start at 0
+PROCESS_TOKEN = uuid.uuid4().hex
+fanout = FanOut(**FANOUT_SETTINGS)
+result_cache = ResultCache(**CACHE_SETTINGS)
+metrics = MetricsRegistry(**METRICS_SETTINGS)
+query_metrics = QueryMetrics(metrics)
+eligibility = EligibilityStore(lambda student_ids: load_eligibility_batch(student_ids), **ELIGIBILITY_SETTINGS)
+student_search = StudentSearch(lambda db_name, after_id: load_student_names(db_name, after_id),
+                               **SEARCH_INDEX_SETTINGS)
+book_catalog = BookCatalog(lambda after_id: load_books(after_id), **CATALOG_INDEX_SETTINGS)
+overdue_scanner = OverdueScanner(lambda since, until, after, limit: scan_overdue_loans(since, until, after, limit),
+                                 **OVERDUE_SETTINGS)
+request_latency = metrics.histogram('portal_http_request_seconds', 'Request latency per route',
+                                    ['route', 'method', 'status'])
+
+@contextmanager
 def get_connection(db_name):
+    """Borrow a pooled connection: `with get_connection(db_name) as (conn, db_type):`
+
+    Raises CircuitOpen at once while the database's breaker is open; failures
+    to connect and lost connections count towards opening it. Only a block
+    that ran against the database (it completed, or the database rejected a
+    statement) counts as a success: an idle pooled connection proves nothing.
+    """
     db_config = DATABASES[db_name]
-    conn_str = f'DSN={db_config["dsn"]}'
-    return pyodbc.connect(conn_str), db_config['type']
+    breaker = breakers[db_name]
+    health_monitor.start()
+    breaker.before_call()
+    pool = pools.get(db_name)
+    start = time.perf_counter()
+    try:
+        pooled = pool.acquire()
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        breaker.record_failure(e)
+        raise
+    try:
+        conn = pooled
+        if metrics.enabled:
+            query_metrics.acquire.observe(time.perf_counter() - start, backend=db_name)
+            conn = InstrumentedConnection(conn, query_metrics, db_name)
+        yield conn, db_config['type']
+        breaker.record_success()
+    except database_driver.OperationalError as e:
+        breaker.record_failure(e)
+        raise
+    except database_driver.Error:
+        # The database answered, with an error about the statement
+        breaker.record_success()
+        raise
+    finally:
+        # release() rolls back, and drops the connection if that fails
+        pool.release(pooled)
+
+def remembered(key, fetch):
+    """fetch() recorded as the last known good answer; that answer, as Stale, while the breaker is open"""
+    def task():
+        try:
+            value = fetch()
+        except CircuitOpen:
+            found, value, stored_at = last_known_good.get(key)
+            if not found:
+                raise
+            return Stale(value, stored_at)
+        last_known_good.put(key, value)
+        return value
+    return task
+
+def cached_query(db_name, template, params, load):
+    """Read-through cache lookup keyed by SQLAdapter template and parameters"""
+    key = (template, db_name, tuple(params))
+    return result_cache.get_or_load(key, adapter.tables(template), load, template)
+
+def invalidate(*templates):
+    """Drop cached results reading a table written by these statements (call after commit)"""
+    result_cache.invalidate_tables(*{table for name in templates for table in adapter.tables(name)})
+
+def listing_etag(template):
+    """Weak ETag of the current request: write counters of the template's tables, path and query string"""
+    versions = result_cache.generations(adapter.tables(template))
+    # Writes made by other processes do not bump these counters: roll every max_age seconds
+    window = int(time.time() // CONDITIONAL_SETTINGS['max_age'])
+    raw = f"{PROCESS_TOKEN}:{os.getpid()}:{window}:{versions}:{request.path}?{request.query_string.decode()}"
+    return hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+
+def listing_response(db_name, collection, build_query, to_item, key_of,
+                     default_limit=None, meta=None, timed=False, include_query=False, cache_template=None,
+                     etag_template=None):
+    """Full, keyset-paginated or streamed response for a listing route.
+
+    ?limit=N[&cursor=TOKEN] returns one page and the next_cursor to pass on,
+    ?offset=N skips N rows (both done by the database);
+    ?stream=json|ndjson sends rows as they are fetched instead of building a list;
+    ?format=columnar sends the column names once and each row as an array of
+    raw values (fast_json: ISO dates, decimals as strings) instead of to_item dicts.
+    build_query(db_type, after, limit, offset) returns (query, params);
+    key_of(row, columns) returns the sort key the cursor resumes from.
+    Non-streamed pages are cached under cache_template when it is given, and
+    carry an ETag versioned by the tables of etag_template: If-None-Match with
+    that ETag gets a 304 without a query.
+    """
+    start_time = time.time()
+    meta = meta or {}
+    stream = request.args.get('stream')
+    if stream not in (None, 'json', 'ndjson'):
+        return jsonify(dict(meta, status='error', message='stream must be json or ndjson'))
+    columnar = request.args.get('format') == 'columnar'
+    if request.args.get('format') not in (None, 'columnar'):
+        return jsonify(dict(meta, status='error', message='format must be columnar'))
+    try:
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify(dict(meta, status='error', message=str(e)))
+    raw_limit = request.args.get('limit', default_limit)
+    try:
+        limit = int(raw_limit) if raw_limit else None
+    except ValueError:
+        return jsonify(dict(meta, status='error', message='limit must be an integer'))
+    if limit is not None:
+        limit = max(1, min(limit, STREAMING_SETTINGS['max_page_size']))
+    offset = request.args.get('offset', type=int)
+    if offset is not None and offset < 0:
+        return jsonify(dict(meta, status='error', message='offset must be a non-negative integer'))
+    etag = None
+    if etag_template and stream is None and CONDITIONAL_SETTINGS['enabled']:
+        etag = listing_etag(etag_template)
+        if request.if_none_match.contains_weak(etag):
+            not_modified = Response(status=304)
+            not_modified.set_etag(etag, weak=True)
+            return not_modified
+    state = {'next_cursor': None, 'error': None}
+
+    def rows():
+        # The pooled connection is held until the last row has been sent
+        with get_connection(db_name) as (conn, db_type):
+            query, params = build_query(db_type, after, limit + 1 if limit else None, offset)
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            yield query, [column.lower() for column in columns]
+            last = None
+            try:
+                for count, row in enumerate(iter_rows(cursor, STREAMING_SETTINGS['fetch_size'])):
+                    if limit and count == limit:
+                        state['next_cursor'] = encode_cursor(key_of(last, columns))
+                        break
+                    last = row
+                    yield list(row) if columnar else to_item(row, columns)
+            except Exception as e:
+                state['error'] = str(e)
+
+    def tail():
+        extra = {}
+        if limit:
+            extra['next_cursor'] = state['next_cursor']
+        if timed:
+            extra['execution_time'] = round((time.time() - start_time) * 1000, 2)
+        if state['error']:
+            extra['status'] = 'error'
+            extra['message'] = state['error']
+        return extra
+
+    def load_page():
+        source = rows()
+        query, columns = next(source)
+        items = list(source)
+        if state['error']:
+            raise Exception(state['error'])
+        return query, columns, items, state['next_cursor']
+
+    source = None
+    try:
+        if stream is None and cache_template:
+            query, columns, items, state['next_cursor'] = cached_query(
+                db_name, cache_template, [after, limit, offset, columnar], load_page)
+        else:
+            source = rows()
+            query, columns = next(source)
+    except Exception as e:
+        error = dict(meta, status='error', message=str(e))
+        if timed:
+            error['execution_time'] = round((time.time() - start_time) * 1000, 2)
+        return jsonify(error)
+
+    head = dict(meta, status='success')
+    if include_query:
+        head['query'] = query
+    dumps = app.json.dumps
+    if columnar:
+        head['columns'] = columns
+        dumps = fast_json.dumps
+    if stream == 'ndjson':
+        if columnar:
+            # First line: {"columns": [...]}, then one array per row
+            source = chain([{'columns': columns}], source)
+        return Response(stream_with_context(ndjson_stream(source, dumps, tail)),
+                        mimetype='application/x-ndjson')
+    if stream == 'json':
+        return Response(stream_with_context(json_array_stream(source, collection, dumps, head, tail)),
+                        mimetype='application/json')
+
+    if source is not None:
+        items = list(source)
+    if columnar:
+        response = Response(fast_json.dumps_bytes(dict(head, **{collection: items}, **tail())),
+                            mimetype='application/json')
+    else:
+        response = jsonify(dict(head, **{collection: items}, **tail()))
+    if etag and not state['error']:
+        response.set_etag(etag, weak=True)
+        # Revalidate every time: the 304 costs no query
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @app.route('/')
 def index():
@@ -27,175 +300,320 @@ def index():
 
 @app.route('/connect/<db_name>')
 def connect_db(db_name):
+    """Connection test, with the breaker state and last health probe of the database"""
     try:
-        conn, db_type = get_connection(db_name)
-        conn.close()
-        return jsonify({'status': 'success', 'message': f'Connected to {db_name.upper()}'})
+        with get_connection(db_name) as (conn, db_type):
+            pass
+        result = {'status': 'success', 'message': f'Connected to {db_name.upper()}'}
     except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)})
+        result = {'status': 'error', 'message': str(e)}
+    if db_name in breakers:
+        result['health'] = health_monitor.status(db_name)
+    return jsonify(result)
+
+@app.route('/ready')
+def ready():
+    """200 once every pool is warmed up, 503 before (for load balancer readiness probes)"""
+    if draining.is_set():
+        return jsonify({'status': 'draining', 'ready': False}), 503
+    status = warmup.status()
+    return jsonify(dict(status, status='ready' if status['ready'] else 'warming')), 200 if status['ready'] else 503
+
+@app.route('/pool/stats')
+def pool_stats():
+    """Connection pool counters for every database used so far"""
+    return jsonify({'status': 'success', 'pools': pools.stats()})
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Result cache hit/miss rates, size and evictions"""
+    return jsonify({'status': 'success', 'cache': result_cache.stats(), 'last_known_good': last_known_good.stats(),
+                    'compression': compressor.stats()})
+
+# Set once this process starts shutting down: /ready answers 503 while requests drain
+draining = threading.Event()
+worker_pid = None
+
+def start_worker():
+    """Start this process's background work: pool warm-up, health probes, search indexes, overdue scans.
+
+    Nothing connects to a database or starts a thread at import, so a server
+    that imports app.py before forking (gunicorn preload_app) hands clean
+    workers over; each serving process calls this once it runs (gunicorn
+    post_worker_init, the ASGI lifespan, `python app.py`, or its first request).
+    """
+    global worker_pid
+    worker_pid = os.getpid()
+    draining.clear()
+    warmup.start()
+    health_monitor.start()
+    student_search.start()
+    book_catalog.start()
+    overdue_scanner.start()
+
+def stop_worker():
+    """Once this process has served its last request: close its pooled connections"""
+    draining.set()
+    pools.close_all()
+
+@app.before_request
+def start_request_timer():
+    if worker_pid != os.getpid():
+        start_worker()
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    if not metrics.enabled or 'request_start' not in g:
+        return response
+    start = g.request_start
+    labels = {
+        'route': request.url_rule.rule if request.url_rule else 'unmatched',
+        'method': request.method,
+        'status': str(response.status_code)
+    }
+    # Observed when the server closes the response, so streamed bodies are timed to the last chunk
+    response.call_on_close(lambda: request_latency.observe(time.perf_counter() - start, **labels))
+    return response
+
+def collect_pool_and_cache_metrics():
+    """Pool and cache values read at scrape time, as (name, type, description, samples)"""
+    pool_stats = pools.stats()
+    yield ('portal_pool_connections', 'gauge', 'Pooled connections by state',
+           [({'backend': name, 'state': state}, stats[state])
+            for name, stats in pool_stats.items() for state in ('in_use', 'idle')])
+    for counter in ('waits', 'timeouts', 'created', 'recycled'):
+        yield (f'portal_pool_{counter}_total', 'counter', f'Pool {counter} since start',
+               [({'backend': name}, stats[counter]) for name, stats in pool_stats.items()])
+    cache_stats = result_cache.stats()
+    yield ('portal_cache_lookups_total', 'counter', 'Result cache lookups by outcome',
+           [({'result': 'hit'}, cache_stats['hits']), ({'result': 'miss'}, cache_stats['misses'])])
+    yield ('portal_cache_bytes', 'gauge', 'Estimated size of the result cache', [({}, cache_stats['bytes'])])
+    breaker_states = {name: breaker.snapshot() for name, breaker in breakers.items()}
+    yield ('portal_breaker_state', 'gauge', 'Circuit breaker per database: 0 closed, 1 half-open, 2 open',
+           [({'backend': name}, {'closed': 0, 'half_open': 1, 'open': 2}[state['state']])
+            for name, state in breaker_states.items()])
+    yield ('portal_breaker_rejected_total', 'counter', 'Calls failed fast by an open breaker',
+           [({'backend': name}, state['rejected']) for name, state in breaker_states.items()])
+    search_stats = student_search.stats()
+    yield ('portal_search_index_students', 'gauge', 'Students in the /student/search index',
+           [({'backend': name}, count) for name, count in search_stats['indexes'].items()])
+    yield ('portal_search_lookups_total', 'counter', 'Student searches by source',
+           [({'source': 'index'}, search_stats['searches']), ({'source': 'database'}, search_stats['fallbacks'])])
+    catalog = book_catalog.stats()['index'] or {'books': 0, 'available': 0}
+    yield ('portal_catalog_books', 'gauge', 'Books in the /books/search index by availability',
+           [({'disponible': 'true'}, catalog['available']),
+            ({'disponible': 'false'}, catalog['books'] - catalog['available'])])
+    overdue_stats = overdue_scanner.stats()
+    yield ('portal_overdue_loans', 'gauge', 'Overdue loans found by the background scan',
+           [({}, overdue_stats['overdue'])])
+    yield ('portal_overdue_scans_total', 'counter', 'Overdue scans since start', [({}, overdue_stats['runs'])])
+    last_run = overdue_stats['last_run'] or {}
+    yield ('portal_overdue_last_scan_seconds', 'gauge', 'Duration of the last overdue scan',
+           [({}, (last_run.get('duration_ms') or 0) / 1000)])
+    yield ('portal_overdue_last_scan_rows', 'gauge', 'Loans read by the last overdue scan',
+           [({}, last_run.get('rows_scanned', 0))])
+
+metrics.add_collector(collect_pool_and_cache_metrics)
+
+@app.after_request
+def compress_response(response):
+    """gzip or brotli for large JSON and text bodies, per Accept-Encoding (COMPRESSION_SETTINGS)"""
+    if (not compressor.enabled or response.status_code != 200 or response.is_streamed
+            or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or not (response.is_json or response.mimetype.startswith('text/'))):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = compressor.choose(request.accept_encodings)
+    if encoding is None:
+        return response
+    body = compressor.compress(response.get_data(), encoding)
+    if body is not None:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Latency histograms per route, backend and SQLAdapter template, in Prometheus text format"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/stats/statements')
+def statement_stats():
+    """Executions and prepared-plan hits per SQLAdapter template"""
+    return jsonify({'status': 'success', 'statements': adapter.statement_stats()})
 
 @app.route('/query/<db_name>')
 def query_db(db_name):
-    try:
-        conn, db_type = get_connection(db_name)
-        cursor = conn.cursor()
-
-        # Example query: Get first 10 students
-        base_query = "SELECT * FROM etudiants"
-        limit_clause = adapter.get_limit_clause(db_type, 10)
-        query = f"{base_query} {limit_clause}"
-
-        cursor.execute(query)
-        columns = [column[0] for column in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-        conn.close()
-        return jsonify({'status': 'success', 'data': results, 'query': query})
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)})
-
-@app.route('/student/enrollment/<db_name>')
-def check_student_enrollment(db_name):
-    import time
+    # Example query: students, 10 per page by default
+    if db_name not in DATABASES:
+        return jsonify({'status': 'error', 'message': f'Unknown database: {db_name}'})
+    return listing_response(
+        db_name, 'data',
+        adapter.get_students_page_query,
+        lambda row, columns: dict(zip(columns, row)),
+        lambda row, columns: (row[[c.lower() for c in columns].index('id_etudiant')],),
+        default_limit=10, include_query=True
+    )
+
+def student_enrollment_payload(db_name, student_id):
+    """Response body of /student/enrollment, shared by the Flask and ASGI routes"""
     start_time = time.time()
-
-    student_id = request.args.get('id')
-    if not student_id:
-        return jsonify({'status': 'error', 'message': 'Student ID required'})
-
     try:
-        conn, db_type = get_connection(db_name)
-        cursor = conn.cursor()
+        with get_connection(db_name) as (conn, db_type):
+            query = adapter.statement('student_enrollment', db_type).sql
+            cursor = adapter.execute(conn, 'student_enrollment', db_type, [student_id])
+            columns = [column[0] for column in cursor.description]
+            results = [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-        query = adapter.get_student_enrollment_query(db_type, student_id)
-        cursor.execute(query)
-        columns = [column[0] for column in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-        conn.close()
         execution_time = round((time.time() - start_time) * 1000, 2)  # ms
 
         enrolled = len(results) > 0
-        return jsonify({
+        return {
             'status': 'success',
             'method': 'odbc',
             'enrolled': enrolled,
             'data': results[0] if results else None,
             'query': query,
             'execution_time': execution_time
-        })
+        }
     except Exception as e:
         execution_time = round((time.time() - start_time) * 1000, 2)
-        return jsonify({
+        return {
             'status': 'error',
             'method': 'odbc',
             'message': str(e),
             'execution_time': execution_time
-        })
+        }
 
-@app.route('/direct/enrollment/<int:student_id>')
-def check_enrollment_direct_demo(student_id):
-    """Simulated direct driver approach for demonstration"""
-    import time
-    start_time = time.time()
+def student_details_payload(db_name, student_id):
+    def load():
+        with get_connection(db_name) as (conn, db_type):
+            cursor = adapter.execute(conn, 'student_details', db_type, [student_id])
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    try:
+        query = adapter.statement('student_details', DATABASES[db_name]['type']).sql
+        results = cached_query(db_name, 'student_details', [student_id], load)
 
-    # Simulate the complexity of direct drivers
-    # In a real implementation, this would use cx_Oracle, pymysql, psycopg2
-    time.sleep(0.15)  # Simulate connection overhead
+        return {
+            'status': 'success',
+            'data': results[0] if results else None,
+            'query': query
+        }
+    except Exception as e:
+        return {'status': 'error', 'message': str(e)}
 
-    # Simulate query execution with different syntax handling
-    time.sleep(0.08)  # Simulate query execution
+def student_grades_payload(db_name, student_id):
+    try:
+        with get_connection(db_name) as (conn, db_type):
+            query = adapter.statement('student_grades', db_type).sql
+            cursor = adapter.execute(conn, 'student_grades', db_type, [student_id])
+            columns = [column[0] for column in cursor.description]
+            results = [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-    execution_time = round((time.time() - start_time) * 1000, 2)
+        return {
+            'status': 'success',
+            'data': results,
+            'query': query
+        }
+    except Exception as e:
+        return {'status': 'error', 'message': str(e)}
 
-    # Mock result for demonstration
-    mock_result = {
-        'id_etudiant': student_id,
-        'nom': 'Dupont',
-        'prenom': 'Jean',
-        'statut': 'INSCRIT'
-    }
+def student_search_payload(db_name, name):
+    results = student_search.search(db_name, name)
+    if results is not None:
+        return {
+            'status': 'success',
+            'data': results,
+            'source': 'index'
+        }
+    try:
+        with get_connection(db_name) as (conn, db_type):
+            query = adapter.statement('students_by_name', db_type).sql
+            cursor = adapter.execute(conn, 'students_by_name', db_type, [f'%{name}%'])
+            columns = [column[0] for column in cursor.description]
+            results = [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-    return jsonify({
-        'status': 'success',
-        'method': 'direct',
-        'enrolled': True,
-        'data': mock_result,
-        'execution_time': execution_time,
-        'note': 'Simulation - Drivers directs non installés'
-    })
+        return {
+            'status': 'success',
+            'data': results,
+            'query': query
+        }
+    except Exception as e:
+        return {'status': 'error', 'message': str(e)}
+
+@app.route('/student/enrollment/<db_name>')
+def check_student_enrollment(db_name):
+    student_id = request.args.get('id')
+    if not student_id:
+        return jsonify({'status': 'error', 'message': 'Student ID required'})
+    return jsonify(student_enrollment_payload(db_name, student_id))
 
 @app.route('/student/details/<db_name>')
 def get_student_details(db_name):
     student_id = request.args.get('id')
     if not student_id:
         return jsonify({'status': 'error', 'message': 'Student ID required'})
-
-    try:
-        conn, db_type = get_connection(db_name)
-        cursor = conn.cursor()
-
-        query = adapter.get_student_details_query(db_type, student_id)
-        cursor.execute(query)
-        columns = [column[0] for column in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-        conn.close()
-        return jsonify({
-            'status': 'success',
-            'data': results[0] if results else None,
-            'query': query
-        })
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)})
+    return jsonify(student_details_payload(db_name, student_id))
 
 @app.route('/student/grades/<db_name>')
 def get_student_grades(db_name):
     student_id = request.args.get('id')
     if not student_id:
         return jsonify({'status': 'error', 'message': 'Student ID required'})
-
-    try:
-        conn, db_type = get_connection(db_name)
-        cursor = conn.cursor()
-
-        query = adapter.get_student_grades_query(db_type, student_id)
-        cursor.execute(query)
-        columns = [column[0] for column in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-        conn.close()
-        return jsonify({
-            'status': 'success',
-            'data': results,
-            'query': query
-        })
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)})
+    return jsonify(student_grades_payload(db_name, student_id))
 
 @app.route('/student/search/<db_name>')
 def search_students(db_name):
     name = request.args.get('name')
     if not name:
         return jsonify({'status': 'error', 'message': 'Name required'})
-
-    try:
-        conn, db_type = get_connection(db_name)
+    return jsonify(student_search_payload(db_name, name))
+
+def borrow_books(conn, db_type, student_id, book_ids):
+    """Lend the available books among book_ids to a student, without committing.
+
+    Returns [(loan_id, book_id, due_date)] for the books claimed. Each book is
+    claimed by a conditional UPDATE, so of two concurrent borrowers only one
+    gets it; on PostgreSQL the claims and the loans are one statement.
+    """
+    # Same lock order in every transaction: concurrent batches cannot deadlock
+    book_ids = sorted(set(book_ids))
+    atomic = adapter.get_borrow_books_query(db_type, student_id, book_ids)
+    if atomic:
+        cursor = conn.cursor()
+        cursor.execute(*atomic)
+        return [tuple(row) for row in cursor.fetchall()]
+
+    # borrow_book sets the due date to CURRENT_DATE + 30 days
+    due_date = date.today() + timedelta(days=30)
+    loans = []
+    for book_id in book_ids:
+        if adapter.execute(conn, 'claim_book', db_type, [book_id]).rowcount == 1:
+            adapter.execute(conn, 'borrow_book', db_type, [student_id, book_id])
+            loans.append((None, book_id, due_date))
+    return loans
+
+def return_loan(conn, db_type, loan_id):
+    """Close an open loan and release its book, without committing: (book_id, student_id) or None"""
+    atomic = adapter.get_return_loan_query(db_type, loan_id)
+    if atomic:
         cursor = conn.cursor()
+        cursor.execute(*atomic)
+        row = cursor.fetchone()
+        return tuple(row) if row else None
 
-        query = adapter.get_students_by_name_query(db_type, name)
-        cursor.execute(query)
-        columns = [column[0] for column in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    if adapter.execute(conn, 'close_loan', db_type, [loan_id]).rowcount != 1:
+        return None
+    book_id, student_id = adapter.execute(conn, 'loan_book', db_type, [loan_id]).fetchone()
+    adapter.execute(conn, 'update_book_availability', db_type, [True, book_id])
+    return book_id, student_id
 
-        conn.close()
-        return jsonify({
-            'status': 'success',
-            'data': results,
-            'query': query
-        })
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)})
+def loan_item(loan):
+    loan_id, book_id, due_date = loan
+    return {'loan_id': loan_id, 'book_id': book_id, 'due_date': due_date.isoformat() if due_date else None}
 
 @app.route('/books/borrow', methods=['POST'])
 def borrow_book():
@@ -206,33 +624,74 @@ def borrow_book():
 
     if not student_id or not book_id:
         return jsonify({'status': 'error', 'message': 'Student ID and Book ID required'})
-
     try:
-        conn_pg, pg_type = get_connection('postgresql')
-        cursor_pg = conn_pg.cursor()
+        # Same key as the eligibility store and the SQL parameters
+        student_id, book_id = int(student_id), int(book_id)
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Student ID and Book ID must be integers'})
 
-        # Check if book is available
-        cursor_pg.execute(f"SELECT disponible FROM livres WHERE id_livre = {book_id}")
-        book_status = cursor_pg.fetchone()
-
-        if not book_status or not book_status[0]:
-            conn_pg.close()
-            return jsonify({'status': 'error', 'message': 'Book is not available'})
-
-        # Borrow the book
-        borrow_query = adapter.borrow_book_query(pg_type, student_id, book_id)
-        cursor_pg.execute(borrow_query)
+    try:
+        with get_connection('postgresql') as (conn_pg, pg_type):
+            loans = borrow_books(conn_pg, pg_type, student_id, [book_id])
+            if not loans:
+                conn_pg.rollback()
+                return jsonify({'status': 'error', 'message': 'Book is not available'})
+
+            conn_pg.commit()
+            invalidate('borrow_books')
+            eligibility.open_loan(student_id, book_id, loans[0][2])
+            book_catalog.set_available(loans[0][1], False)
+
+        return jsonify(dict({
+            'status': 'success',
+            'message': 'Book borrowed successfully'
+        }, **loan_item(loans[0])))
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
 
-        # Update book availability
-        availability_query = adapter.update_book_availability_query(pg_type, book_id, 'false')
-        cursor_pg.execute(availability_query)
+@app.route('/books/borrow/batch', methods=['POST'])
+def borrow_books_batch():
+    """Borrow several books in one transaction - requires student_id and book_ids.
 
-        conn_pg.commit()
-        conn_pg.close()
+    Books already lent are reported under 'unavailable' and the others are
+    borrowed ('partial'), unless all_or_nothing is set: then nothing is.
+    """
+    data = request.get_json(silent=True) or {}
+    student_id = data.get('student_id')
+    raw_ids = data.get('book_ids')
+    if not student_id or not isinstance(raw_ids, list):
+        return jsonify({'status': 'error', 'message': 'Student ID and a list of Book IDs required'})
+    try:
+        student_id = int(student_id)
+        book_ids = list(dict.fromkeys(int(i) for i in raw_ids))
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Student ID and Book IDs must be integers'})
+    if not book_ids:
+        return jsonify({'status': 'error', 'message': 'Book IDs required'})
+    if len(book_ids) > BORROW_BATCH_MAX_BOOKS:
+        return jsonify({'status': 'error', 'message': f'At most {BORROW_BATCH_MAX_BOOKS} books per request'})
 
+    try:
+        with get_connection('postgresql') as (conn_pg, pg_type):
+            loans = borrow_books(conn_pg, pg_type, student_id, book_ids)
+            borrowed = {loan[1] for loan in loans}
+            unavailable = [book_id for book_id in book_ids if book_id not in borrowed]
+            if not loans or (unavailable and data.get('all_or_nothing')):
+                conn_pg.rollback()
+                return jsonify({'status': 'error', 'message': 'Books not available',
+                                'loans': [], 'unavailable': unavailable})
+
+            conn_pg.commit()
+            invalidate('borrow_books')
+            for _, book_id, due_date in loans:
+                eligibility.open_loan(student_id, book_id, due_date)
+                book_catalog.set_available(book_id, False)
+
+        loans.sort(key=lambda loan: book_ids.index(loan[1]))
         return jsonify({
-            'status': 'success',
-            'message': 'Book borrowed successfully'
+            'status': 'partial' if unavailable else 'success',
+            'loans': [loan_item(loan) for loan in loans],
+            'unavailable': unavailable
         })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
@@ -249,23 +708,19 @@ def insert_student():
         return jsonify({'status': 'error', 'message': 'Missing required fields'})
 
     try:
-        conn, db_type = get_connection('oracle')
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            INSERT INTO etudiants (id_etudiant, nom, prenom, email, telephone, adresse, statut)
-            VALUES (:id, :nom, :prenom, :email, :tel, :adresse, 'INSCRIT')
-        """, {
-            'id': data['id_etudiant'],
-            'nom': data['nom'],
-            'prenom': data['prenom'],
-            'email': data['email'],
-            'tel': data.get('telephone', ''),
-            'adresse': data.get('adresse', '')
-        })
-
-        conn.commit()
-        conn.close()
+        with get_connection('oracle') as (conn, db_type):
+            adapter.execute(conn, 'insert_student', db_type, [
+                data['id_etudiant'],
+                data['nom'],
+                data['prenom'],
+                data['email'],
+                data.get('telephone', ''),
+                data.get('adresse', '')
+            ])
+
+            conn.commit()
+            invalidate('insert_student')
+            student_search.add('oracle', int(data['id_etudiant']), data['nom'], data['prenom'])
 
         execution_time = round((time.time() - start_time) * 1000, 2)
         return jsonify({
@@ -292,23 +747,29 @@ def insert_grade():
     data = request.get_json()
     if not data or not all(k in data for k in ['id_etudiant', 'id_matiere', 'note', 'date_evaluation']):
         return jsonify({'status': 'error', 'message': 'Missing required fields'})
-
     try:
-        conn, db_type = get_connection('mysql')
-        cursor = conn.cursor()
+        # Same key as the eligibility store and /graduation/<int:student_id>
+        student_id = int(data['id_etudiant'])
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Student ID must be an integer'}), 400
 
-        cursor.execute("""
-            INSERT INTO notes (id_etudiant, id_matiere, note, date_evaluation)
-            VALUES (%s, %s, %s, %s)
-        """, (
-            data['id_etudiant'],
-            data['id_matiere'],
-            data['note'],
-            data['date_evaluation']
-        ))
-
-        conn.commit()
-        conn.close()
+    try:
+        with get_connection('mysql') as (conn, db_type):
+            adapter.execute(conn, 'insert_grade', db_type, [
+                student_id,
+                data['id_matiere'],
+                data['note'],
+                data['date_evaluation']
+            ])
+
+            conn.commit()
+            invalidate('insert_grade')
+
+            # A passing grade adds the subject's credits to a tracked student's total
+            if float(data['note']) >= 10 and eligibility.tracks(student_id):
+                subject = adapter.execute(conn, 'subject_credits', db_type, [data['id_matiere']]).fetchone()
+                if subject and subject[0]:
+                    eligibility.add_credits(student_id, subject[0])
 
         execution_time = round((time.time() - start_time) * 1000, 2)
         return jsonify({
@@ -326,6 +787,86 @@ def insert_grade():
             'execution_time': execution_time
         })
 
+@app.route('/admin/insert/payment', methods=['POST'])
+def insert_payment():
+    """Record a payment in Oracle database"""
+    start_time = time.time()
+
+    data = request.get_json()
+    if not data or not all(k in data for k in ['id_etudiant', 'montant']):
+        return jsonify({'status': 'error', 'message': 'Missing required fields'})
+    try:
+        student_id = int(data['id_etudiant'])
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Student ID must be an integer'}), 400
+
+    payment_type = data.get('type_paiement', 'SCOLARITE')
+    payment_status = data.get('statut', 'PAYE')
+    try:
+        with get_connection('oracle') as (conn, db_type):
+            adapter.execute(conn, 'insert_payment', db_type, [
+                student_id,
+                payment_type,
+                data['montant'],
+                data.get('date_paiement') or date.today(),
+                payment_status
+            ])
+
+            conn.commit()
+            invalidate('insert_payment')
+            if payment_type == 'SCOLARITE' and payment_status == 'PAYE':
+                eligibility.record_payment(student_id)
+
+        execution_time = round((time.time() - start_time) * 1000, 2)
+        return jsonify({
+            'status': 'success',
+            'method': 'odbc',
+            'message': f'Paiement de {data["montant"]} enregistré pour l\'étudiant {data["id_etudiant"]}',
+            'execution_time': execution_time
+        })
+    except Exception as e:
+        execution_time = round((time.time() - start_time) * 1000, 2)
+        return jsonify({
+            'status': 'error',
+            'method': 'odbc',
+            'message': str(e),
+            'execution_time': execution_time
+        })
+
+@app.route('/books/search')
+def search_books():
+    """Faceted catalog search from the in-memory index, without a PostgreSQL query.
+
+    ?q=title or author words (the last one as a prefix), ?categorie=... (repeatable),
+    ?auteur=..., ?disponible=true|false, ?limit=N[&cursor=TOKEN]
+    """
+    disponible = request.args.get('disponible')
+    if disponible not in (None, 'true', 'false'):
+        return jsonify({'status': 'error', 'message': 'disponible must be true or false'})
+    try:
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        limit = max(1, min(int(request.args.get('limit', 20)), STREAMING_SETTINGS['max_page_size']))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+    try:
+        result = book_catalog.search(q=request.args.get('q'), categories=request.args.getlist('categorie'),
+                                     auteur=request.args.get('auteur'),
+                                     disponible=None if disponible is None else disponible == 'true',
+                                     after=after, limit=limit)
+        return jsonify({
+            'status': 'success',
+            'source': 'index',
+            'total': result['total'],
+            'books': [{'id_livre': book_id, 'titre': titre, 'auteur': auteur, 'categorie': categorie,
+                       'disponible': available}
+                      for book_id, titre, auteur, categorie, available in result['books']],
+            'facets': result['facets'],
+            'next_cursor': encode_cursor(result['next_after']) if result['next_after'] else None
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
 @app.route('/admin/insert/book', methods=['POST'])
 def insert_book():
     """Insert a book into PostgreSQL database"""
@@ -337,21 +878,17 @@ def insert_book():
         return jsonify({'status': 'error', 'message': 'Missing required fields'})
 
     try:
-        conn, db_type = get_connection('postgresql')
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            INSERT INTO livres (id_livre, titre, auteur, categorie, disponible)
-            VALUES (%s, %s, %s, %s, true)
-        """, (
-            data['id_livre'],
-            data['titre'],
-            data['auteur'],
-            data.get('categorie', 'Général'),
-        ))
-
-        conn.commit()
-        conn.close()
+        with get_connection('postgresql') as (conn, db_type):
+            adapter.execute(conn, 'insert_book', db_type, [
+                data['id_livre'],
+                data['titre'],
+                data['auteur'],
+                data.get('categorie', 'Général')
+            ])
+
+            conn.commit()
+            invalidate('insert_book')
+            book_catalog.add(int(data['id_livre']), data['titre'], data['auteur'], data.get('categorie', 'Général'))
 
         execution_time = round((time.time() - start_time) * 1000, 2)
         return jsonify({
@@ -378,39 +915,37 @@ def create_loan():
     data = request.get_json()
     if not data or not all(k in data for k in ['id_etudiant', 'id_livre']):
         return jsonify({'status': 'error', 'message': 'Missing required fields'})
+    try:
+        student_id, book_id = int(data['id_etudiant']), int(data['id_livre'])
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Student ID and Book ID must be integers'}), 400
 
     try:
-        conn, db_type = get_connection('postgresql')
-        cursor = conn.cursor()
+        with get_connection('postgresql') as (conn, db_type):
+            # Check if book is available
+            book = adapter.execute(conn, 'book_availability', db_type, [book_id]).fetchone()
 
-        # Check if book is available
-        cursor.execute("SELECT disponible FROM livres WHERE id_livre = %s", (data['id_livre'],))
-        book = cursor.fetchone()
+            if not book or not book[0]:
+                return jsonify({'status': 'error', 'message': 'Livre non disponible'})
 
-        if not book or not book[0]:
-            conn.close()
-            return jsonify({'status': 'error', 'message': 'Livre non disponible'})
+            # Create loan
+            date_emprunt = datetime.now()
+            date_retour_prevue = date_emprunt + timedelta(days=30)
 
-        # Create loan
-        from datetime import datetime, timedelta
-        date_emprunt = datetime.now()
-        date_retour_prevue = date_emprunt + timedelta(days=30)
+            adapter.execute(conn, 'create_loan', db_type, [
+                student_id,
+                book_id,
+                date_emprunt,
+                date_retour_prevue
+            ])
 
-        cursor.execute("""
-            INSERT INTO emprunts (id_etudiant, id_livre, date_emprunt, date_retour_prevue)
-            VALUES (%s, %s, %s, %s)
-        """, (
-            data['id_etudiant'],
-            data['id_livre'],
-            date_emprunt,
-            date_retour_prevue
-        ))
-
-        # Mark book as unavailable
-        cursor.execute("UPDATE livres SET disponible = false WHERE id_livre = %s", (data['id_livre'],))
-
-        conn.commit()
-        conn.close()
+            # Mark book as unavailable
+            adapter.execute(conn, 'update_book_availability', db_type, [False, book_id])
+
+            conn.commit()
+            invalidate('create_loan', 'update_book_availability')
+            eligibility.open_loan(student_id, book_id, date_retour_prevue)
+            book_catalog.set_available(book_id, False)
 
         execution_time = round((time.time() - start_time) * 1000, 2)
         return jsonify({
@@ -460,48 +995,42 @@ def populate_sample_data():
 
     # Insert students (Oracle)
     try:
-        conn, _ = get_connection('oracle')
-        cursor = conn.cursor()
-        for student in students:
-            cursor.execute("""
-                INSERT INTO etudiants (id_etudiant, nom, prenom, email, telephone, adresse, statut)
-                VALUES (:id, :nom, :prenom, :email, :tel, :adresse, 'INSCRIT')
-            """, {
-                'id': student['id'], 'nom': student['nom'], 'prenom': student['prenom'],
-                'email': student['email'], 'tel': student['tel'], 'adresse': student['adresse']
-            })
-        conn.commit()
-        conn.close()
+        with get_connection('oracle') as (conn, db_type):
+            insert_rows(conn, db_type, adapter, 'etudiants',
+                        ['id_etudiant', 'nom', 'prenom', 'email', 'telephone', 'adresse', 'statut'],
+                        [(student['id'], student['nom'], student['prenom'], student['email'],
+                          student['tel'], student['adresse'], 'INSCRIT') for student in students])
+            conn.commit()
+            result_cache.invalidate_tables('etudiants')
+            student_search.request_refresh()
         results['oracle'] = {'status': 'success', 'count': len(students)}
     except Exception as e:
         results['oracle'] = {'status': 'error', 'message': str(e)}
 
     # Insert grades (MySQL)
     try:
-        conn, _ = get_connection('mysql')
-        cursor = conn.cursor()
-        for grade in grades:
-            cursor.execute("""
-                INSERT INTO notes (id_etudiant, id_matiere, note, date_evaluation)
-                VALUES (%s, %s, %s, %s)
-            """, (grade['id_etudiant'], grade['id_matiere'], grade['note'], grade['date']))
-        conn.commit()
-        conn.close()
+        with get_connection('mysql') as (conn, db_type):
+            insert_rows(conn, db_type, adapter, 'notes',
+                        ['id_etudiant', 'id_matiere', 'note', 'date_evaluation'],
+                        [(grade['id_etudiant'], grade['id_matiere'], grade['note'], grade['date'])
+                         for grade in grades])
+            conn.commit()
+            result_cache.invalidate_tables('notes')
+            eligibility.clear()
         results['mysql'] = {'status': 'success', 'count': len(grades)}
     except Exception as e:
         results['mysql'] = {'status': 'error', 'message': str(e)}
 
     # Insert books (PostgreSQL)
     try:
-        conn, _ = get_connection('postgresql')
-        cursor = conn.cursor()
-        for book in books:
-            cursor.execute("""
-                INSERT INTO livres (id_livre, titre, auteur, categorie, disponible)
-                VALUES (%s, %s, %s, %s, true)
-            """, (book['id'], book['titre'], book['auteur'], book['categorie']))
-        conn.commit()
-        conn.close()
+        with get_connection('postgresql') as (conn, db_type):
+            insert_rows(conn, db_type, adapter, 'livres',
+                        ['id_livre', 'titre', 'auteur', 'categorie', 'disponible'],
+                        [(book['id'], book['titre'], book['auteur'], book['categorie'], True)
+                         for book in books])
+            conn.commit()
+            result_cache.invalidate_tables('livres')
+            book_catalog.request_refresh()
         results['postgresql'] = {'status': 'success', 'count': len(books)}
     except Exception as e:
         results['postgresql'] = {'status': 'error', 'message': str(e)}
@@ -513,119 +1042,139 @@ def populate_sample_data():
         'results': results
     })
 
-# Library management endpoints
-@app.route('/books/available')
-def get_available_books():
-    """Get all available books from PostgreSQL"""
-    import time
-    start_time = time.time()
-
+@contextmanager
+def copy_connection(db_name):
+    """Direct psycopg2 connection for a bulk import into PostgreSQL, closed at the end"""
+    conn = get_postgres_connection_direct()
     try:
-        conn, db_type = get_connection('postgresql')
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT id_livre, titre, auteur, categorie
-            FROM livres
-            WHERE disponible = true
-            ORDER BY titre
-        """)
-
-        books = []
-        for row in cursor.fetchall():
-            books.append({
-                'id_livre': row[0],
-                'titre': row[1],
-                'auteur': row[2],
-                'categorie': row[3]
-            })
-
+        yield conn, 'POSTGRESQL'
+    finally:
         conn.close()
 
-        execution_time = round((time.time() - start_time) * 1000, 2)
-        return jsonify({
-            'status': 'success',
-            'method': 'odbc',
-            'books': books,
-            'execution_time': execution_time
-        })
+@app.route('/admin/import/<entity>', methods=['POST'])
+def bulk_import(entity):
+    """Bulk import students, grades or books from a CSV or JSON-lines upload.
+
+    The file is sent as the 'file' form field or as the raw request body.
+    Query parameters: format=csv|jsonl, batch_size=N, progress=stream
+    (stream one NDJSON progress line per committed batch).
+    """
+    if entity not in ENTITIES:
+        return jsonify({'status': 'error', 'message': f'Unknown entity: {entity}'})
+
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    filename = upload.filename if upload else ''
+    fmt = request.args.get('format') or ('jsonl' if filename.endswith(('.jsonl', '.ndjson'))
+                                         or 'json' in (request.content_type or '') else 'csv')
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({'status': 'error', 'message': 'Format must be csv or jsonl'})
+    try:
+        batch_size = max(1, int(request.args.get('batch_size', BULK_IMPORT_SETTINGS['batch_size'])))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'batch_size must be an integer'})
+
+    # PostgreSQL tables are loaded with COPY, which only psycopg2 offers
+    method = ('copy' if ENTITIES[entity]['db_name'] == 'postgresql' and BULK_IMPORT_SETTINGS['postgresql_copy']
+              and BACKEND != 'embedded' and postgres_driver.installed() else 'odbc')
+    importer = BulkImporter(copy_connection if method == 'copy' else get_connection, adapter, entity, batch_size,
+                            BULK_IMPORT_SETTINGS['max_rejected_reported'])
+
+    def run_batches():
+        # Every report follows a commit: drop cached reads of the table
+        for report in importer.run(read_records(stream, fmt)):
+            result_cache.invalidate_tables(ENTITIES[entity]['table'])
+            if entity == 'grade':
+                # Per-row credit deltas are not worth it for a bulk load: reload lazily
+                eligibility.clear()
+            elif entity == 'student':
+                student_search.request_refresh()
+            elif entity == 'book':
+                book_catalog.request_refresh()
+            yield report
+
+    batches = run_batches()
+
+    if request.args.get('progress') == 'stream':
+        def generate():
+            try:
+                for report in batches:
+                    yield json.dumps(report) + '\n'
+                yield json.dumps(dict(importer.summary(), status='success')) + '\n'
+            except Exception as e:
+                yield json.dumps({'status': 'error', 'message': str(e)}) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    try:
+        progress = list(batches)
+        return jsonify(dict(importer.summary(), status='success', method=method, batches=progress))
     except Exception as e:
-        execution_time = round((time.time() - start_time) * 1000, 2)
-        return jsonify({
-            'status': 'error',
-            'method': 'odbc',
-            'message': str(e),
-            'execution_time': execution_time
-        })
+        return jsonify(dict(importer.summary(), status='error', method=method, message=str(e)))
+
+# Library management endpoints
+@app.route('/books/available')
+def get_available_books():
+    """Get all available books from PostgreSQL"""
+    return listing_response(
+        'postgresql', 'books',
+        adapter.get_available_books_page_query,
+        lambda row, columns: {
+            'id_livre': row[0],
+            'titre': row[1],
+            'auteur': row[2],
+            'categorie': row[3]
+        },
+        lambda row, columns: (row[1], row[0]),
+        meta={'method': 'odbc'}, timed=True, cache_template='available_books_page',
+        etag_template='available_books_page'
+    )
 
 @app.route('/books/my-loans/<int:student_id>')
 def get_my_loans(student_id):
     """Get student's current loans from PostgreSQL"""
-    import time
-    start_time = time.time()
-
-    try:
-        conn, db_type = get_connection('postgresql')
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT e.id_emprunt, l.titre, l.auteur, e.date_emprunt, e.date_retour_prevue
-            FROM emprunts e
-            JOIN livres l ON e.id_livre = l.id_livre
-            WHERE e.id_etudiant = %s AND e.date_retour IS NULL
-            ORDER BY e.date_emprunt DESC
-        """, (student_id,))
-
-        loans = []
-        for row in cursor.fetchall():
-            loans.append({
-                'id_emprunt': row[0],
-                'titre': row[1],
-                'auteur': row[2],
-                'date_emprunt': row[3].strftime('%d/%m/%Y') if row[3] else None,
-                'date_retour_prevue': row[4].strftime('%d/%m/%Y') if row[4] else None
-            })
-
-        conn.close()
-
-        execution_time = round((time.time() - start_time) * 1000, 2)
-        return jsonify({
-            'status': 'success',
-            'method': 'odbc',
-            'loans': loans,
-            'execution_time': execution_time
-        })
-    except Exception as e:
-        execution_time = round((time.time() - start_time) * 1000, 2)
-        return jsonify({
-            'status': 'error',
-            'method': 'odbc',
-            'message': str(e),
-            'execution_time': execution_time
-        })
+    return listing_response(
+        'postgresql', 'loans',
+        lambda db_type, after, limit, offset: adapter.get_student_loans_page_query(
+            db_type, student_id, after, limit, offset),
+        lambda row, columns: {
+            'id_emprunt': row[0],
+            'titre': row[1],
+            'auteur': row[2],
+            'date_emprunt': row[3].strftime('%d/%m/%Y') if row[3] else None,
+            'date_retour_prevue': row[4].strftime('%d/%m/%Y') if row[4] else None
+        },
+        lambda row, columns: (row[3], row[0]),
+        meta={'method': 'odbc'}, timed=True
+    )
 
 
 # Direct driver functions (without ODBC middleware)
 def get_oracle_connection_direct():
     """Direct Oracle connection using cx_Oracle"""
+    if BACKEND == 'embedded':
+        return embedded_backend.connect(DATABASES['oracle'])
     try:
-        # Using a simplified connection string - in real scenario would use actual credentials
-        dsn = cx_Oracle.makedsn("localhost", 1521, service_name="XE")
-        connection = cx_Oracle.connect(user="system", password="password", dsn=dsn)
+        settings = DIRECT_DATABASES['oracle']
+        dsn = oracle_driver.makedsn(settings['host'], settings['port'], service_name=settings['service_name'])
+        connection = oracle_driver.connect(user=settings['user'], password=settings['password'], dsn=dsn)
         return connection
     except Exception as e:
         raise Exception(f"Oracle direct connection failed: {str(e)}")
 
 def get_mysql_connection_direct():
     """Direct MySQL connection using pymysql"""
+    if BACKEND == 'embedded':
+        return embedded_backend.connect(DATABASES['mysql'], dict_rows=True)
     try:
-        connection = pymysql.connect(
-            host="localhost",
-            user="root",
-            password="password",
-            database="university",
+        settings = DIRECT_DATABASES['mysql']
+        connection = mysql_driver.connect(
+            host=settings['host'],
+            port=settings['port'],
+            user=settings['user'],
+            password=settings['password'],
+            database=settings['database'],
             charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
+            cursorclass=mysql_driver.cursors.DictCursor
         )
         return connection
     except Exception as e:
@@ -633,12 +1182,16 @@ def get_mysql_connection_direct():
 
 def get_postgres_connection_direct():
     """Direct PostgreSQL connection using psycopg2"""
+    if BACKEND == 'embedded':
+        return embedded_backend.connect(DATABASES['postgresql'])
     try:
-        connection = psycopg2.connect(
-            host="localhost",
-            database="university",
-            user="postgres",
-            password="password"
+        settings = DIRECT_DATABASES['postgresql']
+        connection = postgres_driver.connect(
+            host=settings['host'],
+            port=settings['port'],
+            database=settings['database'],
+            user=settings['user'],
+            password=settings['password']
         )
         return connection
     except Exception as e:
@@ -750,9 +1303,29 @@ def get_books_direct(student_id):
     except Exception as e:
         return jsonify({'status': 'error', 'method': 'direct_postgresql', 'message': str(e)})
 
+def time_calls(fn, iterations):
+    """(timings, result): median and min duration of fn() in ms, measured after
+    one warm-up call whose result is returned"""
+    result = fn()
+    timings = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start_time) * 1000)
+    return {
+        'time': round(statistics.median(timings), 2),
+        'min': round(min(timings), 2),
+        'iterations': iterations
+    }, result
+
 @app.route('/compare/methods/<int:student_id>')
 def compare_methods(student_id):
-    """Compare direct drivers vs ODBC for the same operation"""
+    """Compare direct drivers vs ODBC for the same operation.
+
+    Each method is called once to warm up, then ?iterations=N times (default 5);
+    the median is reported. See benchmarks/bench_paths.py for a full benchmark.
+    """
+    iterations = max(1, min(request.args.get('iterations', 5, type=int), 50))
     results = {
         'student_id': student_id,
         'methods': {}
@@ -760,40 +1333,32 @@ def compare_methods(student_id):
 
     # Test ODBC method
     try:
-        start_time = time.time()
-        response = get_student_dashboard(student_id)
-        odbc_time = time.time() - start_time
-        results['methods']['odbc'] = {
-            'time': round(odbc_time * 1000, 2),  # ms
-            'status': 'success' if response.status_code == 200 else 'error'
-        }
-    except:
-        results['methods']['odbc'] = {'status': 'error'}
+        timings, response = time_calls(lambda: get_student_dashboard(student_id), iterations)
+        results['methods']['odbc'] = dict(
+            timings,
+            status='success' if response.get_json().get('status') == 'success' else 'error'
+        )
+    except Exception as e:
+        results['methods']['odbc'] = {'status': 'error', 'message': str(e)}
 
     # Test direct drivers method
     if DIRECT_DRIVERS_AVAILABLE:
         try:
-            start_time = time.time()
-
-            # Direct Oracle call
-            oracle_result = check_enrollment_direct(student_id)
-
-            # Direct MySQL call
-            mysql_result = get_grades_direct(student_id)
-
-            # Direct PostgreSQL call
-            postgres_result = get_books_direct(student_id)
-
-            direct_time = time.time() - start_time
-            results['methods']['direct'] = {
-                'time': round(direct_time * 1000, 2),  # ms
-                'status': 'success',
-                'oracle': oracle_result.get_json(),
-                'mysql': mysql_result.get_json(),
-                'postgresql': postgres_result.get_json()
-            }
-        except:
-            results['methods']['direct'] = {'status': 'error'}
+            def direct_calls():
+                return (check_enrollment_direct(student_id),   # Direct Oracle call
+                        get_grades_direct(student_id),          # Direct MySQL call
+                        get_books_direct(student_id))           # Direct PostgreSQL call
+
+            timings, (oracle_result, mysql_result, postgres_result) = time_calls(direct_calls, iterations)
+            results['methods']['direct'] = dict(
+                timings,
+                status='success',
+                oracle=oracle_result.get_json(),
+                mysql=mysql_result.get_json(),
+                postgresql=postgres_result.get_json()
+            )
+        except Exception as e:
+            results['methods']['direct'] = {'status': 'error', 'message': str(e)}
     else:
         results['methods']['direct'] = {'status': 'unavailable', 'message': 'Direct drivers not installed'}
 
@@ -803,15 +1368,11 @@ def compare_methods(student_id):
 def get_student_loans(student_id):
     """Get student's current book loans"""
     try:
-        conn_pg, pg_type = get_connection('postgresql')
-        cursor_pg = conn_pg.cursor()
-
-        query = adapter.get_student_current_loans_query(pg_type, student_id)
-        cursor_pg.execute(query)
-        columns = [column[0] for column in cursor_pg.description]
-        results = [dict(zip(columns, row)) for row in cursor_pg.fetchall()]
+        with get_connection('postgresql') as (conn_pg, pg_type):
+            cursor_pg = adapter.execute(conn_pg, 'student_current_loans', pg_type, [student_id])
+            columns = [column[0] for column in cursor_pg.description]
+            results = [dict(zip(columns, row)) for row in cursor_pg.fetchall()]
 
-        conn_pg.close()
         return jsonify({
             'status': 'success',
             'loans': results
@@ -829,29 +1390,18 @@ def return_book():
         return jsonify({'status': 'error', 'message': 'Loan ID required'})
 
     try:
-        conn_pg, pg_type = get_connection('postgresql')
-        cursor_pg = conn_pg.cursor()
-
-        # Get book_id from loan
-        cursor_pg.execute(f"SELECT id_livre FROM emprunts WHERE id_emprunt = {loan_id}")
-        loan_info = cursor_pg.fetchone()
-
-        if not loan_info:
-            conn_pg.close()
-            return jsonify({'status': 'error', 'message': 'Loan not found'})
-
-        book_id = loan_info[0]
-
-        # Return the book
-        return_query = adapter.return_book_query(pg_type, loan_id)
-        cursor_pg.execute(return_query)
-
-        # Update book availability
-        availability_query = adapter.update_book_availability_query(pg_type, book_id, 'true')
-        cursor_pg.execute(availability_query)
-
-        conn_pg.commit()
-        conn_pg.close()
+        with get_connection('postgresql') as (conn_pg, pg_type):
+            returned = return_loan(conn_pg, pg_type, loan_id)
+            if not returned:
+                conn_pg.rollback()
+                return jsonify({'status': 'error', 'message': 'Loan not found or already returned'})
+
+            book_id, loan_student_id = returned
+            conn_pg.commit()
+            invalidate('return_loan')
+            eligibility.close_loan(loan_student_id, book_id)
+            overdue_scanner.discard(int(loan_id))
+            book_catalog.set_available(book_id, True)
 
         return jsonify({
             'status': 'success',
@@ -862,15 +1412,14 @@ def return_book():
 
 @app.route('/stats/enrollment/<db_name>')
 def get_enrollment_stats(db_name):
-    try:
-        conn, db_type = get_connection(db_name)
-        cursor = conn.cursor()
+    def load():
+        with get_connection(db_name) as (conn, db_type):
+            return adapter.execute(conn, 'enrollment_count', db_type).fetchone()
 
-        query = adapter.get_enrollment_count_query(db_type)
-        cursor.execute(query)
-        result = cursor.fetchone()
+    try:
+        query = adapter.statement('enrollment_count', DATABASES[db_name]['type']).sql
+        result = cached_query(db_name, 'enrollment_count', [], load)
 
-        conn.close()
         return jsonify({
             'status': 'success',
             'total_enrolled': result[0] if result else 0,
@@ -882,177 +1431,349 @@ def get_enrollment_stats(db_name):
 @app.route('/admin/all-books')
 def get_all_books_admin():
     """Get all books with their status for admin view"""
-    try:
-        conn, db_type = get_connection('postgresql')
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT id_livre, titre, auteur, categorie, disponible
-            FROM livres
-            ORDER BY id_livre
-        """)
-
-        books = []
-        for row in cursor.fetchall():
-            books.append({
-                'id_livre': row[0],
-                'titre': row[1],
-                'auteur': row[2],
-                'categorie': row[3],
-                'disponible': row[4]
-            })
-
-        conn.close()
-        return jsonify({
-            'status': 'success',
-            'books': books
-        })
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)})
+    return listing_response(
+        'postgresql', 'books',
+        adapter.get_all_books_page_query,
+        lambda row, columns: {
+            'id_livre': row[0],
+            'titre': row[1],
+            'auteur': row[2],
+            'categorie': row[3],
+            'disponible': row[4]
+        },
+        lambda row, columns: (row[0],),
+        etag_template='all_books_page'
+    )
 
 @app.route('/admin/all-loans')
 def get_all_loans_admin():
     """Get all loans with complete information for admin view"""
-    try:
-        conn, db_type = get_connection('postgresql')
-        cursor = conn.cursor()
+    return listing_response(
+        'postgresql', 'loans',
+        adapter.get_all_loans_page_query,
+        lambda row, columns: {
+            'id_emprunt': row[0],
+            'id_etudiant': row[1],
+            'id_livre': row[2],
+            'titre': row[3],
+            'auteur': row[4],
+            'date_emprunt': row[5].isoformat() if row[5] else None,
+            'date_retour_prevue': row[6].isoformat() if row[6] else None,
+            'date_retour': row[7].isoformat() if row[7] else None
+        },
+        lambda row, columns: (row[5], row[0]),
+        etag_template='all_loans_page'
+    )
+
+# Per-backend sub-queries of the cross-database routes, run concurrently by `fanout`
+def fetch_student_profile(student_id):
+    """Student profile from Oracle, or None"""
+    def load():
+        with get_connection('oracle') as (conn_oracle, oracle_type):
+            return adapter.execute(conn_oracle, 'student_profile', oracle_type, [student_id]).fetchone()
+
+    profile_result = cached_query('oracle', 'student_profile', [student_id], load)
+    if not profile_result:
+        return None
+    return {
+        'id_etudiant': profile_result[0],
+        'nom': profile_result[1],
+        'prenom': profile_result[2],
+        'email': profile_result[3],
+        'telephone': profile_result[4],
+        'adresse': profile_result[5]
+    }
 
-        cursor.execute("""
-            SELECT e.id_emprunt, e.id_etudiant, e.id_livre, l.titre, l.auteur,
-                   e.date_emprunt, e.date_retour_prevue, e.date_retour
-            FROM emprunts e
-            LEFT JOIN livres l ON e.id_livre = l.id_livre
-            ORDER BY e.date_emprunt DESC
-        """)
-
-        loans = []
-        for row in cursor.fetchall():
-            loans.append({
-                'id_emprunt': row[0],
-                'id_etudiant': row[1],
-                'id_livre': row[2],
-                'titre': row[3],
-                'auteur': row[4],
-                'date_emprunt': row[5].isoformat() if row[5] else None,
-                'date_retour_prevue': row[6].isoformat() if row[6] else None,
-                'date_retour': row[7].isoformat() if row[7] else None
-            })
+def fetch_student_gpa(student_id):
+    """Grade average from MySQL, or None"""
+    with get_connection('mysql') as (conn_mysql, mysql_type):
+        gpa_result = adapter.execute(conn_mysql, 'student_gpa', mysql_type, [student_id]).fetchone()
+    return float(gpa_result[0]) if gpa_result and gpa_result[0] else None
+
+def fetch_borrowed_books_count(student_id):
+    """Number of books currently borrowed, from PostgreSQL"""
+    with get_connection('postgresql') as (conn_pg, pg_type):
+        books_result = adapter.execute(conn_pg, 'borrowed_books_count', pg_type, [student_id]).fetchone()
+    return books_result[0] if books_result else 0
+
+def dashboard_tasks(student_id):
+    """Profile (Oracle), GPA (MySQL) and borrowed books (PostgreSQL) sub-queries of a dashboard"""
+    return {
+        'oracle': remembered(('profile', student_id), lambda: fetch_student_profile(student_id)),
+        'mysql': remembered(('gpa', student_id), lambda: fetch_student_gpa(student_id)),
+        'postgresql': remembered(('borrowed_books', student_id), lambda: fetch_borrowed_books_count(student_id))
+    }
 
-        conn.close()
-        return jsonify({
-            'status': 'success',
-            'loans': loans
-        })
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)})
+def dashboard_payload(student_id, results, errors):
+    """Response body of /dashboard from the per-backend results and errors"""
+    dashboard_data = {}
+    stale = {}
+    for name, result in list(results.items()):
+        if isinstance(result, Stale):
+            results[name] = result.value
+            stale[name] = datetime.fromtimestamp(result.stored_at).isoformat(timespec='seconds')
+
+    if 'oracle' in errors:
+        dashboard_data['profile_error'] = f"Erreur Oracle: {str(errors['oracle'])}"
+    elif results['oracle']:
+        dashboard_data['profile'] = results['oracle']
+
+    if 'mysql' in errors:
+        dashboard_data['gpa_error'] = f"Erreur MySQL: {str(errors['mysql'])}"
+    else:
+        dashboard_data['gpa'] = results['mysql']
+
+    if 'postgresql' in errors:
+        dashboard_data['books_error'] = f"Erreur PostgreSQL: {str(errors['postgresql'])}"
+    else:
+        dashboard_data['borrowed_books'] = results['postgresql']
+
+    payload = {
+        'status': 'success',
+        'student_id': student_id,
+        'data': dashboard_data
+    }
+    if stale:
+        # Databases with an open breaker: answers last read at these times
+        payload['stale'] = stale
+    return payload
 
 @app.route('/dashboard/<int:student_id>')
 def get_student_dashboard(student_id):
     """Get complete student dashboard from all three databases"""
     try:
-        dashboard_data = {}
+        # The three sub-queries are fetched concurrently
+        results, errors = fanout.run(dashboard_tasks(student_id))
+        return jsonify(dashboard_payload(student_id, results, errors))
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
 
-        # Get student profile from Oracle
-        try:
-            conn_oracle, oracle_type = get_connection('oracle')
-            cursor_oracle = conn_oracle.cursor()
-            query_profile = adapter.get_student_profile_query(oracle_type, student_id)
-            cursor_oracle.execute(query_profile)
-            profile_result = cursor_oracle.fetchone()
-            if profile_result:
-                dashboard_data['profile'] = {
-                    'id_etudiant': profile_result[0],
-                    'nom': profile_result[1],
-                    'prenom': profile_result[2],
-                    'email': profile_result[3],
-                    'telephone': profile_result[4],
-                    'adresse': profile_result[5]
+def fetch_student_profiles_batch(student_ids):
+    """{id_etudiant: profile} for many students, from Oracle"""
+    profiles = {}
+    with get_connection('oracle') as (conn_oracle, oracle_type):
+        cursor_oracle = conn_oracle.cursor()
+        for query, params in adapter.get_student_profiles_batch_queries(oracle_type, student_ids):
+            cursor_oracle.execute(query, params)
+            for row in cursor_oracle.fetchall():
+                profiles[row[0]] = {
+                    'id_etudiant': row[0],
+                    'nom': row[1],
+                    'prenom': row[2],
+                    'email': row[3],
+                    'telephone': row[4],
+                    'adresse': row[5]
                 }
-            conn_oracle.close()
-        except Exception as e:
-            dashboard_data['profile_error'] = f"Erreur Oracle: {str(e)}"
+    return profiles
+
+def fetch_students_gpa_batch(student_ids):
+    """{id_etudiant: grade average} for many students, from MySQL"""
+    gpas = {}
+    with get_connection('mysql') as (conn_mysql, mysql_type):
+        cursor_mysql = conn_mysql.cursor()
+        for query, params in adapter.get_students_gpa_batch_queries(mysql_type, student_ids):
+            cursor_mysql.execute(query, params)
+            for row in cursor_mysql.fetchall():
+                gpas[row[0]] = float(row[1]) if row[1] else None
+    return gpas
+
+def fetch_borrowed_books_count_batch(student_ids):
+    """{id_etudiant: current loans} for many students, from PostgreSQL"""
+    counts = {}
+    with get_connection('postgresql') as (conn_pg, pg_type):
+        cursor_pg = conn_pg.cursor()
+        for query, params in adapter.get_borrowed_books_count_batch_queries(pg_type, student_ids):
+            cursor_pg.execute(query, params)
+            for row in cursor_pg.fetchall():
+                counts[row[0]] = row[1]
+    return counts
+
+def fetch_tuition_paid_batch(student_ids):
+    """Ids of the students whose tuition is paid, from Oracle"""
+    paid = set()
+    with get_connection('oracle') as (conn_oracle, oracle_type):
+        cursor_oracle = conn_oracle.cursor()
+        for query, params in adapter.get_tuition_paid_batch_queries(oracle_type, student_ids):
+            cursor_oracle.execute(query, params)
+            paid.update(row[0] for row in cursor_oracle.fetchall())
+    return paid
+
+def fetch_total_credits_batch(student_ids):
+    """{id_etudiant: credits of passed subjects} for many students, from MySQL"""
+    credits = {}
+    with get_connection('mysql') as (conn_mysql, mysql_type):
+        cursor_mysql = conn_mysql.cursor()
+        for query, params in adapter.get_total_credits_batch_queries(mysql_type, student_ids):
+            cursor_mysql.execute(query, params)
+            for row in cursor_mysql.fetchall():
+                credits[row[0]] = row[1] or 0
+    return credits
+
+def fetch_open_loans_batch(student_ids):
+    """{id_etudiant: {id_livre: due date}} of the open loans of many students, from PostgreSQL"""
+    loans = {}
+    with get_connection('postgresql') as (conn_pg, pg_type):
+        cursor_pg = conn_pg.cursor()
+        for query, params in adapter.get_open_loans_batch_queries(pg_type, student_ids):
+            cursor_pg.execute(query, params)
+            for row in cursor_pg.fetchall():
+                loans.setdefault(row[0], {})[row[1]] = row[2]
+    return loans
+
+# Database each eligibility value is read from
+ELIGIBILITY_SOURCES = {'oracle': 'tuition_paid', 'mysql': 'total_credits', 'postgresql': 'overdue_books_count'}
+
+def load_eligibility_batch(student_ids):
+    """{id_etudiant: EligibilityRecord} read from the three databases concurrently"""
+    results, errors = fanout.run({
+        'oracle': lambda: fetch_tuition_paid_batch(student_ids),
+        'mysql': lambda: fetch_total_credits_batch(student_ids),
+        'postgresql': lambda: fetch_open_loans_batch(student_ids)
+    })
+    paid, credits, loans = results.get('oracle'), results.get('mysql'), results.get('postgresql')
+    records = {
+        student_id: EligibilityRecord(
+            tuition_paid=student_id in paid if paid is not None else None,
+            total_credits=credits.get(student_id, 0) if credits is not None else None,
+            open_loans=loans.get(student_id, {}) if loans is not None else None
+        )
+        for student_id in student_ids
+    }
+    if errors:
+        raise SourceUnavailable(errors, {student_id: record.values() for student_id, record in records.items()})
+    return records
+
+def load_student_names(db_name, after_id):
+    """Yield (id_etudiant, nom, prenom) of the students above after_id, for the search index"""
+    with get_connection(db_name) as (conn, db_type):
+        query, params = adapter.get_student_names_query(db_type, after_id)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        for student_id, nom, prenom in iter_rows(cursor, STREAMING_SETTINGS['fetch_size']):
+            yield student_id, nom, prenom
+
+def load_books(after_id):
+    """Yield (id_livre, titre, auteur, categorie, disponible) of the books above after_id, for the catalog"""
+    with get_connection('postgresql') as (conn, db_type):
+        query, params = adapter.get_all_books_page_query(db_type, (after_id,) if after_id is not None else None)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        for row in iter_rows(cursor, STREAMING_SETTINGS['fetch_size']):
+            yield tuple(row)
+
+def scan_overdue_loans(since, until, after, limit):
+    """One page of (id_emprunt, id_etudiant, id_livre, date_retour_prevue) rows for the overdue scanner"""
+    with get_connection('postgresql') as (conn, db_type):
+        query, params = adapter.get_overdue_scan_query(db_type, since, until, after, limit)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return [tuple(row) for row in cursor.fetchall()]
 
-        # Get GPA from MySQL
-        try:
-            conn_mysql, mysql_type = get_connection('mysql')
-            cursor_mysql = conn_mysql.cursor()
-            query_gpa = adapter.get_student_gpa_query(mysql_type, student_id)
-            cursor_mysql.execute(query_gpa)
-            gpa_result = cursor_mysql.fetchone()
-            dashboard_data['gpa'] = float(gpa_result[0]) if gpa_result and gpa_result[0] else None
-            conn_mysql.close()
-        except Exception as e:
-            dashboard_data['gpa_error'] = f"Erreur MySQL: {str(e)}"
+@app.route('/dashboard/batch', methods=['GET', 'POST'])
+def get_student_dashboard_batch():
+    """Dashboards of many students with one set-based query per database.
 
-        # Get borrowed books count from PostgreSQL
-        try:
-            conn_pg, pg_type = get_connection('postgresql')
-            cursor_pg = conn_pg.cursor()
-            query_books = adapter.get_borrowed_books_count_query(pg_type, student_id)
-            cursor_pg.execute(query_books)
-            books_result = cursor_pg.fetchone()
-            dashboard_data['borrowed_books'] = books_result[0] if books_result else 0
-            conn_pg.close()
-        except Exception as e:
-            dashboard_data['books_error'] = f"Erreur PostgreSQL: {str(e)}"
+    POST {"student_ids": [1, 2, 3]} or GET /dashboard/batch?ids=1,2,3
+    """
+    if request.method == 'POST':
+        raw_ids = (request.get_json(silent=True) or {}).get('student_ids') or []
+    else:
+        raw_ids = [i for i in request.args.get('ids', '').split(',') if i.strip()]
 
-        return jsonify({
-            'status': 'success',
-            'student_id': student_id,
-            'data': dashboard_data
+    try:
+        student_ids = list(dict.fromkeys(int(i) for i in raw_ids))
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Student IDs must be integers'})
+    if not student_ids:
+        return jsonify({'status': 'error', 'message': 'Student IDs required'})
+    if len(student_ids) > BATCH_DASHBOARD_MAX_STUDENTS:
+        return jsonify({'status': 'error',
+                        'message': f'At most {BATCH_DASHBOARD_MAX_STUDENTS} students per request'})
+
+    try:
+        results, errors = fanout.run({
+            'oracle': lambda: fetch_student_profiles_batch(student_ids),
+            'mysql': lambda: fetch_students_gpa_batch(student_ids),
+            'postgresql': lambda: fetch_borrowed_books_count_batch(student_ids)
         })
+
+        response = {'status': 'success', 'count': len(student_ids)}
+        if 'oracle' in errors:
+            response['profile_error'] = f"Erreur Oracle: {str(errors['oracle'])}"
+        if 'mysql' in errors:
+            response['gpa_error'] = f"Erreur MySQL: {str(errors['mysql'])}"
+        if 'postgresql' in errors:
+            response['books_error'] = f"Erreur PostgreSQL: {str(errors['postgresql'])}"
+
+        # Merge the three result sets on id_etudiant
+        profiles = results.get('oracle', {})
+        gpas = results.get('mysql', {})
+        books = results.get('postgresql', {})
+        students = []
+        for student_id in student_ids:
+            data = {}
+            if 'oracle' not in errors and student_id in profiles:
+                data['profile'] = profiles[student_id]
+            if 'mysql' not in errors:
+                data['gpa'] = gpas.get(student_id)
+            if 'postgresql' not in errors:
+                data['borrowed_books'] = books.get(student_id, 0)
+            students.append({'student_id': student_id, 'data': data})
+
+        response['students'] = students
+        return jsonify(response)
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
 @app.route('/graduation/<int:student_id>')
 def check_graduation_eligibility(student_id):
-    """Check graduation eligibility across all three databases"""
+    """Check graduation eligibility across all three databases.
+
+    Reads the eligibility store: tuition, credits and loans are loaded once
+    per student, then kept current by the write paths.
+    """
     try:
         graduation_checks = {}
+        stale = {}
 
-        # Check tuition payment from Oracle
         try:
-            conn_oracle, oracle_type = get_connection('oracle')
-            cursor_oracle = conn_oracle.cursor()
-            query_tuition = adapter.get_tuition_payment_query(oracle_type, student_id)
-            cursor_oracle.execute(query_tuition)
-            tuition_result = cursor_oracle.fetchone()
-            graduation_checks['tuition_paid'] = tuition_result[0] > 0 if tuition_result else False
-            conn_oracle.close()
-        except Exception as e:
-            graduation_checks['tuition_error'] = f"Erreur Oracle: {str(e)}"
+            values, errors = eligibility.get(student_id), {}
+            last_known_good.put(('graduation', student_id), values)
+        except SourceUnavailable as e:
+            values, errors = dict(e.partial[student_id]), dict(e.errors)
+            # Sources behind an open breaker: fall back to the last answer read from them
+            unavailable = [name for name, error in errors.items() if isinstance(error, CircuitOpen)]
+            found, remembered_values, stored_at = (last_known_good.get(('graduation', student_id))
+                                                   if unavailable else (False, None, None))
+            if found:
+                for name in unavailable:
+                    field = ELIGIBILITY_SOURCES[name]
+                    values[field] = remembered_values[field]
+                    del errors[name]
+                stale = {name: datetime.fromtimestamp(stored_at).isoformat(timespec='seconds') for name in unavailable}
+
+        if 'oracle' in errors:
+            graduation_checks['tuition_error'] = f"Erreur Oracle: {str(errors['oracle'])}"
             graduation_checks['tuition_paid'] = False
+        else:
+            graduation_checks['tuition_paid'] = values['tuition_paid']
 
-        # Check credits validation from MySQL
-        try:
-            conn_mysql, mysql_type = get_connection('mysql')
-            cursor_mysql = conn_mysql.cursor()
-            query_credits = adapter.get_credits_validation_query(mysql_type, student_id)
-            cursor_mysql.execute(query_credits)
-            credits_result = cursor_mysql.fetchone()
-            total_credits = credits_result[0] if credits_result and credits_result[0] else 0
-            graduation_checks['credits_validated'] = total_credits >= 180  # Assuming 180 credits required
-            graduation_checks['total_credits'] = total_credits
-            conn_mysql.close()
-        except Exception as e:
-            graduation_checks['credits_error'] = f"Erreur MySQL: {str(e)}"
+        if 'mysql' in errors:
+            graduation_checks['credits_error'] = f"Erreur MySQL: {str(errors['mysql'])}"
             graduation_checks['credits_validated'] = False
             graduation_checks['total_credits'] = 0
+        else:
+            total_credits = values['total_credits']
+            graduation_checks['credits_validated'] = total_credits >= GRADUATION_REQUIRED_CREDITS
+            graduation_checks['total_credits'] = total_credits
 
-        # Check overdue books from PostgreSQL
-        try:
-            conn_pg, pg_type = get_connection('postgresql')
-            cursor_pg = conn_pg.cursor()
-            query_overdue = adapter.get_overdue_books_query(pg_type, student_id)
-            cursor_pg.execute(query_overdue)
-            overdue_result = cursor_pg.fetchone()
-            graduation_checks['no_overdue_books'] = overdue_result[0] == 0 if overdue_result else True
-            graduation_checks['overdue_books_count'] = overdue_result[0] if overdue_result else 0
-            conn_pg.close()
-        except Exception as e:
-            graduation_checks['overdue_error'] = f"Erreur PostgreSQL: {str(e)}"
+        if 'postgresql' in errors:
+            graduation_checks['overdue_error'] = f"Erreur PostgreSQL: {str(errors['postgresql'])}"
             graduation_checks['no_overdue_books'] = False
             graduation_checks['overdue_books_count'] = 0
+        else:
+            graduation_checks['no_overdue_books'] = values['overdue_books_count'] == 0
+            graduation_checks['overdue_books_count'] = values['overdue_books_count']
 
         # Overall eligibility
         graduation_checks['eligible_for_graduation'] = (
@@ -1061,16 +1782,144 @@ def check_graduation_eligibility(student_id):
             graduation_checks.get('no_overdue_books', False)
         )
 
-        return jsonify({
+        payload = {
             'status': 'success',
             'student_id': student_id,
             'checks': graduation_checks
+        }
+        if stale:
+            payload['stale'] = stale
+        return jsonify(payload)
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/admin/reports/graduation')
+def graduation_report():
+    """Eligibility of every student (or of ?statut=...) as a streamed CSV or ?format=ndjson file.
+
+    One aggregate query per database, joined on id_etudiant as the Oracle rows arrive.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'status': 'error', 'message': 'Format must be csv or ndjson'})
+
+    report = CohortReport(Federation(get_connection, adapter, fanout, **FEDERATED_SETTINGS),
+                          GRADUATION_REQUIRED_CREDITS, request.args.get('statut'))
+    rows = report.rows()
+    # Run the queries before the headers go out, so a failing backend still gets a JSON error
+    try:
+        first = next(rows, None)
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+    rows = chain([first] if first is not None else [], rows)
+
+    if fmt == 'ndjson':
+        body = ndjson_stream(rows, json.dumps, lambda: {'summary': report.summary()})
+        mimetype = 'application/x-ndjson'
+    else:
+        body = csv_stream(rows, REPORT_COLUMNS)
+        mimetype = 'text/csv'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=graduation-eligibility.{fmt}'})
+
+LOAN_REPORT_COLUMNS = ['id_emprunt', 'id_livre', 'titre', 'date_emprunt', 'date_retour_prevue',
+                       'id_etudiant', 'nom', 'prenom', 'email']
+
+@app.route('/admin/reports/loans')
+def loan_report():
+    """Open loans (?overdue=true: overdue ones) with their book and borrower, by due date, as a
+    streamed CSV or ?format=ndjson file.
+
+    Loans and titles come from PostgreSQL, names from Oracle, hash-joined on id_etudiant.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'status': 'error', 'message': 'Format must be csv or ndjson'})
+
+    loans = (Source("emprunts e JOIN livres l ON e.id_livre = l.id_livre",
+                    id_emprunt='e.id_emprunt', id_livre='e.id_livre', titre='l.titre',
+                    date_emprunt='e.date_emprunt', date_retour_prevue='e.date_retour_prevue',
+                    id_etudiant='e.id_etudiant')
+             .where('e.date_retour IS NULL').order_by('date_retour_prevue', 'id_emprunt'))
+    if request.args.get('overdue', 'false').lower() == 'true':
+        loans.where('e.date_retour_prevue < CURRENT_DATE')
+    query = FederatedQuery(loans).join(Source('etudiants', 'id_etudiant', 'nom', 'prenom', 'email'),
+                                       on='id_etudiant', how='left')
+    federation = Federation(get_connection, adapter, fanout, **FEDERATED_SETTINGS)
+    rows = federation.rows(query)
+    # Run the queries before the headers go out, so a failing backend still gets a JSON error
+    try:
+        first = next(rows, None)
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+    rows = chain([first] if first is not None else [], rows)
+
+    if fmt == 'ndjson':
+        body = ndjson_stream(rows, fast_json.dumps, lambda: {'summary': federation.summary()})
+        mimetype = 'application/x-ndjson'
+    else:
+        body = csv_stream(rows, LOAN_REPORT_COLUMNS)
+        mimetype = 'text/csv'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=open-loans.{fmt}'})
+
+@app.route('/admin/eligibility/reconcile', methods=['GET', 'POST'])
+def reconcile_eligibility():
+    """POST: reload every tracked student now and report drift. GET: store counters and last report"""
+    try:
+        if request.method == 'POST':
+            return jsonify({'status': 'success', 'reconciliation': eligibility.reconcile()})
+        return jsonify({'status': 'success', 'eligibility': eligibility.stats()})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/admin/overdue')
+def get_overdue_loans():
+    """Overdue loans from the background scan, oldest due date first: ?limit=N[&cursor=TOKEN]"""
+    overdue_scanner.start()
+    try:
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        limit = max(1, min(int(request.args.get('limit', 100)), STREAMING_SETTINGS['max_page_size']))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+    try:
+        if not overdue_scanner.ready:
+            # First request before the background scan finished: scan now
+            overdue_scanner.run()
+        items, next_after = overdue_scanner.page(after, limit)
+        today = date.today()
+        return jsonify({
+            'status': 'success',
+            'loans': [{'id_emprunt': loan_id, 'id_etudiant': student_id, 'id_livre': book_id,
+                       'date_retour_prevue': due_date.isoformat(), 'days_overdue': (today - due_date).days}
+                      for loan_id, student_id, book_id, due_date in items],
+            'next_cursor': encode_cursor(next_after) if next_after else None,
+            'scanner': overdue_scanner.stats()
         })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/admin/overdue/scan', methods=['GET', 'POST'])
+def scan_overdue():
+    """POST: scan for newly overdue loans now and return the run report. GET: the last scan reports"""
+    try:
+        if request.method == 'POST':
+            return jsonify({'status': 'success', 'run': overdue_scanner.run()})
+        return jsonify({'status': 'success', 'runs': list(overdue_scanner.history)})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/admin/overdue/notifications')
+def get_overdue_notifications():
+    """Notification batches of newly overdue loans still in the outbox, ?after=<batch number>"""
+    try:
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'after must be an integer'})
+    return jsonify({'status': 'success', 'batches': overdue_scanner.notifications(after)})
 
 if __name__ == '__main__':
-    import os
     port = int(os.environ.get('PORT', 5000))
+    start_worker()
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""ASGI entry point, for many concurrent requests in one process:
+
+    uvicorn asgi:application --port 5000
+
+/dashboard/<id> and /student/<enrollment|details|grades|search>/<db_name>
+are served on the event loop: their blocking driver calls run in one
+bounded thread pool per database and are awaited together, and a request
+whose client disconnects or that exceeds ASYNC_SETTINGS['request_timeout']
+is cancelled. Every other route is the Flask app behind asgiref's WSGI adapter.
+"""
+import asyncio
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as portal
+from config import ASYNC_SETTINGS, DATABASES, FANOUT_SETTINGS, POOL_SETTINGS
+from fanout import DeadlineExceeded
+
+
+class BackendExecutors:
+    """One bounded thread pool per database for the blocking driver calls.
+
+    Each pool is as large as the database's connection pool by default, so
+    a slow backend only queues work behind itself and cannot take the
+    threads the other databases need.
+    """
+
+    def __init__(self, databases, workers=None, default_workers=10):
+        workers = workers or {}
+        self.executors = {}
+        for name, db_config in databases.items():
+            size = workers.get(name) or db_config.get('pool', {}).get('max_size', default_workers)
+            self.executors[name] = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f'async-{name}')
+
+    def __contains__(self, db_name):
+        return db_name in self.executors
+
+    async def run(self, db_name, fn, *args):
+        """Await fn(*args) on the database's pool; cancelling drops it if it has not started yet"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executors[db_name], fn, *args)
+
+    async def run_with_deadline(self, db_name, fn, deadline, queue_timeout=None):
+        """run(), with the deadline counted from when fn starts on a thread, like FanOut.run.
+
+        Raises DeadlineExceeded for a call still queued after queue_timeout
+        seconds (its deadline when None), which is then dropped unstarted,
+        or still running deadline seconds after it started.
+        """
+        loop = asyncio.get_running_loop()
+        started = []
+        began = asyncio.Event()
+
+        def call():
+            started.append(time.monotonic())
+            loop.call_soon_threadsafe(began.set)
+            return fn()
+
+        task = self.executors[db_name].submit(call)
+        future = asyncio.wrap_future(task)
+        queue_timeout = deadline if queue_timeout is None else queue_timeout
+        waiter = asyncio.ensure_future(began.wait())
+        try:
+            await asyncio.wait({future, waiter}, timeout=queue_timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not started and task.cancel():
+                raise DeadlineExceeded(f"not started within {queue_timeout}s: {db_name} workers busy")
+            # Started meanwhile (or just now): its own deadline applies
+            remaining = (started[0] if started else time.monotonic()) + deadline - time.monotonic()
+            try:
+                return await asyncio.wait_for(future, max(remaining, 0))
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"no answer within {deadline}s") from None
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            waiter.cancel()
+
+    async def gather(self, tasks, deadlines=None, default_deadline=5.0, queue_timeout=None):
+        """Await {name: callable} concurrently and return ({name: result}, {name: exception}) like FanOut.run"""
+        deadlines = deadlines or {}
+        names = list(tasks)
+        outcomes = await asyncio.gather(
+            *(self.run_with_deadline(name, tasks[name], deadlines.get(name, default_deadline), queue_timeout)
+              for name in names),
+            return_exceptions=True
+        )
+        results, errors = {}, {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            elif isinstance(outcome, Exception):
+                errors[name] = outcome
+            else:
+                results[name] = outcome
+        return results, errors
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+executors = BackendExecutors(DATABASES, ASYNC_SETTINGS['workers'], POOL_SETTINGS['max_size'])
+
+# /student/<kind>/<db_name>: payload function, required query argument, message when missing
+STUDENT_PAYLOADS = {
+    'enrollment': (portal.student_enrollment_payload, 'id', 'Student ID required'),
+    'details': (portal.student_details_payload, 'id', 'Student ID required'),
+    'grades': (portal.student_grades_payload, 'id', 'Student ID required'),
+    'search': (portal.student_search_payload, 'name', 'Name required'),
+}
+
+
+async def dashboard(args, student_id):
+    student_id = int(student_id)
+    results, errors = await executors.gather(portal.dashboard_tasks(student_id),
+                                             FANOUT_SETTINGS['deadlines'], FANOUT_SETTINGS['default_deadline'],
+                                             FANOUT_SETTINGS['queue_timeout'])
+    return portal.dashboard_payload(student_id, results, errors)
+
+
+async def student(args, kind, db_name):
+    payload, argument, missing = STUDENT_PAYLOADS[kind]
+    value = args.get(argument)
+    if not value:
+        return {'status': 'error', 'message': missing}
+    if db_name not in executors:
+        return {'status': 'error', 'message': f'Unknown database: {db_name}'}
+    return await executors.run(db_name, payload, db_name, value)
+
+
+# (path pattern, route label as Flask names it, handler)
+ROUTES = [
+    (re.compile(r'^/dashboard/(?P<student_id>\d+)$'), lambda m: '/dashboard/<int:student_id>', dashboard),
+    (re.compile(r'^/student/(?P<kind>enrollment|details|grades|search)/(?P<db_name>[^/]+)$'),
+     lambda m: f"/student/{m.group('kind')}/<db_name>", student),
+]
+
+
+def closing(wsgi_app):
+    """asgiref never calls close() on the WSGI body; do it once the body is sent.
+
+    Flask relies on it for call_on_close hooks (request metrics) and to end
+    streamed responses, which hold a pooled connection until then.
+    """
+    def application(environ, start_response):
+        body = wsgi_app(environ, start_response)
+        try:
+            # Not `yield from`: it would close body itself when asgiref stops early, then again below
+            for chunk in body:
+                yield chunk
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+    return application
+
+
+class PortalASGI:
+    """Native async routes first, the Flask app for everything else"""
+
+    def __init__(self, flask_app, executors, request_timeout=10.0):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(closing(flask_app))
+        self.executors = executors
+        self.request_timeout = request_timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, label, handler in ROUTES:
+                match = pattern.match(scope['path'])
+                if match:
+                    return await self._serve(scope, receive, send, label(match), handler, match.groupdict())
+        return await self.wsgi(scope, receive, send)
+
+    async def _wait_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def _serve(self, scope, receive, send, route, handler, params):
+        start = time.perf_counter()
+        args = {key: values[0] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+        work = asyncio.ensure_future(handler(args, **params))
+        disconnect = asyncio.ensure_future(self._wait_disconnect(receive))
+        done, _ = await asyncio.wait({work, disconnect}, timeout=self.request_timeout,
+                                     return_when=asyncio.FIRST_COMPLETED)
+        disconnect.cancel()
+
+        if work not in done:
+            # Client gone or too slow: queued driver calls are dropped, running ones finish unobserved
+            work.cancel()
+            if disconnect in done:
+                self._observe(route, 499, start)
+                return
+            status, body = 504, {'status': 'error', 'message': f'No answer within {self.request_timeout}s'}
+        else:
+            try:
+                status, body = 200, work.result()
+            except Exception as e:
+                status, body = 200, {'status': 'error', 'message': str(e)}
+
+        # Same encoding as jsonify()
+        payload = (self.flask_app.json.dumps(body, separators=(',', ':')) + '\n').encode('utf-8')
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(payload)).encode())]})
+        await send({'type': 'http.response.body', 'body': payload})
+        self._observe(route, status, start)
+
+    def _observe(self, route, status, start):
+        if portal.metrics.enabled:
+            portal.request_latency.observe(time.perf_counter() - start, route=route, method='GET', status=str(status))
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                portal.start_worker()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executors.shutdown()
+                portal.stop_worker()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+application = PortalASGI(portal.app, executors, ASYNC_SETTINGS['request_timeout'])
@@ -0,0 +1,89 @@
+"""Sequential vs concurrent fan-out for the cross-database routes.
+
+Each backend is simulated by a sub-query that sleeps for its latency, so the
+numbers only depend on how the three sub-queries are scheduled:
+
+    python -m benchmarks.bench_fanout --latency oracle=40 mysql=25 postgresql=30
+"""
+import argparse
+import statistics
+import time
+
+from fanout import FanOut
+
+
+def make_task(latency_ms, fail=False):
+    def task():
+        time.sleep(latency_ms / 1000.0)
+        if fail:
+            raise RuntimeError("backend down")
+        return latency_ms
+    return task
+
+
+def run_sequential(tasks):
+    results, errors = {}, {}
+    for name, fn in tasks.items():
+        try:
+            results[name] = fn()
+        except Exception as e:
+            errors[name] = e
+    return results, errors
+
+
+def measure(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def parse_latencies(values):
+    latencies = {}
+    for value in values:
+        name, ms = value.split('=')
+        latencies[name] = float(ms)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', nargs='+', default=['oracle=40', 'mysql=25', 'postgresql=30'],
+                        help='simulated latency per backend, in ms')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--deadline', type=float, default=0.2,
+                        help='per-backend deadline in seconds for the slow-backend scenario')
+    args = parser.parse_args()
+
+    latencies = parse_latencies(args.latency)
+    fanout = FanOut(max_workers=2, default_deadline=5.0)
+    tasks = {name: make_task(ms) for name, ms in latencies.items()}
+
+    print(f"Backends: {', '.join(f'{n}={ms:g}ms' for n, ms in latencies.items())}")
+    print(f"Expected: sequential ~{sum(latencies.values()):g}ms, fan-out ~{max(latencies.values()):g}ms\n")
+    print(f"{'scenario':<34}{'median ms':>12}{'max ms':>10}")
+
+    seq = measure(lambda: run_sequential(tasks), args.iterations)
+    par = measure(lambda: fanout.run(tasks), args.iterations)
+    print(f"{'all backends up - sequential':<34}{seq[0]:>12.1f}{seq[1]:>10.1f}")
+    print(f"{'all backends up - fan-out':<34}{par[0]:>12.1f}{par[1]:>10.1f}")
+
+    # One backend hangs: sequential waits for it, fan-out gives up at the deadline
+    slow = dict(tasks)
+    slow_name = next(iter(latencies))
+    slow[slow_name] = make_task(args.deadline * 1000 * 5)
+    fanout_deadline = FanOut(max_workers=4, default_deadline=args.deadline)
+    seq_slow = measure(lambda: run_sequential(slow), 3)
+    par_slow = measure(lambda: fanout_deadline.run(slow), 3)
+    print(f"{slow_name + ' hanging - sequential':<34}{seq_slow[0]:>12.1f}{seq_slow[1]:>10.1f}")
+    print(f"{slow_name + ' hanging - fan-out':<34}{par_slow[0]:>12.1f}{par_slow[1]:>10.1f}")
+
+    print(f"\nSpeed-up: x{seq[0] / par[0]:.2f}")
+    fanout.shutdown()
+    fanout_deadline.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Listing payloads: per-row objects through jsonify vs ?format=columnar.
+
+Builds loan rows shaped like /admin/all-loans (ints, text, dates, decimals) and
+times turning them into the response body, the way listing_response does
+for each format, then reports payload size (raw and gzip):
+
+    python -m benchmarks.bench_formats --rows 100 1000 10000
+    python -m benchmarks.bench_formats --route /admin/all-loans --route /books/available
+
+objects: to_item dicts serialized by Flask's JSON provider (the default);
+columnar-json / columnar-orjson: column names once, rows as arrays, through
+fast_json with each backend (orjson only when installed). --route also
+requests real listing routes in both formats through the Flask test client.
+Results are saved under benchmarks/results/; with --baseline the run exits
+with status 1 when a p50 serialization time regressed by more than --threshold.
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import app
+import fast_json
+from benchmarks.harness import compare, print_table, save_results, summarize
+
+COLUMNS = ['id_emprunt', 'id_etudiant', 'id_livre', 'titre', 'auteur',
+           'date_emprunt', 'date_retour_prevue', 'date_retour', 'penalite']
+RESULT_KEY = ('format', 'rows', 'route')
+
+
+def loan_rows(count, seed=1):
+    random.seed(seed)
+    start = date(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        borrowed = start + timedelta(days=random.randint(0, 365))
+        returned = borrowed + timedelta(days=random.randint(1, 40)) if random.random() < 0.6 else None
+        rows.append((i + 1, random.randint(1, 50000), random.randint(1, 5000),
+                     f"Titre de l'ouvrage n°{random.randint(1, 5000)}", f"Auteur {random.randint(1, 800)}",
+                     borrowed, borrowed + timedelta(days=30), returned,
+                     Decimal(random.randint(0, 2000)) / 100))
+    return rows
+
+
+def to_item(row):
+    # Same shape as the /admin/all-loans to_item
+    return {
+        'id_emprunt': row[0],
+        'id_etudiant': row[1],
+        'id_livre': row[2],
+        'titre': row[3],
+        'auteur': row[4],
+        'date_emprunt': row[5].isoformat() if row[5] else None,
+        'date_retour_prevue': row[6].isoformat() if row[6] else None,
+        'date_retour': row[7].isoformat() if row[7] else None,
+        'penalite': row[8]
+    }
+
+
+def encoders():
+    """{format: rows -> bytes}, as listing_response builds each body"""
+    formats = {
+        'objects': lambda rows: app.app.json.dumps(
+            {'status': 'success', 'loans': [to_item(row) for row in rows]}).encode(),
+    }
+    for backend, encode in fast_json.BACKENDS.items():
+        formats[f'columnar-{backend}'] = lambda rows, encode=encode: encode(
+            {'status': 'success', 'columns': COLUMNS, 'loans': [list(row) for row in rows]})
+    return formats
+
+
+def time_calls(fn, repeat):
+    latencies, result = [], None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        call_start = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - call_start) * 1000)
+    return summarize(latencies, time.perf_counter() - start), result
+
+
+def sizes(body):
+    return {'bytes': len(body), 'gzip_bytes': len(gzip.compress(body, 6))}
+
+
+def bench_synthetic(row_counts, repeat):
+    results = []
+    with app.app.app_context():
+        for count in row_counts:
+            rows = loan_rows(count)
+            reference = None
+            for name, encode in encoders().items():
+                cell, body = time_calls(lambda: encode(rows), repeat)
+                decoded = json.loads(body)
+                if reference is None:
+                    reference = decoded['loans']
+                elif [dict(zip(decoded['columns'], values)) for values in decoded['loans']] != reference:
+                    print(f"{name}: rows differ from the objects format", file=sys.stderr)
+                results.append(dict(format=name, rows=count, route=None, **cell, **sizes(body)))
+    return results
+
+
+def bench_routes(routes, repeat):
+    results = []
+    client = app.app.test_client()
+    for route in routes:
+        for name, extra in (('objects', ''), ('columnar', 'format=columnar')):
+            url = route + (('&' if '?' in route else '?') + extra if extra else '')
+            cell, response = time_calls(lambda: client.get(url), repeat)
+            results.append(dict(format=name, rows=None, route=route, **cell, **sizes(response.data)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=20, help='serializations per cell')
+    parser.add_argument('--route', action='append', default=[], help='listing route to request in both formats')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/formats-<timestamp>.json)')
+    parser.add_argument('--baseline', help='previous result file to compare p50 times with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p50 regression (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    results = bench_synthetic(args.rows, args.repeat) + bench_routes(args.route, args.repeat)
+    print_table(results, [('format', 'format', 17), ('rows', 'rows', 7), ('route', 'route', 28),
+                          ('p50_ms', 'p50 ms', 10), ('p95_ms', 'p95 ms', 10),
+                          ('bytes', 'bytes', 11), ('gzip_bytes', 'gzip', 10)])
+    print(f"\nfast_json backend: {fast_json.BACKEND}")
+    path = save_results('formats', results, args.output)
+    print(f"Results saved to {path}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, RESULT_KEY, metric='p50_ms', threshold=args.threshold)
+        for regression in regressions:
+            cell = ' '.join(str(v) for v in regression['cell'].values() if v is not None)
+            print(f"REGRESSION {cell}: p50 {regression['before']} -> {regression['after']} ms "
+                  f"(+{regression['change']:.0%})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,422 @@
+"""Peak load: a weighted mix of portal routes replayed against app.py over HTTP.
+
+Student and book ids are Zipf-distributed (a few popular ones get most of
+the traffic). Each cell of the sweep starts --workers server processes of
+--threads request threads each (sharing one port with SO_REUSEPORT), then
+drives them closed-loop (--clients concurrent users sending back to back)
+or open-loop (--rate requests per second with Poisson arrivals, latency
+counted from the scheduled send time so a saturated server cannot hide
+its queue):
+
+    python -m benchmarks.bench_load --workers 1 2 4 --threads 8 --clients 4 16 64
+    python -m benchmarks.bench_load --rate 50 100 200 400 --duration 20
+    python -m benchmarks.bench_load --target http://127.0.0.1:5000 --clients 8 32 --mix dashboard=1
+
+With --server gunicorn each cell is the production mode instead: one
+`gunicorn -c gunicorn.conf.py` master with --workers pre-forked workers.
+
+The report is one throughput/latency point per route and load level; the
+saturation line of each server configuration is the last load level it
+kept up with: closed loop, more users still raised throughput by --knee
+(10%); open loop, throughput stayed within --knee of the offered rate. The
+generator is a single Python process (about 1,500 requests/s per core):
+client_cpu near 1.0 means the client, not the portal, is saturated, so run
+it on another machine or start several against --target. Results are
+saved under benchmarks/results/; with --baseline the run exits with status 1
+when a p95 latency regressed by more than --threshold.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import quote, urlsplit
+
+from benchmarks.harness import compare, print_table, save_results, summarize
+
+DEFAULT_MIX = ['dashboard=30', 'search=15', 'available=20', 'borrow=8', 'return=7', 'graduation=15',
+               'insert_grade=5']
+NAME_FRAGMENTS = ['Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Richard', 'Petit', 'Durand', 'Leroy',
+                  'Moreau', 'Simon', 'Laurent', 'Lefebvre', 'Michel', 'Garcia', 'Mar', 'Du', 'Le', 'Ber', 'Ro']
+RESULT_KEY = ('workers', 'threads', 'load', 'route')
+
+
+class Zipf:
+    """Ids 1..n drawn with probability proportional to 1 / rank**exponent.
+
+    Ranks are shuffled over the ids (seeded), so the popular students are
+    not simply the lowest ids.
+    """
+
+    def __init__(self, n, exponent, seed=1):
+        weights = [1.0 / rank ** exponent for rank in range(1, n + 1)]
+        total = 0.0
+        self.cumulative = []
+        for weight in weights:
+            total += weight
+            self.cumulative.append(total)
+        self.ids = list(range(1, n + 1))
+        random.Random(seed).shuffle(self.ids)
+
+    def draw(self, rng):
+        rank = bisect_left(self.cumulative, rng.random() * self.cumulative[-1])
+        return self.ids[min(rank, len(self.ids) - 1)]
+
+
+class Traffic:
+    """Builds the requests of the mix: (route, method, path, json body)"""
+
+    def __init__(self, mix, students, books, subjects, exponent):
+        self.routes = list(mix)
+        self.cumulative = list(itertools.accumulate(mix.values()))
+        self.students = Zipf(students, exponent, seed=1)
+        self.books = Zipf(books, exponent, seed=2)
+        self.subjects = subjects
+        self.loans = deque(maxlen=10000)  # loan ids borrowed by the run, returned by 'return'
+
+    def next_request(self, rng):
+        route = self.routes[bisect_left(self.cumulative, rng.random() * self.cumulative[-1])]
+        student_id = self.students.draw(rng)
+        if route == 'dashboard':
+            return route, 'GET', f'/dashboard/{student_id}', None
+        if route == 'graduation':
+            return route, 'GET', f'/graduation/{student_id}', None
+        if route == 'search':
+            return route, 'GET', f'/student/search/oracle?name={quote(rng.choice(NAME_FRAGMENTS))}', None
+        if route == 'available':
+            return route, 'GET', '/books/available?limit=50', None
+        if route == 'borrow':
+            return route, 'POST', '/books/borrow', {'student_id': student_id, 'book_id': self.books.draw(rng)}
+        if route == 'return':
+            try:
+                loan_id = self.loans.popleft()
+            except IndexError:
+                # Nothing borrowed yet: borrow instead
+                return 'borrow', 'POST', '/books/borrow', {'student_id': student_id,
+                                                           'book_id': self.books.draw(rng)}
+            return route, 'POST', '/books/return', {'loan_id': loan_id}
+        if route == 'insert_grade':
+            return route, 'POST', '/admin/insert/grade', {
+                'id_etudiant': student_id, 'id_matiere': rng.randint(1, self.subjects),
+                'note': round(rng.uniform(0, 20), 1), 'date_evaluation': date.today().isoformat()}
+        raise ValueError(f"Unknown route in mix: {route}")
+
+
+class Recorder:
+    """Latencies and outcomes per route for one load level"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.outcomes = {}
+
+    def record(self, route, latency_ms, outcome):
+        with self.lock:
+            self.latencies.setdefault(route, []).append(latency_ms)
+            counts = self.outcomes.setdefault(route, {'ok': 0, 'app_error': 0, 'http_error': 0})
+            counts[outcome] += 1
+
+    def cells(self, elapsed):
+        cells = []
+        for route in sorted(self.latencies):
+            outcomes = self.outcomes[route]
+            cell = dict(summarize(self.latencies[route], elapsed, outcomes['http_error']), route=route,
+                        app_errors=outcomes['app_error'])
+            cells.append(cell)
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        total = {key: sum(o[key] for o in self.outcomes.values()) for key in ('app_error', 'http_error')}
+        cells.append(dict(summarize(everything, elapsed, total['http_error']), route='all',
+                          app_errors=total['app_error']))
+        return cells
+
+
+def send(base, traffic, request_spec, timeout):
+    """One request on a fresh connection: (outcome, response body or None)"""
+    route, method, path, body = request_spec
+    host, port = base
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        conn.request(method, path, payload, headers)
+        response = conn.getresponse()
+        data = response.read()
+    except (OSError, http.client.HTTPException):
+        return 'http_error', None
+    finally:
+        conn.close()
+    if response.status != 200:
+        return 'http_error', None
+    try:
+        result = json.loads(data)
+    except ValueError:
+        return 'ok', None
+    if isinstance(result, dict) and result.get('status') == 'error':
+        return 'app_error', result
+    if route == 'borrow' and isinstance(result, dict) and result.get('loan_id'):
+        traffic.loans.append(result['loan_id'])
+    return 'ok', result
+
+
+def run_closed(base, traffic, clients, duration, think_ms, timeout, recorder):
+    deadline = time.monotonic() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            spec = traffic.next_request(rng)
+            start = time.perf_counter()
+            outcome, _ = send(base, traffic, spec, timeout)
+            if recorder is not None:
+                recorder.record(spec[0], (time.perf_counter() - start) * 1000, outcome)
+            if think_ms:
+                time.sleep(rng.expovariate(1000.0 / think_ms))
+
+    threads = [threading.Thread(target=client, args=(seed,), daemon=True) for seed in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(duration + timeout + 5)
+
+
+def run_open(base, traffic, rate, duration, timeout, max_inflight, recorder):
+    rng = random.Random(rate)
+    executor = ThreadPoolExecutor(max_workers=max_inflight)
+
+    def fire(spec, scheduled):
+        outcome, _ = send(base, traffic, spec, timeout)
+        if recorder is not None:
+            # From the scheduled send time: includes the wait for a free sender
+            recorder.record(spec[0], (time.perf_counter() - scheduled) * 1000, outcome)
+
+    start = time.perf_counter()
+    next_at = start
+    while next_at - start < duration:
+        next_at += rng.expovariate(rate)
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        executor.submit(fire, traffic.next_request(rng), next_at)
+    executor.shutdown(wait=True)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(base, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(*base, timeout=2)
+            conn.request('GET', '/ready')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def start_servers(workers, threads, port, timeout, server='werkzeug'):
+    if server == 'gunicorn':
+        processes = [subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                                       '--workers', str(workers), '--threads', str(threads),
+                                       '--bind', f'127.0.0.1:{port}', 'app:app'],
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)]
+    else:
+        processes = [subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_load', '--serve', str(port),
+                                       '--threads', str(threads)],
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                     for _ in range(workers)]
+    # Each process must be listening before the port is considered ready
+    base = ('127.0.0.1', port)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not wait_ready(base, 1):
+        if any(process.poll() is not None for process in processes):
+            break
+    time.sleep(0.5 + 0.2 * workers)
+    return processes
+
+
+def stop_servers(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def serve(port, threads):
+    """Server process of one sweep cell: app.py behind `threads` request threads"""
+    from werkzeug.serving import BaseWSGIServer
+    import app
+
+    class PooledServer(BaseWSGIServer):
+        # HTTP/1.0, one connection per request: idle keep-alive connections would pin the threads
+        def __init__(self, *args, **kwargs):
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+            super().__init__(*args, **kwargs)
+
+        def server_bind(self):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            super().server_bind()
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._process, request, client_address)
+
+        def _process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    app.start_worker()
+    server = PooledServer('127.0.0.1', port, app.app)
+    server.request_queue_size = 1024
+    server.serve_forever()
+
+
+def knee(points, gain):
+    """Last load level the portal kept up with.
+
+    Closed loop: adding users still raised throughput by `gain` over the
+    level before. Open loop: throughput stayed within `gain` of the
+    offered rate (beyond that requests queue up without bound).
+    """
+    best = None
+    previous = None
+    for point in points:
+        throughput = point['throughput'] or 0
+        if point.get('offered') is not None:
+            scaling = throughput >= point['offered'] * (1 - gain)
+        else:
+            scaling = previous is None or throughput >= (previous['throughput'] or 0) * (1 + gain)
+        if not scaling:
+            break
+        best = previous = point
+    return best
+
+
+def parse_mix(values):
+    mix = {}
+    for value in values:
+        name, weight = value.split('=')
+        mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mix', nargs='+', default=DEFAULT_MIX, help='route=weight (%s)' % ' '.join(DEFAULT_MIX))
+    parser.add_argument('--workers', type=int, nargs='+', default=[1], help='server processes per cell')
+    parser.add_argument('--threads', type=int, nargs='+', default=[8], help='request threads per server process')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16, 64],
+                        help='closed loop: concurrent users per load level')
+    parser.add_argument('--rate', type=float, nargs='+', help='open loop: requests per second per load level')
+    parser.add_argument('--think', type=float, default=0.0, help='closed loop: mean think time between requests, ms')
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds per load level')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds before each load level')
+    parser.add_argument('--students', type=int, default=1000, help='student ids drawn from 1..N')
+    parser.add_argument('--books', type=int, default=500, help='book ids drawn from 1..N')
+    parser.add_argument('--subjects', type=int, default=10, help='subject ids of inserted grades')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of the id popularity')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds per request')
+    parser.add_argument('--max-inflight', type=int, default=512, help='open loop: concurrent senders')
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug',
+                        help='server of each cell: --workers werkzeug processes, or one gunicorn master')
+    parser.add_argument('--target', help='base URL of a running portal (no servers started, one cell)')
+    parser.add_argument('--knee', type=float, default=0.1, help='throughput gain that still counts as scaling')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/load-<timestamp>.json)')
+    parser.add_argument('--baseline', help='previous result file to compare p95 latencies with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 regression (0.2 = 20%%)')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.threads[0])
+
+    traffic = Traffic(parse_mix(args.mix), args.students, args.books, args.subjects, args.zipf)
+    levels = [('rate', rate) for rate in args.rate] if args.rate else [('clients', n) for n in args.clients]
+    if args.target:
+        target = urlsplit(args.target)
+        configurations = [(None, None)]
+    else:
+        configurations = list(itertools.product(args.workers, args.threads))
+
+    results, saturation = [], []
+    for workers, threads in configurations:
+        processes = []
+        if args.target:
+            base = (target.hostname, target.port or 80)
+        else:
+            base = ('127.0.0.1', free_port())
+            processes = start_servers(workers, threads, base[1], timeout=60, server=args.server)
+        try:
+            if not wait_ready(base, 60):
+                print(f"workers={workers} threads={threads}: portal not ready, skipped", file=sys.stderr)
+                continue
+            points = []
+            for kind, level in levels:
+                for recorder, seconds in ((None, args.warmup), (Recorder(), args.duration)):
+                    if not seconds:
+                        continue
+                    start, cpu_start = time.perf_counter(), time.process_time()
+                    if kind == 'rate':
+                        run_open(base, traffic, level, seconds, args.timeout, args.max_inflight, recorder)
+                    else:
+                        run_closed(base, traffic, level, seconds, args.think, args.timeout, recorder)
+                    elapsed = time.perf_counter() - start
+                # Share of a core the generator used: near 1.0 it, not the portal, is the bottleneck
+                client_cpu = round((time.process_time() - cpu_start) / elapsed, 2)
+                if client_cpu > 0.9:
+                    print(f"{kind}={level:g}: load generator at {client_cpu:.0%} CPU, "
+                          "numbers are capped by the client", file=sys.stderr)
+                for cell in recorder.cells(elapsed):
+                    results.append(dict(cell, workers=workers, threads=threads, load=f'{kind}={level:g}'))
+                    if cell['route'] == 'all':
+                        results[-1]['client_cpu'] = client_cpu
+                        points.append(dict(results[-1], offered=level if kind == 'rate' else None))
+            best = knee(points, args.knee)
+            if best:
+                saturation.append(best)
+        finally:
+            stop_servers(processes)
+
+    columns = [('workers', 'workers', 9), ('threads', 'threads', 9), ('load', 'load', 14), ('route', 'route', 14),
+               ('throughput', 'req/s', 9), ('p50_ms', 'p50 ms', 10), ('p95_ms', 'p95 ms', 10),
+               ('p99_ms', 'p99 ms', 10), ('app_errors', 'app err', 9), ('errors', 'http err', 9)]
+    print_table(results, columns)
+    print("\nSaturation (last load level the portal kept up with, all routes):")
+    print_table(saturation, [column for column in columns if column[0] != 'route']
+                + [('client_cpu', 'client cpu', 12)])
+    path = save_results('load', results, args.output)
+    print(f"\nResults saved to {path}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, RESULT_KEY, metric='p95_ms', threshold=args.threshold)
+        for regression in regressions:
+            cell = ' '.join(f'{k}={v}' for k, v in regression['cell'].items())
+            print(f"REGRESSION {cell}: p95 {regression['before']} -> {regression['after']} ms "
+                  f"(+{regression['change']:.0%})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
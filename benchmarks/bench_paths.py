@@ -0,0 +1,173 @@
+"""ODBC (pool + SQLAdapter) vs direct drivers, per query type, warm and cold.
+
+Runs every portal query against the databases configured in config.py
+(DATABASES for ODBC, DIRECT_DATABASES for the drivers), so point those at
+local stand-in instances first:
+
+    python -m benchmarks.bench_paths --concurrency 1 4 16 --iterations 200
+    python -m benchmarks.bench_paths --baseline benchmarks/results/paths-20240101-120000.json
+
+Results are saved as JSON under benchmarks/results/; with --baseline the run
+exits with status 1 when a p95 latency regressed by more than --threshold.
+"""
+import argparse
+import re
+import sys
+
+import app
+from benchmarks.harness import compare, print_table, run_concurrent, save_results
+
+# (query type, database, registered statement, takes the student id)
+QUERIES = [
+    ('enrollment', 'oracle', 'student_enrollment', True),
+    ('profile', 'oracle', 'student_profile', True),
+    ('tuition', 'oracle', 'tuition_payment', True),
+    ('gpa', 'mysql', 'student_gpa', True),
+    ('grades', 'mysql', 'student_grades', True),
+    ('credits', 'mysql', 'credits_validation', True),
+    ('borrowed', 'postgresql', 'borrowed_books_count', True),
+    ('overdue', 'postgresql', 'overdue_books', True),
+    ('available_books', 'postgresql', 'available_books', False),
+]
+
+DIRECT_CONNECT = {
+    'oracle': app.get_oracle_connection_direct,
+    'mysql': app.get_mysql_connection_direct,
+    'postgresql': app.get_postgres_connection_direct,
+}
+
+RESULT_KEY = ('path', 'mode', 'query', 'concurrency')
+
+
+def direct_sql(sql, db_name):
+    """Registry SQL uses qmark parameters: cx_Oracle wants :1, :2..., pymysql/psycopg2 %s"""
+    if db_name == 'oracle':
+        count = iter(range(1, sql.count('?') + 1))
+        return re.sub(r'\?', lambda _: f':{next(count)}', sql)
+    return sql.replace('%', '%%').replace('?', '%s')
+
+
+def run_query(conn, sql, params):
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    cursor.fetchall()
+    cursor.close()
+
+
+def odbc_operations(statement, params):
+    """(warm, cold) operations of the ODBC path for one query"""
+    db_name = statement['db_name']
+    db_type = app.DATABASES[db_name]['type']
+
+    def warm(_):
+        with app.get_connection(db_name) as (conn, _db_type):
+            app.adapter.execute(conn, statement['name'], db_type, params).fetchall()
+
+    def cold(_):
+        # Backend-aware: the embedded backend under PORTAL_BACKEND=embedded
+        conn = app.connect_database(app.DATABASES[db_name])
+        try:
+            run_query(conn, app.adapter.statement(statement['name'], db_type).sql, params)
+        finally:
+            conn.close()
+
+    return warm, cold
+
+
+def direct_operations(statement, params):
+    """(warm, cold) operations of the direct-driver path; warm keeps one connection per thread"""
+    db_name = statement['db_name']
+    db_type = app.DATABASES[db_name]['type']
+    sql = direct_sql(app.adapter.statement(statement['name'], db_type).sql, db_name)
+    connect = DIRECT_CONNECT[db_name]
+
+    def warm(conn):
+        run_query(conn, sql, params)
+
+    def cold(_):
+        conn = connect()
+        try:
+            run_query(conn, sql, params)
+        finally:
+            conn.close()
+
+    return (warm, connect, lambda conn: conn.close()), cold
+
+
+def bench(args):
+    results = []
+    paths = [path for path in args.paths if path != 'direct' or app.DIRECT_DRIVERS_AVAILABLE]
+    if 'direct' in args.paths and 'direct' not in paths:
+        print("Direct drivers not installed, skipping the direct path\n", file=sys.stderr)
+
+    for query, db_name, name, with_id in QUERIES:
+        if args.queries and query not in args.queries:
+            continue
+        statement = {'db_name': db_name, 'name': name}
+        params = [args.student_id] if with_id else []
+        for path in paths:
+            if path == 'odbc':
+                warm, cold = odbc_operations(statement, params)
+                # Fill the pool up front so warm numbers never include connection setup
+                app.pools.get(db_name).fill()
+                modes = {'warm': (warm, None, None), 'cold': (cold, None, None)}
+            else:
+                warm, cold = direct_operations(statement, params)
+                modes = {'warm': warm, 'cold': (cold, None, None)}
+            for mode in args.modes:
+                operation, setup, teardown = modes[mode]
+                for concurrency in args.concurrency:
+                    iterations = args.cold_iterations if mode == 'cold' else args.iterations
+                    # One untimed call per cell surfaces configuration errors early
+                    try:
+                        state = setup() if setup else None
+                        operation(state)
+                        if teardown:
+                            teardown(state)
+                    except Exception as e:
+                        print(f"{path}/{mode}/{query}: {e}", file=sys.stderr)
+                        results.append({'path': path, 'mode': mode, 'query': query, 'db': db_name,
+                                        'concurrency': concurrency, 'error': str(e)})
+                        break
+                    cell = run_concurrent(operation, concurrency, iterations, setup, teardown)
+                    results.append(dict(path=path, mode=mode, query=query, db=db_name,
+                                        concurrency=concurrency, **cell))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--iterations', type=int, default=200, help='operations per warm cell')
+    parser.add_argument('--cold-iterations', type=int, default=30,
+                        help='operations per cold cell (each one opens a connection)')
+    parser.add_argument('--paths', nargs='+', choices=['odbc', 'direct'], default=['odbc', 'direct'])
+    parser.add_argument('--modes', nargs='+', choices=['warm', 'cold'], default=['warm', 'cold'])
+    parser.add_argument('--queries', nargs='+', choices=[q[0] for q in QUERIES])
+    parser.add_argument('--student-id', type=int, default=1)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/paths-<timestamp>.json)')
+    parser.add_argument('--baseline', help='previous result file to compare p95 latencies with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 regression (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    results = bench(args)
+    app.pools.close_all()
+    print_table(results, [('path', 'path', 8), ('mode', 'mode', 6), ('query', 'query', 17),
+                          ('concurrency', 'conc', 6), ('throughput', 'ops/s', 10),
+                          ('p50_ms', 'p50 ms', 10), ('p95_ms', 'p95 ms', 10),
+                          ('p99_ms', 'p99 ms', 10), ('errors', 'errors', 8)])
+    path = save_results('paths', results, args.output)
+    print(f"\nResults saved to {path}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, RESULT_KEY, threshold=args.threshold)
+        for regression in regressions:
+            cell = ' '.join(str(v) for v in regression['cell'].values())
+            print(f"REGRESSION {cell}: p95 {regression['before']} -> {regression['after']} ms "
+                  f"(+{regression['change']:.0%})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
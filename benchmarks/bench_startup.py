@@ -0,0 +1,144 @@
+"""Cold start: app.py import time, pool readiness and time to the first good response.
+
+Every run is a fresh Python process that imports app.py, polls /ready the
+way a load balancer probe does, then requests --route until it gets a
+successful answer, like the first user request after a deploy:
+
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --variants lazy no-warmup --route /student/details/oracle?id=1
+
+Variants: lazy (as shipped: drivers imported on first use, pools warmed in
+the background), eager-imports (every driver imported before app.py, as it
+used to be) and no-warmup (pools filled by the first requests). Results are
+saved under benchmarks/results/; with --baseline the run exits with status 1
+when the p95 time to the first good response regressed by more than --threshold.
+"""
+import argparse
+import importlib
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import compare, percentile, print_table, save_results
+
+VARIANTS = ['lazy', 'eager-imports', 'no-warmup']
+DRIVER_MODULES = ['pyodbc', 'cx_Oracle', 'pymysql', 'psycopg2']
+RESULT_KEY = ('variant',)
+
+
+def child(variant, route, timeout):
+    """One cold start, measured in this process; prints a JSON line"""
+    start = time.monotonic()
+    if variant == 'eager-imports':
+        for name in DRIVER_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+    import config
+    if variant == 'no-warmup':
+        config.WARMUP_SETTINGS['enabled'] = False
+    import app
+    imported = time.monotonic()
+
+    client = app.app.test_client()
+    while client.get('/ready').status_code != 200 and time.monotonic() - start < timeout:
+        time.sleep(0.005)
+    routed = time.monotonic()
+
+    attempts, first_response, first_request, error = 0, None, None, None
+    while time.monotonic() - start < timeout:
+        attempts += 1
+        sent = time.monotonic()
+        response = client.get(route)
+        body = response.get_json(silent=True) or {}
+        if first_request is None:
+            first_request = time.monotonic() - sent
+        if response.status_code == 200 and body.get('status') not in ('error', 'partial'):
+            first_response = time.monotonic()
+            break
+        error = body.get('message') or f'HTTP {response.status_code}'
+        time.sleep(0.01)
+
+    def ms(moment):
+        return round((moment - start) * 1000, 2) if moment is not None else None
+
+    print(json.dumps({
+        'import_ms': ms(imported),
+        'ready_ms': ms(routed),
+        'first_response_ms': ms(first_response),
+        'first_request_ms': round(first_request * 1000, 2) if first_request is not None else None,
+        'attempts': attempts,
+        'error': None if first_response else error
+    }))
+
+
+def run_once(variant, route, timeout):
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_startup', '--child', variant, '--route', route,
+         '--timeout', str(timeout)],
+        capture_output=True, text=True, timeout=timeout + 30
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode or not lines:
+        return {'error': (completed.stderr.strip().splitlines() or ['no output'])[-1]}
+    # app.py may print warnings before the result line
+    return json.loads(lines[-1])
+
+
+def bench(args):
+    results = []
+    for variant in args.variants:
+        runs = [run_once(variant, args.route, args.timeout) for _ in range(args.runs)]
+        cell = {'variant': variant, 'runs': len(runs),
+                'errors': sum(1 for run in runs if run.get('error'))}
+        for metric in ('import_ms', 'ready_ms', 'first_response_ms', 'first_request_ms'):
+            values = sorted(run[metric] for run in runs if run.get(metric) is not None)
+            name = metric[:-3]
+            cell[f'{name}_p50_ms'] = percentile(values, 50)
+            cell[f'{name}_p95_ms'] = percentile(values, 95)
+        failures = [run['error'] for run in runs if run.get('error')]
+        if failures:
+            cell['last_error'] = failures[-1]
+            print(f"{variant}: {failures[-1]}", file=sys.stderr)
+        results.append(cell)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='cold starts per variant')
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=VARIANTS)
+    parser.add_argument('--route', default='/dashboard/1', help='first request sent after import')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds allowed per cold start')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/startup-<timestamp>.json)')
+    parser.add_argument('--baseline', help='previous result file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed p95 first response regression (0.2 = 20%%)')
+    parser.add_argument('--child', choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.route, args.timeout)
+
+    results = bench(args)
+    print_table(results, [('variant', 'variant', 15), ('import_p50_ms', 'import ms', 11),
+                          ('ready_p50_ms', 'ready ms', 10), ('first_response_p50_ms', '1st ok p50', 12),
+                          ('first_response_p95_ms', '1st ok p95', 12), ('first_request_p50_ms', '1st req ms', 12),
+                          ('errors', 'errors', 8)])
+    path = save_results('startup', results, args.output)
+    print(f"\nResults saved to {path}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, RESULT_KEY, metric='first_response_p95_ms',
+                              threshold=args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['cell']['variant']}: first good response p95 "
+                  f"{regression['before']} -> {regression['after']} ms (+{regression['change']:.0%})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
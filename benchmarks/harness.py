@@ -0,0 +1,136 @@
+"""Shared helpers for the benchmark scripts: timing, percentiles, result files
+and regression checks against a previous run."""
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies_ms, elapsed_s, errors=0):
+    """Throughput and latency percentiles of one benchmark cell"""
+    latencies = sorted(latencies_ms)
+    count = len(latencies)
+    return {
+        'operations': count,
+        'errors': errors,
+        'throughput': round(count / elapsed_s, 1) if elapsed_s else None,
+        'p50_ms': round(percentile(latencies, 50), 3) if count else None,
+        'p95_ms': round(percentile(latencies, 95), 3) if count else None,
+        'p99_ms': round(percentile(latencies, 99), 3) if count else None,
+        'max_ms': round(latencies[-1], 3) if count else None
+    }
+
+
+def run_concurrent(operation, concurrency, iterations, setup=None, teardown=None):
+    """Run `iterations` calls of operation(state) spread over `concurrency` threads.
+
+    setup() runs once per thread before timing starts and returns the
+    per-thread state (e.g. a warm connection); teardown(state) runs after.
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    ready = threading.Barrier(concurrency + 1)
+    per_thread = [iterations // concurrency + (1 if i < iterations % concurrency else 0)
+                  for i in range(concurrency)]
+
+    def worker(count):
+        state = setup() if setup else None
+        local, failed = [], 0
+        ready.wait()
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                operation(state)
+            except Exception:
+                failed += 1
+                continue
+            local.append((time.perf_counter() - start) * 1000)
+        if teardown:
+            teardown(state)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(count,)) for count in per_thread]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, time.perf_counter() - start, errors[0])
+
+
+def environment():
+    """Where the numbers come from, stored with every result file"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def save_results(suite, results, path=None):
+    """Write {'suite', 'environment', 'results'} as JSON and return the path"""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(RESULTS_DIR, f'{suite}-{stamp}.json')
+    with open(path, 'w') as f:
+        json.dump({'suite': suite, 'environment': environment(), 'results': results}, f, indent=2)
+    return path
+
+
+def compare(results, baseline_path, key_fields, metric='p95_ms', threshold=0.2):
+    """Cells whose metric got worse by more than threshold (20%) against a baseline file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+
+    def key(cell):
+        return tuple(cell.get(field) for field in key_fields)
+
+    previous = {key(cell): cell for cell in baseline}
+    regressions = []
+    for cell in results:
+        before = previous.get(key(cell))
+        if not before or not before.get(metric) or cell.get(metric) is None:
+            continue
+        change = (cell[metric] - before[metric]) / before[metric]
+        if change > threshold:
+            regressions.append({'cell': dict(zip(key_fields, key(cell))), 'before': before[metric],
+                                'after': cell[metric], 'change': round(change, 3)})
+    return regressions
+
+
+def print_table(rows, columns):
+    """Plain text table of dicts, one column per (key, header, width)"""
+    print(''.join(f'{header:>{width}}' if i else f'{header:<{width}}'
+                  for i, (_, header, width) in enumerate(columns)))
+    for row in rows:
+        cells = []
+        for i, (key, _, width) in enumerate(columns):
+            value = row.get(key)
+            text = '-' if value is None else (f'{value:.2f}' if isinstance(value, float) else str(value))
+            cells.append(f'{text:>{width}}' if i else f'{text:<{width}}')
+        print(''.join(cells))
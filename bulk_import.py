@@ -0,0 +1,220 @@
+import codecs
+import csv
+import io
+import json
+import time
+from datetime import date
+from itertools import islice
+
+
+def _text(value):
+    return str(value).strip()
+
+def _optional_text(value):
+    return _text(value) if value not in (None, '') else ''
+
+def _date(value):
+    return value if isinstance(value, date) else date.fromisoformat(_text(value))
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return _text(value).lower() in ('1', 'true', 't', 'yes', 'oui')
+
+
+# What each importable entity looks like: target database, table and
+# columns as (name, converter, default). Columns without a default are required.
+REQUIRED = object()
+
+ENTITIES = {
+    'student': {
+        'db_name': 'oracle',
+        'table': 'etudiants',
+        'columns': [
+            ('id_etudiant', int, REQUIRED),
+            ('nom', _text, REQUIRED),
+            ('prenom', _text, REQUIRED),
+            ('email', _text, REQUIRED),
+            ('telephone', _optional_text, ''),
+            ('adresse', _optional_text, ''),
+            ('statut', _text, 'INSCRIT'),
+        ]
+    },
+    'grade': {
+        'db_name': 'mysql',
+        'table': 'notes',
+        'columns': [
+            ('id_etudiant', int, REQUIRED),
+            ('id_matiere', int, REQUIRED),
+            ('note', float, REQUIRED),
+            ('date_evaluation', _date, REQUIRED),
+        ]
+    },
+    'book': {
+        'db_name': 'postgresql',
+        'table': 'livres',
+        'columns': [
+            ('id_livre', int, REQUIRED),
+            ('titre', _text, REQUIRED),
+            ('auteur', _text, REQUIRED),
+            ('categorie', _text, 'Général'),
+            ('disponible', _bool, True),
+        ]
+    }
+}
+
+
+def read_records(stream, fmt):
+    """Yield (line_number, dict) from a binary CSV or JSON-lines stream, lazily"""
+    text = codecs.getreader('utf-8-sig')(stream)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+                continue
+            yield line_number, record
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def to_row(columns, record):
+    """Convert a record into a tuple of column values, or raise ValueError"""
+    if isinstance(record, Exception):
+        raise ValueError(f"invalid JSON: {record}")
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+    row = []
+    for name, convert, default in columns:
+        value = record.get(name)
+        if value is None or value == '':
+            if default is REQUIRED:
+                raise ValueError(f"missing field {name}")
+            row.append(default)
+            continue
+        try:
+            row.append(convert(value))
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid value for {name}: {value!r}")
+    return tuple(row)
+
+
+def insert_rows(conn, db_type, adapter, table, column_names, rows):
+    """Insert rows with the fastest path available for the SGBD"""
+    raw = getattr(conn, 'raw', conn)
+    cursor = raw.cursor()
+    db_type = db_type.upper()
+
+    if db_type == 'POSTGRESQL' and hasattr(cursor, 'copy_expert'):
+        # Direct psycopg2 connection (ODBC has no COPY): stream the batch through COPY
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(adapter.get_copy_query(db_type, table, column_names), buffer)
+    elif db_type in ('MYSQL', 'POSTGRESQL'):
+        # Multi-row VALUES lists, as few statements as the bind limit allows
+        per_statement = adapter.get_multirow_insert_size(db_type, len(column_names))
+        for start in range(0, len(rows), per_statement):
+            chunk = rows[start:start + per_statement]
+            query = adapter.get_bulk_insert_query(db_type, table, column_names, len(chunk))
+            cursor.execute(query, [value for row in chunk for value in row])
+    else:
+        # Oracle (and anything else): ODBC parameter arrays
+        if hasattr(cursor, 'fast_executemany'):
+            cursor.fast_executemany = True
+        cursor.executemany(adapter.get_bulk_insert_query(db_type, table, column_names, 1), rows)
+    cursor.close()
+
+
+class BulkImporter:
+    """Stream records into one table, committing every batch_size rows"""
+
+    def __init__(self, get_connection, adapter, entity, batch_size=1000, max_rejected=100):
+        self.get_connection = get_connection
+        self.adapter = adapter
+        self.spec = ENTITIES[entity]
+        self.entity = entity
+        self.batch_size = batch_size
+        self.max_rejected = max_rejected
+        self.rejected = []
+        self.rejected_count = 0
+        self.inserted = 0
+        self.elapsed = 0.0
+
+    def _reject(self, line_number, reason):
+        self.rejected_count += 1
+        if len(self.rejected) < self.max_rejected:
+            self.rejected.append({'line': line_number, 'reason': reason})
+
+    def _write_batch(self, conn, db_type, column_names, batch):
+        """Insert a batch; on failure retry row by row to isolate the bad rows"""
+        try:
+            insert_rows(conn, db_type, self.adapter, self.spec['table'], column_names,
+                        [row for _, row in batch])
+            conn.commit()
+            return len(batch)
+        except Exception:
+            conn.rollback()
+        inserted = 0
+        for line_number, row in batch:
+            try:
+                insert_rows(conn, db_type, self.adapter, self.spec['table'], column_names, [row])
+                conn.commit()
+                inserted += 1
+            except Exception as e:
+                conn.rollback()
+                self._reject(line_number, str(e))
+        return inserted
+
+    def run(self, records):
+        """Import (line_number, record) pairs, yielding a progress report per batch"""
+        columns = self.spec['columns']
+        column_names = [name for name, _, _ in columns]
+        start = time.perf_counter()
+        with self.get_connection(self.spec['db_name']) as (conn, db_type):
+            batch_number = 0
+            records = iter(records)
+            while True:
+                chunk = list(islice(records, self.batch_size))
+                if not chunk:
+                    break
+                batch_number += 1
+                batch_start = time.perf_counter()
+                batch = []
+                for line_number, record in chunk:
+                    try:
+                        batch.append((line_number, to_row(columns, record)))
+                    except ValueError as e:
+                        self._reject(line_number, str(e))
+                inserted = self._write_batch(conn, db_type, column_names, batch) if batch else 0
+                self.inserted += inserted
+                batch_elapsed = time.perf_counter() - batch_start
+                yield {
+                    'batch': batch_number,
+                    'rows': len(chunk),
+                    'inserted': inserted,
+                    'rejected': len(chunk) - inserted,
+                    'elapsed_ms': round(batch_elapsed * 1000, 2),
+                    'rows_per_sec': round(len(chunk) / batch_elapsed, 1) if batch_elapsed else None
+                }
+        self.elapsed = time.perf_counter() - start
+
+    def summary(self):
+        total = self.inserted + self.rejected_count
+        return {
+            'entity': self.entity,
+            'table': self.spec['table'],
+            'rows': total,
+            'inserted': self.inserted,
+            'rejected': self.rejected_count,
+            'rejected_rows': self.rejected,
+            'execution_time': round(self.elapsed * 1000, 2),
+            'rows_per_sec': round(total / self.elapsed, 1) if self.elapsed else None
+        }
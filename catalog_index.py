@@ -0,0 +1,362 @@
+import heapq
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from operator import itemgetter
+
+from search_index import normalize
+
+WORD = re.compile(r'\w+')
+
+
+def words(text):
+    return WORD.findall(normalize(text))
+
+
+def bit_positions(mask):
+    """Positions of the set bits of mask, ascending"""
+    digits = bin(mask)[:1:-1]  # bit 0 first
+    positions, i = [], digits.find('1')
+    while i != -1:
+        positions.append(i)
+        i = digits.find('1', i + 1)
+    return positions
+
+
+def to_bitmap(positions, size):
+    """Bitmap (int) with the given bit positions set"""
+    digits = bytearray(b'0') * size
+    for position in positions:
+        digits[position] = 49  # '1'
+    digits.reverse()
+    return int(digits, 2) if size else 0
+
+
+class CatalogIndex:
+    """Inverted index over livres.
+
+    Every book gets a dense document number. Categories and availability,
+    few values each covering many books, are bitmaps (Python ints, one bit
+    per document); title and author words and authors, many values each
+    covering few books, are sets of documents turned into a bitmap when a
+    query uses them. Filters are then ANDs and facet counts bit counts.
+    Results are ordered like /books/available (title, then id) and paged
+    by a (title, id) keyset.
+    """
+
+    # Below this many matches, results are sorted directly rather than by walking the title order
+    SORT_THRESHOLD = 2000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = []         # document -> (id_livre, titre, auteur, categorie)
+        self._keys = []         # document -> (normalized titre, id_livre)
+        self._doc_of = {}       # id_livre -> document
+        self._words = {}        # title or author word -> set of documents
+        self._authors = {}      # auteur -> set of documents
+        self._categories = {}   # categorie -> bitmap
+        self._available = 0     # bitmap
+        self._vocabulary = None  # sorted words, built by the first prefix query
+        self._order = None       # documents by (title, id), built by the first large result
+        self.loaded_max_id = None  # highest id read from the database: add() leaves it alone
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _new_doc(self, book_id, titre, auteur, categorie):
+        doc = self._doc_of[book_id] = len(self._docs)
+        self._docs.append(None)
+        self._keys.append(None)
+        self._index_doc(doc, book_id, titre, auteur, categorie)
+        return doc
+
+    def _index_doc(self, doc, book_id, titre, auteur, categorie):
+        # Everything but the bitmaps, which load() builds in one go
+        self._docs[doc] = (book_id, titre, auteur, categorie)
+        self._keys[doc] = (normalize(titre), book_id)
+        for word in set(words(titre) + words(auteur)):
+            self._words.setdefault(word, set()).add(doc)
+        self._authors.setdefault(auteur, set()).add(doc)
+
+    def load(self, books):
+        """Index (id_livre, titre, auteur, categorie, disponible) rows into an empty index.
+
+        Bitmaps are built once at the end instead of growing one bit at a time.
+        """
+        categories, available = {}, []
+        with self._lock:
+            for book_id, titre, auteur, categorie, disponible in books:
+                doc = self._new_doc(book_id, titre, auteur, categorie)
+                categories.setdefault(categorie, []).append(doc)
+                if disponible:
+                    available.append(doc)
+                if self.loaded_max_id is None or book_id > self.loaded_max_id:
+                    self.loaded_max_id = book_id
+            size = len(self._docs)
+            self._categories = {categorie: to_bitmap(docs, size) for categorie, docs in categories.items()}
+            self._available = to_bitmap(available, size)
+
+    def add(self, book_id, titre, auteur, categorie, disponible=True):
+        """Index a book, replacing the previous fields of the same id"""
+        with self._lock:
+            doc = self._doc_of.get(book_id)
+            if doc is None:
+                doc = self._new_doc(book_id, titre, auteur, categorie)
+            else:
+                # Same document number, new fields
+                if self._order is not None:
+                    del self._order[bisect_left(self._order, self._keys[doc], key=self._keys.__getitem__)]
+                _, old_titre, old_auteur, old_categorie = self._docs[doc]
+                for word in set(words(old_titre) + words(old_auteur)):
+                    self._words[word].discard(doc)
+                self._authors[old_auteur].discard(doc)
+                self._categories[old_categorie] &= ~(1 << doc)
+                self._index_doc(doc, book_id, titre, auteur, categorie)
+            bit = 1 << doc
+            self._categories[categorie] = self._categories.get(categorie, 0) | bit
+            self._available = self._available | bit if disponible else self._available & ~bit
+            if self._order is not None:
+                insort(self._order, doc, key=self._keys.__getitem__)
+            if self._vocabulary is not None:
+                for word in set(words(titre) + words(auteur)):
+                    position = bisect_left(self._vocabulary, word)
+                    if position == len(self._vocabulary) or self._vocabulary[position] != word:
+                        self._vocabulary.insert(position, word)
+
+    def set_available(self, book_id, disponible):
+        """Flip the availability bit of a book; False when the book is not indexed"""
+        with self._lock:
+            doc = self._doc_of.get(book_id)
+            if doc is None:
+                return False
+            bit = 1 << doc
+            self._available = self._available | bit if disponible else self._available & ~bit
+            return True
+
+    def _word_docs(self, word, prefix):
+        if not prefix:
+            return self._words.get(word, set())
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._words)
+        start = bisect_left(self._vocabulary, word)
+        end = bisect_left(self._vocabulary, word + '\uffff')
+        if end - start == 1:
+            return self._words[self._vocabulary[start]]
+        return set().union(*(self._words[match] for match in self._vocabulary[start:end]))
+
+    def _filters(self, q, categories, auteur, disponible):
+        """{facet: bitmap} of each filter given (q: every word, the last one as a prefix)"""
+        filters = {}
+        size = len(self._docs)
+        terms = words(q)
+        if terms:
+            postings = sorted((self._word_docs(term, prefix=i == len(terms) - 1) for i, term in enumerate(terms)),
+                              key=len)
+            filters['q'] = to_bitmap(postings[0].intersection(*postings[1:]), size)
+        if categories:
+            mask = 0
+            for categorie in categories:
+                mask |= self._categories.get(categorie, 0)
+            filters['categorie'] = mask
+        if auteur:
+            filters['auteur'] = to_bitmap(self._authors.get(auteur, ()), size)
+        if disponible is not None:
+            filters['disponible'] = self._available if disponible else self._all() & ~self._available
+        return filters
+
+    def _all(self):
+        return (1 << len(self._docs)) - 1
+
+    def _combine(self, filters, skip=None):
+        mask = self._all()
+        for facet, bitmap in filters.items():
+            if facet != skip:
+                mask &= bitmap
+        return mask
+
+    def _page(self, mask, total, after, limit):
+        if total <= self.SORT_THRESHOLD:
+            docs = sorted(bit_positions(mask), key=self._keys.__getitem__)
+            keys = [self._keys[doc] for doc in docs]
+            start = bisect_right(keys, tuple(after)) if after else 0
+            return docs[start:start + limit + 1]
+        if self._order is None:
+            self._order = sorted(range(len(self._docs)), key=self._keys.__getitem__)
+        start = bisect_right(self._order, tuple(after), key=self._keys.__getitem__) if after else 0
+        digits = bin(mask)[:1:-1]  # bit 0 first, as in bit_positions
+        page = []
+        for doc in self._order[start:]:
+            if doc < len(digits) and digits[doc] == '1':
+                page.append(doc)
+                if len(page) > limit:
+                    break
+        return page
+
+    def _author_counts(self, mask, facet_limit):
+        if mask == self._all():
+            counts = ((auteur, len(docs)) for auteur, docs in self._authors.items() if docs)
+        else:
+            counts = Counter(map(itemgetter(2), map(self._docs.__getitem__, bit_positions(mask)))).items()
+        return dict(heapq.nlargest(facet_limit, counts, key=lambda item: item[1]))
+
+    def search(self, q=None, categories=(), auteur=None, disponible=None, after=None, limit=20, facet_limit=10):
+        """One page of (id_livre, titre, auteur, categorie, disponible), the total and facet counts.
+
+        A facet's counts apply every filter but its own, so each category
+        shows what picking it instead would return.
+        """
+        with self._lock:
+            filters = self._filters(q, categories, auteur, disponible)
+            mask = self._combine(filters)
+            total = mask.bit_count()
+            docs = self._page(mask, total, after, limit)
+            books = [self._docs[doc] + (bool(self._available >> doc & 1),) for doc in docs[:limit]]
+            next_after = self._keys[docs[limit - 1]] if len(docs) > limit else None
+            by_category = self._combine(filters, skip='categorie')
+            by_availability = self._combine(filters, skip='disponible')
+            facets = {
+                'categorie': {categorie: count for categorie, bitmap in self._categories.items()
+                              if (count := (bitmap & by_category).bit_count())},
+                'auteur': self._author_counts(self._combine(filters, skip='auteur'), facet_limit),
+                'disponible': {'true': (by_availability & self._available).bit_count(),
+                               'false': (by_availability & ~self._available).bit_count()}
+            }
+        return {'total': total, 'books': books, 'next_after': next_after, 'facets': facets}
+
+    def stats(self):
+        with self._lock:
+            return {'books': len(self._docs), 'available': self._available.bit_count(),
+                    'words': len(self._words), 'categories': len(self._categories), 'authors': len(self._authors)}
+
+
+class BookCatalog:
+    """CatalogIndex of the library, loaded once and kept current.
+
+    load_books(after_id) yields (id_livre, titre, auteur, categorie,
+    disponible) for the books with an id above after_id (all of them when
+    None). start() builds the index in the background (a search arriving
+    first waits for it), then loads new books every refresh_interval
+    seconds and rebuilds everything every full_reload_interval seconds,
+    which picks up availability changed by other processes. The portal's
+    own writes update it directly; they do not move the high-water mark of
+    the delta loads, so books loaded with lower ids are still picked up.
+    """
+
+    def __init__(self, load_books, refresh_interval=60, full_reload_interval=600, facet_limit=10):
+        self.load_books = load_books
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.facet_limit = facet_limit
+        self.index = None
+        self._pending = None     # writes made while a new index is being loaded
+        self._loaded_at = None
+        self._full_requested = False
+        self._build_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._refresher_pid = None
+        self.last_error = None
+        self.counters = {'searches': 0, 'full_loads': 0, 'delta_loads': 0, 'added': 0, 'updates': 0}
+
+    def _build(self):
+        with self._lock:
+            self._pending = []
+        index = CatalogIndex()
+        try:
+            index.load(self.load_books(None))
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            pending, self._pending = self._pending, None
+            # Replayed on the new index: its rows may have been read before these writes
+            for method, args in pending:
+                getattr(index, method)(*args)
+            self.index = index
+        self._loaded_at = time.monotonic()
+        self.counters['full_loads'] += 1
+
+    def _refresh(self):
+        index = self.index
+        added = 0
+        for book_id, titre, auteur, categorie, disponible in self.load_books(index.loaded_max_id):
+            index.add(book_id, titre, auteur, categorie, bool(disponible))
+            if index.loaded_max_id is None or book_id > index.loaded_max_id:
+                index.loaded_max_id = book_id
+            added += 1
+        self.counters['delta_loads'] += 1
+        self.counters['added'] += added
+
+    def refresh(self, missing_only=False):
+        """Build the index when missing, expired or asked for, otherwise load the new books"""
+        with self._build_lock:
+            if missing_only and self.index is not None:
+                return
+            try:
+                if (self.index is None or self._full_requested
+                        or time.monotonic() - self._loaded_at >= self.full_reload_interval):
+                    self._full_requested = False
+                    self._build()
+                else:
+                    self._refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+
+    def start(self):
+        """Start the loading thread once per process (again in a forked child)"""
+        if self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+            self._wake = threading.Event()
+        threading.Thread(target=self._refresh_forever, name='book-catalog', daemon=True).start()
+
+    def _refresh_forever(self):
+        pid = os.getpid()
+        while self._refresher_pid == pid:
+            try:
+                self.refresh()
+            except Exception:
+                pass
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+    def request_refresh(self):
+        """Rebuild now rather than at the next interval: a bulk insert may add ids below the loaded ones"""
+        self._full_requested = True
+        self._wake.set()
+
+    def _apply(self, method, *args):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((method, args))
+            index = self.index
+        if index is not None:
+            getattr(index, method)(*args)
+            self.counters['updates'] += 1
+
+    def add(self, book_id, titre, auteur, categorie, disponible=True):
+        self._apply('add', book_id, titre, auteur, categorie, disponible)
+
+    def set_available(self, book_id, disponible):
+        self._apply('set_available', book_id, disponible)
+
+    def search(self, **criteria):
+        """CatalogIndex.search, building the index first if this process has none yet"""
+        self.start()
+        if self.index is None:
+            self.refresh(missing_only=True)
+        self.counters['searches'] += 1
+        return self.index.search(facet_limit=self.facet_limit, **criteria)
+
+    def stats(self):
+        return dict(self.counters, index=self.index.stats() if self.index is not None else None,
+                    last_error=self.last_error)
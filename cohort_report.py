@@ -0,0 +1,69 @@
+from federated import FederatedQuery, Source
+
+REPORT_COLUMNS = ['id_etudiant', 'nom', 'prenom', 'tuition_paid', 'total_credits', 'credits_validated',
+                  'overdue_books_count', 'no_overdue_books', 'eligible_for_graduation']
+
+
+class CohortReport:
+    """Graduation eligibility of a whole cohort with one aggregate query per backend.
+
+    A federated query: students with their paid-tuition count (Oracle),
+    credits of passed subjects (MySQL) and overdue loans (PostgreSQL), each
+    grouped by id_etudiant where it is stored and merge-joined on it as the
+    Oracle rows stream in, so memory never holds the report itself.
+    """
+
+    def __init__(self, federation, required_credits=180, statut=None):
+        self.federation = federation
+        self.required_credits = required_credits
+        self.statut = statut
+        self.counts = {'students': 0, 'eligible': 0, 'tuition_unpaid': 0,
+                       'credits_missing': 0, 'overdue_books': 0}
+
+    def query(self):
+        students = Source("etudiants e LEFT JOIN paiements p ON p.id_etudiant = e.id_etudiant "
+                          "AND p.type_paiement = 'SCOLARITE' AND p.statut = 'PAYE'",
+                          id_etudiant='e.id_etudiant', nom='e.nom', prenom='e.prenom',
+                          frais_payes='COUNT(p.id_etudiant)').group_by('e.id_etudiant', 'e.nom', 'e.prenom')
+        if self.statut:
+            students.where('e.statut = ?', self.statut)
+        credits = (Source("notes n JOIN matieres m ON n.id_matiere = m.id_matiere",
+                          id_etudiant='n.id_etudiant', total_credits='SUM(m.credits)')
+                   .where('n.note >= 10').group_by('n.id_etudiant'))
+        overdue = (Source("emprunts", "id_etudiant", livres_en_retard='COUNT(*)')
+                   .where('date_retour IS NULL').where('date_retour_prevue < CURRENT_DATE').group_by('id_etudiant'))
+        return (FederatedQuery(students)
+                .join(credits, on='id_etudiant', how='left', defaults={'total_credits': 0})
+                .join(overdue, on='id_etudiant', how='left', defaults={'livres_en_retard': 0}))
+
+    def rows(self):
+        """Yield one eligibility dict per cohort student, ordered by id_etudiant"""
+        for row in self.federation.rows(self.query()):
+            tuition_paid = row['frais_payes'] > 0
+            total_credits = int(row['total_credits'] or 0)
+            overdue_count = int(row['livres_en_retard'])
+            eligible = tuition_paid and total_credits >= self.required_credits and not overdue_count
+
+            self.counts['students'] += 1
+            self.counts['eligible'] += eligible
+            self.counts['tuition_unpaid'] += not tuition_paid
+            self.counts['credits_missing'] += total_credits < self.required_credits
+            self.counts['overdue_books'] += overdue_count > 0
+            yield {
+                'id_etudiant': row['id_etudiant'],
+                'nom': row['nom'],
+                'prenom': row['prenom'],
+                'tuition_paid': tuition_paid,
+                'total_credits': total_credits,
+                'credits_validated': total_credits >= self.required_credits,
+                'overdue_books_count': overdue_count,
+                'no_overdue_books': overdue_count == 0,
+                'eligible_for_graduation': eligible
+            }
+
+    def summary(self):
+        stats = self.federation.summary()
+        execution_time = {source['database']: source['duration_ms'] for source in stats['sources']}
+        execution_time['total'] = stats.get('duration_ms')
+        return dict(self.counts, required_credits=self.required_credits, statut=self.statut,
+                    execution_time=execution_time, sources=stats['sources'])
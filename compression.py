@@ -0,0 +1,70 @@
+import gzip
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class ResponseCompressor:
+    """gzip / brotli for response bodies of at least min_size bytes.
+
+    Compression time is capped: once cpu_budget seconds have been spent
+    compressing within the current one-second window, bodies go out
+    uncompressed until the next window, so a burst of large listings
+    cannot turn the workers into compressors.
+    """
+
+    def __init__(self, enabled=True, min_size=1024, gzip_level=6, brotli_quality=4, cpu_budget=0.25):
+        self.enabled = enabled
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cpu_budget = cpu_budget
+        self._lock = threading.Lock()
+        self._window = 0
+        self._spent = 0.0
+        self.counters = {'compressed': 0, 'skipped_budget': 0, 'bytes_in': 0, 'bytes_out': 0, 'seconds': 0.0}
+
+    def encodings(self):
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def choose(self, accept_encodings):
+        """Best encoding the client accepts (werkzeug MIMEAccept of Accept-Encoding), or None"""
+        return accept_encodings.best_match(self.encodings())
+
+    def _within_budget(self):
+        now = int(time.monotonic())
+        with self._lock:
+            if now != self._window:
+                self._window, self._spent = now, 0.0
+            if self._spent >= self.cpu_budget:
+                self.counters['skipped_budget'] += 1
+                return False
+            return True
+
+    def compress(self, body, encoding):
+        """Compressed body, or None when it is too small or the CPU budget is spent"""
+        if not self.enabled or len(body) < self.min_size or not self._within_budget():
+            return None
+        start = time.perf_counter()
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, self.gzip_level)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._spent += elapsed
+            self.counters['compressed'] += 1
+            self.counters['bytes_in'] += len(body)
+            self.counters['bytes_out'] += len(compressed)
+            self.counters['seconds'] += elapsed
+        return compressed
+
+    def stats(self):
+        with self._lock:
+            ratio = self.counters['bytes_out'] / self.counters['bytes_in'] if self.counters['bytes_in'] else None
+            return dict(self.counters, seconds=round(self.counters['seconds'], 3),
+                        ratio=round(ratio, 3) if ratio else None, encodings=list(self.encodings()))
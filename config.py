@@ -1,3 +1,5 @@
+import os
+
 # Configuration for database connections
 # DSNs must be configured in ODBC Data Source Administrator
 
@@ -14,4 +16,251 @@ DATABASES = {
         'dsn': 'PostgreSQLDSN',  # Replace with actual DSN name
         'type': 'POSTGRESQL'
     }
-}
\ No newline at end of file
+}
+
+# Database backend: 'odbc' (the DSNs above) or 'embedded', SQLite files in
+# place of the three databases to profile the portal without them
+# (PORTAL_BACKEND=embedded in the environment selects it)
+BACKEND = os.environ.get('PORTAL_BACKEND', 'odbc')
+
+# Embedded backend: directory of its SQLite files (None: <tmp>/portal-embedded),
+# rows seeded into new databases, and latency added to every statement
+# (latency_ms plus up to jitter_ms at random; connect_ms per new connection).
+# A database can override the latency with an 'embedded' key,
+# e.g. 'embedded': {'latency_ms': 2.0, 'jitter_ms': 1.0}
+EMBEDDED_SETTINGS = {
+    'path': None,
+    'seed': {'students': 1000, 'subjects': 20, 'grades_per_student': 10, 'books': 2000, 'loans': 500},
+    'latency_ms': 0.0,
+    'jitter_ms': 0.0,
+    'connect_ms': 0.0,
+    'busy_timeout': 10.0
+}
+
+# Connection pool settings, shared by every database.
+# A database can override any of them with a 'pool' key, e.g. 'pool': {'max_size': 20}
+POOL_SETTINGS = {
+    'min_size': 1,               # connections kept open even when idle
+    'max_size': 10,              # hard cap on open connections
+    'checkout_timeout': 5.0,     # seconds to wait for a free connection
+    'max_idle_time': 300,        # close connections idle for longer (seconds)
+    'max_lifetime': 3600,        # recycle connections older than this (seconds)
+    'validation_interval': 5.0,  # ping connections idle for longer before reuse
+    'leak_threshold': 60,        # report connections held for longer (seconds)
+    'statement_cache_size': 32   # prepared cursors kept per connection (0 to disable)
+}
+
+# Pool warm-up at boot: fill every pool in the background, /ready answers
+# 503 until each database has answered; seconds between attempts
+WARMUP_SETTINGS = {
+    'enabled': True,
+    'retry_interval': 5.0
+}
+
+# Circuit breaker per database: consecutive failures (requests or health
+# probes) that open it, seconds it stays open before a half-open trial.
+# A database can override them with a 'breaker' key.
+BREAKER_SETTINGS = {
+    'failure_threshold': 3,
+    'reset_timeout': 10.0
+}
+
+# Background health probes (validation query per database): seconds between
+# probes, seconds after which a probe counts as failed. Each probe first
+# closes the pool's expired idle connections (max_idle_time, max_lifetime)
+HEALTH_SETTINGS = {
+    'enabled': True,
+    'interval': 5.0,
+    'probe_timeout': 5.0
+}
+
+# Answers of the /dashboard and /graduation sub-queries served, marked stale,
+# while the database they come from has an open breaker (max_age in seconds)
+LAST_KNOWN_GOOD_SETTINGS = {
+    'enabled': True,
+    'max_entries': 50000,
+    'max_age': 3600
+}
+
+# Concurrent per-backend sub-queries for cross-database routes (/dashboard, /graduation)
+FANOUT_SETTINGS = {
+    'max_workers': 10,         # threads per database: all a hung database can tie up
+    'queue_timeout': None,     # seconds a sub-query may wait for a thread (None: its deadline)
+    'default_deadline': 5.0,   # seconds from the start of a sub-query, for databases missing from 'deadlines'
+    'deadlines': {
+        'oracle': 3.0,
+        'mysql': 3.0,
+        'postgresql': 3.0
+    }
+}
+
+# ASGI serving mode (uvicorn asgi:application): threads per database for the
+# blocking driver calls (default: the database's pool max_size) and seconds
+# after which a request is cancelled
+ASYNC_SETTINGS = {
+    'workers': {},
+    'request_timeout': 10.0
+}
+
+# Production serving (gunicorn -c gunicorn.conf.py app:app): pre-forked worker
+# processes of `threads` request threads each (workers None: one per CPU core,
+# or WEB_CONCURRENCY). Each worker has its own pools and caches, so a database
+# sees up to workers x pool max_size connections. A worker is replaced after
+# max_requests requests (plus up to max_requests_jitter, so they do not all
+# restart together). New workers wait up to warmup_timeout seconds for their
+# pools before taking requests; stopping ones answer 503 on /ready for
+# drain_delay seconds, then finish in-flight requests within graceful_timeout.
+# See docs/tuning.md for how these were chosen.
+SERVER_SETTINGS = {
+    'bind': f"0.0.0.0:{os.environ.get('PORT', 5000)}",
+    'workers': int(os.environ.get('WEB_CONCURRENCY', 0)) or None,
+    'threads': 16,
+    'preload_app': True,
+    'max_requests': 20000,
+    'max_requests_jitter': 2000,
+    'timeout': 30,
+    'graceful_timeout': 30,
+    'keepalive': 2,
+    'warmup_timeout': 10.0,
+    'drain_delay': 0.0
+}
+
+# Largest list of students accepted by /dashboard/batch
+BATCH_DASHBOARD_MAX_STUDENTS = 5000
+
+# Largest list of books accepted by /books/borrow/batch
+BORROW_BATCH_MAX_BOOKS = 20
+
+# Bulk imports (/admin/import/<entity>)
+BULK_IMPORT_SETTINGS = {
+    'batch_size': 1000,            # rows per transaction
+    'max_rejected_reported': 100,  # rejected rows listed in the report
+    'postgresql_copy': True        # PostgreSQL: COPY over a direct psycopg2 connection when installed
+}
+
+# Listing routes: rows read per fetchmany() and largest page for ?limit=
+STREAMING_SETTINGS = {
+    'fetch_size': 500,
+    'max_page_size': 1000
+}
+
+# In-process result cache for read-mostly lookups (LRU + TTL, memory capped)
+CACHE_SETTINGS = {
+    'enabled': True,
+    'max_entries': 10000,
+    'max_bytes': 32 * 1024 * 1024,
+    'default_ttl': 60,             # seconds
+    'ttl': {                       # per SQLAdapter template
+        'enrollment_count': 30,
+        'available_books_page': 30,
+        'student_profile': 300,
+        'student_details': 300
+    }
+}
+
+# Conditional GET on /books/available, /admin/all-books and /admin/all-loans:
+# ETags come from this process's per-table write counters, so they are only
+# honoured for max_age seconds (writes made by other processes are not seen)
+CONDITIONAL_SETTINGS = {
+    'enabled': True,
+    'max_age': 60
+}
+
+# Response compression (gzip, or brotli when the module is installed) for
+# bodies of at least min_size bytes; cpu_budget caps the seconds spent
+# compressing per second of wall time, beyond which bodies go out as is
+COMPRESSION_SETTINGS = {
+    'enabled': True,
+    'min_size': 1024,
+    'gzip_level': 6,
+    'brotli_quality': 4,
+    'cpu_budget': 0.25
+}
+
+# Credits of passed subjects needed to graduate
+GRADUATION_REQUIRED_CREDITS = 180
+
+# Federated queries (cohort and loan reports): rows read per fetch, seconds
+# allowed for the right-hand sources of the joins, rows a join holds in
+# memory before spilling to temporary files (spill_dir None: system default)
+# in spill_partitions hash partitions
+FEDERATED_SETTINGS = {
+    'fetch_size': 1000,
+    'build_timeout': 60,
+    'max_rows_in_memory': 200000,
+    'spill_partitions': 16,
+    'spill_dir': None
+}
+
+# Graduation eligibility store: students kept in memory, and how often
+# (seconds, 0 to disable) tracked students are reloaded to repair drift
+ELIGIBILITY_SETTINGS = {
+    'max_students': 100000,
+    'reconcile_interval': 900,
+    'reconcile_batch_size': 1000
+}
+
+# In-memory name index behind /student/search: databases indexed, seconds
+# between loads of new students and between full reloads, minimum trigram
+# similarity of a fuzzy match
+SEARCH_INDEX_SETTINGS = {
+    'databases': ('oracle',),
+    'refresh_interval': 60,
+    'full_reload_interval': 3600,
+    'min_similarity': 0.3
+}
+
+# In-memory catalog behind /books/search: seconds between loads of new
+# books and between full reloads (availability changed by other processes),
+# authors listed in the facet counts
+CATALOG_INDEX_SETTINGS = {
+    'refresh_interval': 60,
+    'full_reload_interval': 600,
+    'facet_limit': 10
+}
+
+# Background scan of overdue loans behind /admin/overdue: seconds between
+# scans, loans read per query, a full rescan every N scans (drops loans
+# returned elsewhere), loans per notification batch, batches kept in the
+# outbox of /admin/overdue/notifications, scan reports kept
+OVERDUE_SETTINGS = {
+    'enabled': True,
+    'interval': 300,
+    'page_size': 1000,
+    'full_scan_every': 12,
+    'notification_batch_size': 100,
+    'outbox_size': 50,
+    'history': 20
+}
+
+# Latency histograms and counters exposed on /metrics (bucket bounds in seconds)
+METRICS_SETTINGS = {
+    'enabled': True,
+    'buckets': (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+}
+
+# Direct driver connections (cx_Oracle, pymysql, psycopg2) used for the
+# ODBC comparison routes and benchmarks/bench_paths.py
+DIRECT_DATABASES = {
+    'oracle': {
+        'host': 'localhost',
+        'port': 1521,
+        'service_name': 'XE',
+        'user': 'system',
+        'password': 'password'
+    },
+    'mysql': {
+        'host': 'localhost',
+        'port': 3306,
+        'database': 'university',
+        'user': 'root',
+        'password': 'password'
+    },
+    'postgresql': {
+        'host': 'localhost',
+        'port': 5432,
+        'database': 'university',
+        'user': 'postgres',
+        'password': 'password'
+    }
+}
@@ -0,0 +1,426 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be checked out before the timeout"""
+
+
+class PooledConnection:
+    """Connection handed out by a ConnectionPool.
+
+    Behaves like the underlying ODBC connection, but close() is a no-op:
+    the connection goes back to the pool when the context manager exits.
+    """
+
+    def __init__(self, pool, raw, statement_cache_size=0):
+        self.pool = pool
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.checked_out_at = None
+        self.leak_reported = False
+        self.statement_cache_size = statement_cache_size
+        self._statement_cursors = OrderedDict()
+
+    def cursor(self):
+        return self.raw.cursor()
+
+    def statement_cursor(self, sql):
+        """(cursor, reused) dedicated to one SQL text on this connection.
+
+        The driver keeps the last statement prepared on each cursor, so
+        executing the same text again skips the prepare round trip.
+        """
+        if not self.statement_cache_size:
+            return self.raw.cursor(), False
+        cursor = self._statement_cursors.get(sql)
+        if cursor is not None:
+            self._statement_cursors.move_to_end(sql)
+            return cursor, True
+        cursor = self.raw.cursor()
+        self._statement_cursors[sql] = cursor
+        if len(self._statement_cursors) > self.statement_cache_size:
+            _, evicted = self._statement_cursors.popitem(last=False)
+            try:
+                evicted.close()
+            except Exception:
+                pass
+        return cursor, False
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        """Kept for compatibility - the pool owns the connection lifecycle"""
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class ConnectionPool:
+    """Bounded pool of connections to a single database"""
+
+    def __init__(self, name, connect, validation_query, min_size=1, max_size=10,
+                 checkout_timeout=5.0, max_idle_time=300, max_lifetime=3600,
+                 validation_interval=5.0, leak_threshold=60, statement_cache_size=32):
+        self.name = name
+        self._connect = connect
+        self.validation_query = validation_query
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.max_idle_time = max_idle_time
+        self.max_lifetime = max_lifetime
+        self.validation_interval = validation_interval
+        self.leak_threshold = leak_threshold
+        self.statement_cache_size = statement_cache_size
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()
+        self._in_use = set()
+        self._size = 0
+        self.counters = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'leaks': 0,
+            'created': 0,
+            'closed': 0,
+            'recycled': 0,
+            'validation_failures': 0,
+        }
+
+    def _check_fork(self):
+        # Sockets inherited from the parent process must never be reused
+        # (or closed) in the child: forget them and start from scratch.
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def after_fork(self):
+        """Drop every connection inherited from the parent process"""
+        self._reset_state()
+
+    def _open(self):
+        conn = PooledConnection(self, self._connect(), self.statement_cache_size)
+        with self._cond:
+            self.counters['created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self.counters['closed'] += 1
+            self._cond.notify()
+
+    def _is_expired(self, conn, now):
+        if self.max_lifetime and now - conn.created_at > self.max_lifetime:
+            return True
+        return bool(self.max_idle_time and now - conn.last_used > self.max_idle_time)
+
+    def _is_valid(self, conn, now):
+        if now - conn.last_used < self.validation_interval:
+            return True
+        try:
+            cursor = conn.raw.cursor()
+            cursor.execute(self.validation_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception as e:
+            logger.warning("Pool %s: validation failed: %s", self.name, e)
+            with self._cond:
+                self.counters['validation_failures'] += 1
+            return False
+
+    def acquire(self):
+        self._check_fork()
+        deadline = time.monotonic() + self.checkout_timeout
+        waited = False
+        while True:
+            with self._cond:
+                self._detect_leaks()
+                conn = None
+                while conn is None:
+                    if self._idle:
+                        conn = self._idle.pop()
+                    elif self._size < self.max_size:
+                        self._size += 1
+                        break
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.counters['timeouts'] += 1
+                            raise PoolTimeoutError(
+                                f"No {self.name} connection available after {self.checkout_timeout}s")
+                        if not waited:
+                            waited = True
+                            self.counters['waits'] += 1
+                        self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                now = time.monotonic()
+                if self._is_expired(conn, now):
+                    with self._cond:
+                        self.counters['recycled'] += 1
+                    self._discard(conn)
+                    continue
+                if not self._is_valid(conn, now):
+                    self._discard(conn)
+                    continue
+
+            with self._cond:
+                conn.checked_out_at = time.monotonic()
+                conn.leak_reported = False
+                self._in_use.add(conn)
+                self.counters['checkouts'] += 1
+            return conn
+
+    def release(self, conn, discard=False):
+        if conn.pool is not self or self._pid != os.getpid():
+            return
+        with self._cond:
+            if conn not in self._in_use:
+                return
+            self._in_use.discard(conn)
+        if not discard:
+            try:
+                # Never hand out a connection with an open transaction
+                conn.raw.rollback()
+            except Exception:
+                discard = True
+        if discard:
+            self._discard(conn)
+            return
+        conn.last_used = time.monotonic()
+        conn.checked_out_at = None
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            # release() rolls back, and drops the connection if that fails
+            self.release(conn)
+
+    def _detect_leaks(self):
+        # Called with the lock held
+        if not self.leak_threshold:
+            return
+        now = time.monotonic()
+        for conn in self._in_use:
+            if not conn.leak_reported and now - conn.checked_out_at > self.leak_threshold:
+                conn.leak_reported = True
+                self.counters['leaks'] += 1
+                logger.warning("Pool %s: connection checked out for more than %ss",
+                               self.name, self.leak_threshold)
+
+    def fill(self):
+        """Open connections until min_size is reached"""
+        self._check_fork()
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    def ping(self):
+        """Run the validation query on a pooled connection; raises when the database does not answer"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.validation_query)
+            cursor.fetchall()
+            cursor.close()
+
+    def prune(self):
+        """Close idle connections past max_lifetime, and those idle past max_idle_time beyond min_size.
+
+        Checkouts take the most recently used connection and only check
+        that one, so under light load the others are only reached here.
+        fill() reopens connections recycled below min_size.
+        """
+        self._check_fork()
+        now = time.monotonic()
+        with self._cond:
+            expired = []
+            for conn in self._idle:  # least recently used first
+                if self.max_lifetime and now - conn.created_at > self.max_lifetime:
+                    expired.append(conn)
+                elif (self.max_idle_time and now - conn.last_used > self.max_idle_time
+                      and self._size - len(expired) > self.min_size):
+                    expired.append(conn)
+            for conn in expired:
+                self._idle.remove(conn)
+                self.counters['recycled'] += 1
+        for conn in expired:
+            self._discard(conn)
+
+    def close_all(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        self._check_fork()
+        with self._cond:
+            self._detect_leaks()
+            return dict(self.counters, size=self._size, idle=len(self._idle),
+                        in_use=len(self._in_use), max_size=self.max_size)
+
+
+class PoolWarmer:
+    """Opens and checks every pool of a PoolManager in the background at boot.
+
+    Each database is warmed on its own thread (connections up to min_size,
+    then one validation query) and retried every retry_interval seconds
+    until it answers, so an unreachable backend does not hold up the others.
+    ready() is what /ready reports.
+    """
+
+    def __init__(self, manager, enabled=True, retry_interval=5.0):
+        self.manager = manager
+        self.enabled = enabled
+        self.retry_interval = retry_interval
+        self._pid = None
+        self._lock = threading.Lock()
+        self.started_at = None
+        self.databases = {}
+
+    def start(self):
+        """Begin warming the pools of this process (again in a forked child); returns at once"""
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.started_at = time.monotonic()
+            self.databases = {name: {'state': 'warming', 'attempts': 0, 'error': None}
+                              for name in self.manager.databases}
+        for name in self.databases:
+            threading.Thread(target=self._warm, args=(name, self._pid),
+                             name=f'pool-warmup-{name}', daemon=True).start()
+
+    def _warm(self, name, pid):
+        status = self.databases[name]
+        while self._pid == pid:
+            status['attempts'] += 1
+            try:
+                pool = self.manager.get(name)
+                pool.fill()
+                pool.ping()
+            except Exception as e:
+                logger.warning("Pool %s: warm-up failed: %s", name, e)
+                status.update(state='error', error=str(e))
+                time.sleep(self.retry_interval)
+                continue
+            status.update(state='ready', error=None, seconds=round(time.monotonic() - self.started_at, 3))
+            return
+
+    def wait(self, timeout):
+        """Block until every pool is warm or timeout seconds have passed; returns ready()"""
+        deadline = time.monotonic() + timeout
+        while not self.ready() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.ready()
+
+    def ready(self):
+        if not self.enabled:
+            return True
+        return self._pid == os.getpid() and all(
+            status['state'] == 'ready' for status in self.databases.values())
+
+    def status(self):
+        with self._lock:
+            databases = {name: dict(status) for name, status in self.databases.items()}
+        return {'ready': self.ready(), 'enabled': self.enabled, 'databases': databases}
+
+
+class PoolManager:
+    """One ConnectionPool per entry of config.DATABASES, created on first use"""
+
+    def __init__(self, databases, defaults, connect_factory, validation_query):
+        self.databases = databases
+        self.defaults = defaults
+        self.connect_factory = connect_factory
+        self.validation_query = validation_query
+        self._pools = {}
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        for pool in list(self._pools.values()):
+            pool.after_fork()
+
+    def get(self, db_name):
+        pool = self._pools.get(db_name)
+        if pool is not None:
+            return pool
+        with self._lock:
+            if db_name not in self._pools:
+                db_config = self.databases[db_name]
+                settings = dict(self.defaults, **db_config.get('pool', {}))
+                self._pools[db_name] = ConnectionPool(
+                    db_name,
+                    lambda: self.connect_factory(db_config),
+                    self.validation_query(db_config['type']),
+                    **settings
+                )
+            return self._pools[db_name]
+
+    @contextmanager
+    def connection(self, db_name):
+        with self.get(db_name).connection() as conn:
+            yield conn
+
+    def prune(self):
+        for pool in list(self._pools.values()):
+            pool.prune()
+
+    def close_all(self):
+        for pool in list(self._pools.values()):
+            pool.close_all()
+
+    def stats(self):
+        return {name: pool.stats() for name, pool in self._pools.items()}
@@ -0,0 +1,29 @@
+import importlib
+import importlib.util
+
+
+class LazyModule:
+    """Stand-in for a driver module, imported on first attribute access.
+
+    pyodbc and the direct drivers load native client libraries, which is a
+    large share of the time it takes to import app.py; most processes never
+    touch the direct drivers, and pyodbc is first needed by the pool warm-up,
+    which runs in the background.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._module = None
+
+    def installed(self):
+        """Whether the module can be found, without importing it"""
+        return self._module is not None or importlib.util.find_spec(self.name) is not None
+
+    def load(self):
+        if self._module is None:
+            # import_module is serialized by the import lock: concurrent first uses import once
+            self._module = importlib.import_module(self.name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+
+class SourceUnavailable(Exception):
+    """Raised by a loader when some backends failed; carries what could be read"""
+
+    def __init__(self, errors, partial):
+        super().__init__(', '.join(f"{name}: {error}" for name, error in errors.items()))
+        self.errors = errors
+        self.partial = partial
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+class EligibilityRecord:
+    """Graduation inputs of one student. None means the source could not be read."""
+
+    __slots__ = ('tuition_paid', 'total_credits', 'open_loans')
+
+    def __init__(self, tuition_paid=False, total_credits=0, open_loans=None):
+        self.tuition_paid = tuition_paid
+        self.total_credits = total_credits
+        # {id_livre: date_retour_prevue}: a book is lent to one student at a time
+        self.open_loans = None if open_loans is None else {
+            book_id: _as_date(due) for book_id, due in open_loans.items()}
+
+    def overdue_books_count(self, today=None):
+        if self.open_loans is None:
+            return None
+        today = today or date.today()
+        return sum(1 for due in self.open_loans.values() if due is not None and due < today)
+
+    def values(self):
+        return {
+            'tuition_paid': self.tuition_paid,
+            'total_credits': self.total_credits,
+            'overdue_books_count': self.overdue_books_count()
+        }
+
+    def drift(self, other):
+        """Names of the fields that differ from another record"""
+        return [field for field in self.__slots__ if getattr(self, field) != getattr(other, field)]
+
+
+class EligibilityStore:
+    """Per-student graduation inputs, read in O(1) instead of three queries.
+
+    A student is loaded from the databases on first read. The write paths
+    then keep the record current with deltas (record_payment, add_credits,
+    open_loan, close_loan), and reconcile() reloads tracked students in
+    batches to repair and report drift. Overdue loans are derived from the
+    due dates at read time, so they need no write to age.
+    """
+
+    def __init__(self, load_batch, max_students=100000, reconcile_interval=900, reconcile_batch_size=1000):
+        self.load_batch = load_batch
+        self.max_students = max_students
+        self.reconcile_interval = reconcile_interval
+        self.reconcile_batch_size = reconcile_batch_size
+        self._lock = threading.Lock()
+        self._records = OrderedDict()
+        # student_id -> [loads in flight, deltas seen while loading]
+        self._loading = {}
+        self._reconciler_pid = None
+        self.last_reconciliation = None
+        self.counters = {'hits': 0, 'misses': 0, 'deltas': 0, 'evictions': 0,
+                         'reconciliations': 0, 'drifted': 0}
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    # Called with the lock held
+    def _begin_load(self, student_id):
+        entry = self._loading.setdefault(student_id, [0, 0])
+        entry[0] += 1
+        return entry[1]
+
+    def _end_load(self, student_id, deltas_before):
+        """True when no delta landed while the load ran, i.e. the result may be kept"""
+        entry = self._loading[student_id]
+        entry[0] -= 1
+        if not entry[0]:
+            del self._loading[student_id]
+        return entry[1] == deltas_before
+
+    def _store(self, student_id, record):
+        self._records[student_id] = record
+        self._records.move_to_end(student_id)
+        while len(self._records) > self.max_students:
+            self._records.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def get(self, student_id):
+        """{'tuition_paid', 'total_credits', 'overdue_books_count'} for a student"""
+        self._ensure_reconciler()
+        with self._lock:
+            record = self._records.get(student_id)
+            if record is not None:
+                self._records.move_to_end(student_id)
+                self.counters['hits'] += 1
+                return record.values()
+            self.counters['misses'] += 1
+            deltas_before = self._begin_load(student_id)
+        loaded = None
+        try:
+            loaded = self.load_batch([student_id])[student_id]
+        finally:
+            with self._lock:
+                if self._end_load(student_id, deltas_before) and loaded is not None:
+                    self._store(student_id, loaded)
+        return loaded.values()
+
+    def tracks(self, student_id):
+        """Whether a write for this student has to be applied (it is stored or being loaded)"""
+        with self._lock:
+            return student_id in self._records or student_id in self._loading
+
+    def _apply(self, student_id, change):
+        with self._lock:
+            if student_id in self._loading:
+                self._loading[student_id][1] += 1
+            record = self._records.get(student_id)
+            if record is not None:
+                change(record)
+                self.counters['deltas'] += 1
+
+    def record_payment(self, student_id):
+        """A tuition payment was recorded as paid"""
+        def change(record):
+            record.tuition_paid = True
+        self._apply(student_id, change)
+
+    def add_credits(self, student_id, credits):
+        """A passing grade was recorded for a subject worth `credits`"""
+        def change(record):
+            record.total_credits = (record.total_credits or 0) + credits
+        self._apply(student_id, change)
+
+    def open_loan(self, student_id, book_id, due_date):
+        def change(record):
+            if record.open_loans is not None:
+                record.open_loans[book_id] = _as_date(due_date)
+        self._apply(student_id, change)
+
+    def close_loan(self, student_id, book_id):
+        def change(record):
+            if record.open_loans is not None:
+                record.open_loans.pop(book_id, None)
+        self._apply(student_id, change)
+
+    def clear(self):
+        """Forget every record, e.g. after a bulk write the deltas do not cover"""
+        with self._lock:
+            for entry in self._loading.values():
+                entry[1] += 1
+            self._records.clear()
+
+    def reconcile(self, max_samples=20):
+        """Reload every tracked student, fix the records and report what had drifted"""
+        start = time.perf_counter()
+        with self._lock:
+            student_ids = list(self._records)
+        report = {'checked': 0, 'drifted': 0, 'errors': 0,
+                  'fields': {field: 0 for field in EligibilityRecord.__slots__}, 'samples': []}
+
+        for i in range(0, len(student_ids), self.reconcile_batch_size):
+            chunk = student_ids[i:i + self.reconcile_batch_size]
+            with self._lock:
+                deltas_before = {student_id: self._begin_load(student_id) for student_id in chunk}
+            fresh = None
+            try:
+                fresh = self.load_batch(chunk)
+            except Exception as e:
+                report['errors'] += 1
+                report.setdefault('error', str(e))
+            with self._lock:
+                for student_id in chunk:
+                    unchanged = self._end_load(student_id, deltas_before[student_id])
+                    current = self._records.get(student_id)
+                    if fresh is None or not unchanged or current is None:
+                        continue
+                    report['checked'] += 1
+                    fields = current.drift(fresh[student_id])
+                    if fields:
+                        report['drifted'] += 1
+                        for field in fields:
+                            report['fields'][field] += 1
+                        if len(report['samples']) < max_samples:
+                            report['samples'].append({'student_id': student_id, 'fields': fields})
+                        self._records[student_id] = fresh[student_id]
+
+        report['execution_time'] = round((time.perf_counter() - start) * 1000, 2)
+        with self._lock:
+            self.counters['reconciliations'] += 1
+            self.counters['drifted'] += report['drifted']
+            self.last_reconciliation = dict(report, finished_at=datetime.now().isoformat(timespec='seconds'))
+        return report
+
+    def _ensure_reconciler(self):
+        """Start the periodic reconciliation thread once per process"""
+        if not self.reconcile_interval or self._reconciler_pid == os.getpid():
+            return
+        with self._lock:
+            if self._reconciler_pid == os.getpid():
+                return
+            self._reconciler_pid = os.getpid()
+        threading.Thread(target=self._reconcile_forever, name='eligibility-reconcile', daemon=True).start()
+
+    def _reconcile_forever(self):
+        pid = os.getpid()
+        while self._reconciler_pid == pid:
+            time.sleep(self.reconcile_interval)
+            try:
+                self.reconcile()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, students=len(self._records), max_students=self.max_students,
+                        last_reconciliation=self.last_reconciliation)
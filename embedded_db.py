@@ -0,0 +1,495 @@
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+
+# Schemas of the portal's tables, created in every embedded database
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS etudiants (id_etudiant INTEGER PRIMARY KEY, nom TEXT, prenom TEXT, "
+    "email TEXT, telephone TEXT, adresse TEXT, statut TEXT)",
+    "CREATE TABLE IF NOT EXISTS paiements (id_paiement INTEGER PRIMARY KEY, id_etudiant INTEGER, "
+    "type_paiement TEXT, montant DECIMAL(10, 2), date_paiement DATE, statut TEXT)",
+    "CREATE INDEX IF NOT EXISTS paiements_etudiant ON paiements (id_etudiant)",
+    "CREATE TABLE IF NOT EXISTS matieres (id_matiere INTEGER PRIMARY KEY, nom_matiere TEXT, credits INTEGER, "
+    "coefficient REAL)",
+    "CREATE TABLE IF NOT EXISTS notes (id_note INTEGER PRIMARY KEY, id_etudiant INTEGER, id_matiere INTEGER, "
+    "matiere TEXT, note REAL, date_evaluation DATE)",
+    "CREATE INDEX IF NOT EXISTS notes_etudiant ON notes (id_etudiant)",
+    "CREATE TABLE IF NOT EXISTS livres (id_livre INTEGER PRIMARY KEY, titre TEXT, auteur TEXT, categorie TEXT, "
+    "disponible BOOLEAN)",
+    "CREATE TABLE IF NOT EXISTS emprunts (id_emprunt INTEGER PRIMARY KEY, id_etudiant INTEGER, id_livre INTEGER, "
+    "date_emprunt DATE, date_retour_prevue DATE, date_retour DATE)",
+    "CREATE INDEX IF NOT EXISTS emprunts_etudiant ON emprunts (id_etudiant)",
+    "CREATE INDEX IF NOT EXISTS emprunts_echeance ON emprunts (date_retour_prevue, id_emprunt)",
+)
+
+# SQLite stores these as text / integers: columns converted back when read
+COLUMN_TYPES = {
+    'date_paiement': 'date', 'date_evaluation': 'date', 'date_emprunt': 'date', 'date_retour_prevue': 'date',
+    'date_retour': 'date', 'montant': 'decimal', 'disponible': 'bool'
+}
+
+# Tables each SGBD holds in the portal, seeded in its embedded database
+SEEDED_TABLES = {
+    'ORACLE': ('etudiants', 'paiements'),
+    'MYSQL': ('matieres', 'notes'),
+    'POSTGRESQL': ('livres', 'emprunts')
+}
+
+FIRST_NAMES = ('Camille', 'Lucas', 'Emma', 'Hugo', 'Léa', 'Louis', 'Chloé', 'Nathan', 'Inès', 'Jules', 'Manon', 'Adam')
+LAST_NAMES = ('Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Richard', 'Petit', 'Durand', 'Leroy', 'Moreau',
+              'Simon', 'Laurent', 'Lefebvre', 'Michel', 'Garcia', 'Roux')
+CATEGORIES = ('Informatique', 'Mathématiques', 'Physique', 'Histoire', 'Littérature', 'Économie', 'Droit', 'Biologie')
+TITLE_WORDS = ('Introduction', 'Algèbre', 'Réseaux', 'Bases', 'Données', 'Systèmes', 'Analyse', 'Théorie', 'Histoire',
+               'Méthodes', 'Pratique', 'Avancée', 'Modèles', 'Calcul', 'Programmation', 'Structures')
+
+
+class Error(Exception):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+class OperationalError(DatabaseError):
+    """Connection lost or database busy (counts towards opening the circuit breaker)"""
+
+
+class ProgrammingError(DatabaseError):
+    pass
+
+
+class IntegrityError(DatabaseError):
+    pass
+
+
+def _driver_error(e):
+    message = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        return IntegrityError(message)
+    if any(marker in message for marker in ('locked', 'busy', 'closed', 'unable to open', 'disk I/O')):
+        return OperationalError(message)
+    if isinstance(e, (sqlite3.OperationalError, sqlite3.ProgrammingError)):
+        return ProgrammingError(message)
+    return DatabaseError(message)
+
+
+def _code_and_literals(sql):
+    """sql split into alternating code and quoted-literal pieces (literals at odd positions)"""
+    return re.split(r"('(?:[^']|'')*')", sql)
+
+
+def _interval(match):
+    operand, sign, amount, unit = match.groups()
+    return f"date({operand}, '{sign}{amount} {unit.lower()}s')"
+
+
+def _rownum(sql):
+    """Oracle ROWNUM <= n / ROWNUM < n filters turned into a trailing LIMIT"""
+    limits = []
+
+    def take(match):
+        limit = int(match.group('limit'))
+        limits.append(limit - 1 if match.group('op') == '<' else limit)
+        return match.group('keep') or ''
+
+    rownum = r"ROWNUM\s*(?P<op><=?)\s*(?P<limit>\d+)"
+    sql = re.sub(rf"(?P<keep>\bWHERE\s+){rownum}\s+AND\s+", take, sql, flags=re.I)
+    sql = re.sub(rf"(?P<keep>)\s+(?:AND|WHERE)\s+{rownum}", take, sql, flags=re.I)
+    if limits:
+        sql = f"{sql.rstrip()} LIMIT {min(limits)}"
+    return sql
+
+
+@lru_cache(maxsize=1024)
+def translate(sql):
+    """Oracle / MySQL / PostgreSQL SQL as the portal writes it, in SQLite's dialect.
+
+    Covers what SQLAdapter and the direct-driver routes emit: FROM DUAL,
+    ROWNUM limits, OFFSET / FETCH FIRST, NVL, date + INTERVAL and Oracle
+    date + n arithmetic, and pyformat (%s, %(name)s) parameters; ? and
+    :name parameters are SQLite's own.
+    """
+    sql = re.sub(r"\s+FROM\s+DUAL\b", '', sql, flags=re.I)
+    sql = re.sub(r"((?:\w+\.)?\w+|\?)\s*([+-])\s*INTERVAL\s*'?(\d+)'?\s*(DAY|MONTH|YEAR)S?'?", _interval, sql,
+                 flags=re.I)
+    sql = re.sub(r"\b(CURRENT_DATE|SYSDATE)\s*([+-])\s*(\d+)\b",
+                 lambda m: f"date(CURRENT_DATE, '{m.group(2)}{m.group(3)} days')", sql, flags=re.I)
+    sql = re.sub(r"\bNVL\s*\(", 'IFNULL(', sql, flags=re.I)
+    sql = _rownum(sql)
+    sql = re.sub(r"\bOFFSET\s+(\d+)\s+ROWS?\s+FETCH\s+(?:FIRST|NEXT)\s+(\d+)\s+ROWS?\s+ONLY\b",
+                 r"LIMIT \2 OFFSET \1", sql, flags=re.I)
+    sql = re.sub(r"\bFETCH\s+(?:FIRST|NEXT)\s+(\d+)\s+ROWS?\s+ONLY\b", r"LIMIT \1", sql, flags=re.I)
+    sql = re.sub(r"\bOFFSET\s+(\d+)\s+ROWS?\b", r"OFFSET \1", sql, flags=re.I)
+    sql = sql.replace('LIMIT 18446744073709551615', 'LIMIT -1')
+    if re.search(r"\bOFFSET\s+\d+\s*$", sql, flags=re.I) and not re.search(r"\bLIMIT\s+-?\d+", sql, flags=re.I):
+        # SQLite only takes OFFSET after a LIMIT
+        sql = re.sub(r"\bOFFSET(\s+\d+\s*)$", r"LIMIT -1 OFFSET\1", sql, flags=re.I)
+    pieces = _code_and_literals(sql)
+    for i in range(0, len(pieces), 2):
+        code = re.sub(r"%\((\w+)\)s", r":\1", pieces[i])
+        pieces[i] = code.replace('%s', '?').replace('%%', '%')
+    return ''.join(pieces)
+
+
+def _placeholder_count(sql):
+    return sum(piece.count('?') for piece in _code_and_literals(sql)[::2])
+
+
+def _closing_parenthesis(sql, start):
+    depth = 0
+    for match in re.finditer(r"'(?:[^']|'')*'|[()]", sql[start:]):
+        if match.group() == '(':
+            depth += 1
+        elif match.group() == ')':
+            depth -= 1
+            if depth == 0:
+                return start + match.start()
+    raise ProgrammingError(f"Unbalanced parentheses in: {sql}")
+
+
+@lru_cache(maxsize=256)
+def writable_ctes(sql):
+    """(ctes, main) for a WITH whose CTEs include UPDATE / INSERT / DELETE, else None.
+
+    SQLite has no data-modifying CTEs: each CTE is run on its own and kept
+    in a temporary table of that name, then the main statement reads them.
+    ctes is a list of (name, body, placeholder count).
+    """
+    if not re.match(r"\s*WITH\b", sql, flags=re.I):
+        return None
+    ctes, position = [], re.match(r"\s*WITH\s+", sql, flags=re.I).end()
+    while True:
+        header = re.compile(r"(\w+)\s+AS\s*\(", flags=re.I).match(sql, position)
+        if header is None:
+            return None
+        end = _closing_parenthesis(sql, header.end() - 1)
+        body = sql[header.end():end].strip()
+        ctes.append((header.group(1), body, _placeholder_count(body)))
+        separator = re.compile(r"\s*,\s*").match(sql, end + 1)
+        if separator is None:
+            break
+        position = separator.end()
+    if not any(re.match(r"(UPDATE|INSERT|DELETE)\b", body, flags=re.I) for _, body, _ in ctes):
+        return None
+    return ctes, sql[end + 1:].strip()
+
+
+def _bind(value):
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _read(kind, value):
+    if value is None:
+        return None
+    if kind == 'date':
+        return date.fromisoformat(str(value)[:10])
+    if kind == 'decimal':
+        return Decimal(str(value))
+    return bool(value)
+
+
+class Latency:
+    """Simulated database round trip: latency_ms plus up to jitter_ms at random"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, connect_ms=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.connect_ms = connect_ms
+
+    def wait(self):
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+
+class Cursor:
+    """pyodbc-like cursor over SQLite: translated SQL, portal column types, injected latency"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection.raw.cursor()
+        self._rows = None
+        self._readers = None
+        self._columns = None
+        self.description = None
+        self.rowcount = -1
+
+    def _params(self, params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple, dict)):
+            params = params[0]
+        if isinstance(params, dict):
+            return {name: _bind(value) for name, value in params.items()}
+        return [_bind(value) for value in params]
+
+    def execute(self, sql, *params):
+        params = self._params(params)
+        self.connection.latency.wait()
+        sql = translate(sql)
+        try:
+            split = writable_ctes(sql)
+            if split is None:
+                self._cursor.execute(sql, params)
+                self._rows = None
+                self.description, self.rowcount = self._cursor.description, self._cursor.rowcount
+            else:
+                rows, self.description, self.rowcount = self._execute_ctes(split, params)
+                self._rows = iter(rows)
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+        names = [column[0].lower() for column in self.description or ()]
+        kinds = [COLUMN_TYPES.get(name) for name in names]
+        self._readers = kinds if any(kinds) else None
+        self._columns = names if self.connection.dict_rows else None
+        return self
+
+    def _execute_ctes(self, split, params):
+        """(rows, description, rowcount) of the main statement, CTEs run first into temporary tables"""
+        ctes, main = split
+        created = []
+        try:
+            for name, body, count in ctes:
+                if isinstance(params, dict):
+                    part = params
+                else:
+                    part, params = params[:count], params[count:]
+                if re.match(r"(UPDATE|INSERT|DELETE)\b", body, flags=re.I):
+                    rows = self._cursor.execute(body, part).fetchall()
+                    columns = [column[0] for column in self._cursor.description or ()]
+                    self._cursor.execute(f"CREATE TEMP TABLE {name} ({', '.join(columns)})")
+                    created.append(name)
+                    self._cursor.executemany(f"INSERT INTO temp.{name} VALUES ({', '.join('?' * len(columns))})",
+                                             rows)
+                else:
+                    self._cursor.execute(f"CREATE TEMP TABLE {name} AS {body}", part)
+                    created.append(name)
+            rows = self._cursor.execute(main, params).fetchall()
+            return rows, self._cursor.description, self._cursor.rowcount
+        finally:
+            for name in created:
+                self.connection.raw.execute(f"DROP TABLE IF EXISTS temp.{name}")
+
+    def executemany(self, sql, seq_of_params):
+        self.connection.latency.wait()
+        try:
+            self._cursor.executemany(translate(sql), [self._params((params,)) for params in seq_of_params])
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+        self._rows = None
+        self.description = None
+        self.rowcount = self._cursor.rowcount
+        return self
+
+    def _convert(self, row):
+        if self._readers is not None:
+            row = tuple(_read(kind, value) if kind else value for kind, value in zip(self._readers, row))
+        if self._columns is not None:
+            return dict(zip(self._columns, row))
+        return row
+
+    def _fetch(self, size):
+        if self._rows is not None:
+            return [row for _, row in zip(range(size), self._rows)]
+        try:
+            return self._cursor.fetchmany(size)
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+
+    def fetchone(self):
+        rows = self._fetch(1)
+        return self._convert(rows[0]) if rows else None
+
+    def fetchmany(self, size=1):
+        return [self._convert(row) for row in self._fetch(size)]
+
+    def fetchall(self):
+        if self._rows is not None:
+            rows = list(self._rows)
+        else:
+            try:
+                rows = self._cursor.fetchall()
+            except sqlite3.Error as e:
+                raise _driver_error(e) from e
+        return [self._convert(row) for row in rows]
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    def __init__(self, raw, latency, dict_rows=False):
+        self.raw = raw
+        self.latency = latency
+        self.dict_rows = dict_rows
+
+    def cursor(self):
+        try:
+            return Cursor(self)
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+
+    def commit(self):
+        try:
+            self.raw.commit()
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+
+    def rollback(self):
+        try:
+            self.raw.rollback()
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+
+    def close(self):
+        self.raw.close()
+
+
+class EmbeddedBackend:
+    """SQLite files standing in for the portal's databases, one per DSN.
+
+    connect(db_config) is a drop-in for the ODBC connect: the file
+    <path>/<dsn>.db is created on first use with every portal table, and
+    the tables of the database's SGBD are filled from `seed` (row counts)
+    so the routes have data to work on. Statements are translated from the
+    SGBD's dialect (see translate) and delayed by the configured latency,
+    which a database can override with an 'embedded' key of its config.
+    """
+
+    def __init__(self, path=None, seed=None, latency_ms=0.0, jitter_ms=0.0, connect_ms=0.0, busy_timeout=10.0):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'portal-embedded')
+        self.seed = seed or {}
+        self.latency = {'latency_ms': latency_ms, 'jitter_ms': jitter_ms, 'connect_ms': connect_ms}
+        self.busy_timeout = busy_timeout
+        self._prepared = set()
+        self._lock = threading.Lock()
+
+    def database_file(self, db_config):
+        return os.path.join(self.path, f"{db_config['dsn']}.db")
+
+    def connect(self, db_config, dict_rows=False):
+        latency = Latency(**dict(self.latency, **db_config.get('embedded', {})))
+        filename = self.database_file(db_config)
+        if filename not in self._prepared:
+            with self._lock:
+                if filename not in self._prepared:
+                    self._prepare(filename, db_config['type'])
+                    self._prepared.add(filename)
+        if latency.connect_ms:
+            time.sleep(latency.connect_ms / 1000)
+        try:
+            # Writes start with BEGIN IMMEDIATE: they queue on the busy timeout
+            # rather than fail when two connections upgrade at once
+            raw = sqlite3.connect(filename, timeout=self.busy_timeout, isolation_level='IMMEDIATE',
+                                  check_same_thread=False)
+            raw.execute('PRAGMA synchronous = NORMAL')
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+        return Connection(raw, latency, dict_rows)
+
+    def _prepare(self, filename, sgbd_type):
+        """Schemas, and seed rows when the database is new (once across processes)"""
+        os.makedirs(self.path, exist_ok=True)
+        conn = sqlite3.connect(filename, timeout=self.busy_timeout, isolation_level=None)
+        try:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('BEGIN IMMEDIATE')
+            new = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'etudiants'").fetchone()[0] == 0
+            for statement in SCHEMA:
+                conn.execute(statement)
+            if new and self.seed:
+                seed_database(conn, SEEDED_TABLES.get(sgbd_type, tuple(SEED_TABLES)), **self.seed)
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+        finally:
+            conn.close()
+
+
+def _seed_etudiants(conn, rng, students=1000, **_):
+    statuts = ['INSCRIT'] * 8 + ['DIPLOME', 'SUSPENDU']
+    rows = []
+    for student_id in range(1, students + 1):
+        nom, prenom = rng.choice(LAST_NAMES), rng.choice(FIRST_NAMES)
+        rows.append((student_id, nom, prenom, f"{prenom.lower()}.{nom.lower()}{student_id}@universite.fr",
+                     f"06{rng.randrange(10 ** 8):08d}", f"{rng.randrange(1, 200)} rue de la Paix",
+                     rng.choice(statuts)))
+    conn.executemany("INSERT INTO etudiants VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def _seed_paiements(conn, rng, students=1000, **_):
+    today = date.today()
+    rows = [(student_id, 'SCOLARITE', '3770.00', (today - timedelta(days=rng.randrange(365))).isoformat(),
+             'PAYE' if rng.random() < 0.85 else 'EN_ATTENTE')
+            for student_id in range(1, students + 1)]
+    conn.executemany("INSERT INTO paiements (id_etudiant, type_paiement, montant, date_paiement, statut) "
+                     "VALUES (?, ?, ?, ?, ?)", rows)
+
+
+def _seed_matieres(conn, rng, subjects=20, **_):
+    rows = [(subject_id, f"{rng.choice(TITLE_WORDS)} {subject_id}", rng.randrange(3, 10), rng.choice((1, 1.5, 2)))
+            for subject_id in range(1, subjects + 1)]
+    conn.executemany("INSERT INTO matieres VALUES (?, ?, ?, ?)", rows)
+
+
+def _seed_notes(conn, rng, students=1000, subjects=20, grades_per_student=10, **_):
+    today = date.today()
+    rows = []
+    for student_id in range(1, students + 1):
+        for _ in range(grades_per_student):
+            subject_id = rng.randrange(1, subjects + 1)
+            rows.append((student_id, subject_id, f"Matière {subject_id}", round(rng.uniform(4, 19), 2),
+                         (today - timedelta(days=rng.randrange(365))).isoformat()))
+    conn.executemany("INSERT INTO notes (id_etudiant, id_matiere, matiere, note, date_evaluation) "
+                     "VALUES (?, ?, ?, ?, ?)", rows)
+
+
+def _seed_livres(conn, rng, books=2000, loans=500, **_):
+    rows = [(book_id, ' '.join(rng.sample(TITLE_WORDS, 3)), f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+             rng.choice(CATEGORIES), book_id > loans)
+            for book_id in range(1, books + 1)]
+    conn.executemany("INSERT INTO livres VALUES (?, ?, ?, ?, ?)", rows)
+
+
+def _seed_emprunts(conn, rng, students=1000, books=2000, loans=500, **_):
+    # Books 1..loans are out; about a third of those loans are overdue
+    today = date.today()
+    rows = []
+    for book_id in range(1, min(loans, books) + 1):
+        borrowed = today - timedelta(days=rng.randrange(1, 45))
+        rows.append((rng.randrange(1, students + 1), book_id, borrowed.isoformat(),
+                     (borrowed + timedelta(days=30)).isoformat()))
+    conn.executemany("INSERT INTO emprunts (id_etudiant, id_livre, date_emprunt, date_retour_prevue) "
+                     "VALUES (?, ?, ?, ?)", rows)
+
+
+SEED_TABLES = {
+    'etudiants': _seed_etudiants,
+    'paiements': _seed_paiements,
+    'matieres': _seed_matieres,
+    'notes': _seed_notes,
+    'livres': _seed_livres,
+    'emprunts': _seed_emprunts
+}
+
+
+def seed_database(conn, tables, **counts):
+    """Deterministic sample rows for tables (same counts give the same rows)"""
+    rng = random.Random(42)
+    for table in tables:
+        SEED_TABLES[table](conn, rng, **counts)
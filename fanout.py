@@ -0,0 +1,74 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class DeadlineExceeded(Exception):
+    """Raised for a backend that did not answer before its deadline"""
+
+
+class FanOut:
+    """Run one sub-query per backend concurrently, each backend on its own bounded executor.
+
+    A task's deadline starts when it begins running; a task still queued
+    after queue_timeout seconds (its deadline when None) is dropped. A
+    running call cannot be interrupted, so a hung backend keeps its threads:
+    at most max_workers of them, never those of the other backends.
+    """
+
+    def __init__(self, max_workers=10, deadlines=None, default_deadline=5.0, queue_timeout=None):
+        self.max_workers = max_workers
+        self.deadlines = deadlines or {}
+        self.default_deadline = default_deadline
+        self.queue_timeout = queue_timeout
+        self._executors = {}
+        self._lock = threading.Lock()
+
+    def executor(self, name):
+        """Bounded executor of one backend, created on first use"""
+        executor = self._executors.get(name)
+        if executor is None:
+            with self._lock:
+                executor = self._executors.get(name)
+                if executor is None:
+                    executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f'fanout-{name}')
+                    self._executors[name] = executor
+        return executor
+
+    def run(self, tasks):
+        """Run {name: callable} and return ({name: result}, {name: exception})"""
+        start = time.monotonic()
+        started = {}
+
+        def timed(name, fn):
+            def call():
+                started[name] = time.monotonic()
+                return fn()
+            return call
+
+        futures = {name: self.executor(name).submit(timed(name, fn)) for name, fn in tasks.items()}
+        results = {}
+        errors = {}
+        for name, future in futures.items():
+            deadline = self.deadlines.get(name, self.default_deadline)
+            queue_timeout = deadline if self.queue_timeout is None else self.queue_timeout
+            while True:
+                began = started.get(name)
+                limit = start + queue_timeout if began is None else began + deadline
+                try:
+                    results[name] = future.result(timeout=max(limit - time.monotonic(), 0))
+                except FutureTimeoutError:
+                    if began is None and (name in started or not future.cancel()):
+                        # Started meanwhile: its own deadline applies
+                        continue
+                    future.cancel()
+                    errors[name] = (DeadlineExceeded(f"no answer within {deadline}s") if began is not None else
+                                    DeadlineExceeded(f"not started within {queue_timeout}s: {name} workers busy"))
+                except Exception as e:
+                    errors[name] = e
+                break
+        return results, errors
+
+    def shutdown(self):
+        for executor in list(self._executors.values()):
+            executor.shutdown(wait=False)
@@ -0,0 +1,39 @@
+"""JSON encoding for ?format=columnar responses: orjson when it is installed,
+the json module otherwise. Dates and times become ISO 8601 strings and
+decimals exact strings, with either backend."""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).hex()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(',', ':'))
+
+# Every available backend, value -> UTF-8 bytes (benchmarks/bench_formats.py compares them)
+BACKENDS = {'json': lambda value: _encoder.encode(value).encode()}
+if orjson is not None:
+    BACKENDS['orjson'] = lambda value: orjson.dumps(value, default=_default)
+
+dumps_bytes = BACKENDS[BACKEND]
+
+
+def dumps(value):
+    if orjson is None:
+        return _encoder.encode(value)
+    return orjson.dumps(value, default=_default).decode()
@@ -0,0 +1,503 @@
+import heapq
+import pickle
+import tempfile
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from decimal import Decimal
+from operator import itemgetter
+
+from fanout import DeadlineExceeded
+from streaming import iter_rows
+
+# Database (key of DATABASES) holding each table, for sources that do not name one
+TABLE_DATABASES = {
+    'etudiants': 'oracle',
+    'paiements': 'oracle',
+    'matieres': 'mysql',
+    'notes': 'mysql',
+    'livres': 'postgresql',
+    'emprunts': 'postgresql'
+}
+
+
+class FederationError(Exception):
+    """Raised for a federated query that cannot be planned, or whose inputs are not in the planned order"""
+
+
+def join_key(value):
+    """Join key comparable across drivers: integral decimals (Oracle NUMBER) become int"""
+    if isinstance(value, Decimal) and value == value.to_integral_value():
+        return int(value)
+    return value
+
+
+def _picker(indexes):
+    """Function returning the values at indexes of a row, as a tuple"""
+    if not indexes:
+        return lambda row: ()
+    if len(indexes) == 1:
+        index = indexes[0]
+        return lambda row: (row[index],)
+    return itemgetter(*indexes)
+
+
+class Spool:
+    """Rows kept in memory up to max_rows, then written to a temporary file in pickled batches
+    (of at most max_rows, at most batch_size rows).
+
+    Iterating reads them back in insertion order; close() drops the file.
+    """
+
+    def __init__(self, max_rows, spill_dir=None, batch_size=1000):
+        self.max_rows = max_rows
+        self.spill_dir = spill_dir
+        self.batch_size = min(batch_size, max_rows) if max_rows else batch_size
+        self.rows = []
+        self.file = None
+        self.batches = 0
+        self.count = 0
+        self.spilled = 0
+
+    def append(self, row):
+        self.rows.append(row)
+        self.count += 1
+        if len(self.rows) >= (self.batch_size if self.file else max(self.max_rows, 1)):
+            self._flush()
+
+    def _flush(self):
+        if self.file is None:
+            self.file = tempfile.TemporaryFile(prefix='federated-', dir=self.spill_dir)
+        pickle.dump(self.rows, self.file, pickle.HIGHEST_PROTOCOL)
+        self.batches += 1
+        self.spilled += len(self.rows)
+        self.rows = []
+
+    def __iter__(self):
+        if self.file is not None:
+            self.file.seek(0)
+            for _ in range(self.batches):
+                yield from pickle.load(self.file)
+            self.file.seek(0, 2)
+        yield from self.rows
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.rows = []
+
+
+class HashTable:
+    """Build side of a hash join: {key: [rows]} in memory, or hash partitions spooled to disk past max_rows"""
+
+    def __init__(self, max_rows, partitions, spill_dir=None):
+        self.max_rows = max_rows
+        self.partition_count = partitions
+        self.spill_dir = spill_dir
+        self.table = {}
+        self.partitions = None
+        self.rows = 0
+
+    @property
+    def spilled(self):
+        return self.partitions is not None
+
+    def add(self, key, row):
+        self.rows += 1
+        if self.partitions is not None:
+            self.partitions[hash(key) % self.partition_count].append((key, row))
+            return
+        matches = self.table.get(key)
+        if matches is None:
+            self.table[key] = [row]
+        else:
+            matches.append(row)
+        if self.rows > self.max_rows:
+            self._spill()
+
+    def _spill(self):
+        self.partitions = [Spool(0, self.spill_dir) for _ in range(self.partition_count)]
+        for key, rows in self.table.items():
+            partition = self.partitions[hash(key) % self.partition_count]
+            for row in rows:
+                partition.append((key, row))
+        self.table = None
+
+    def close(self):
+        for partition in self.partitions or ():
+            partition.close()
+        self.table = None
+
+
+class Source:
+    """One backend's part of a federated query, run there as a single SELECT.
+
+    Source("notes n JOIN matieres m ON n.id_matiere = m.id_matiere",
+           id_etudiant="n.id_etudiant", total_credits="SUM(m.credits)").where("n.note >= ?", 10)
+        .group_by("n.id_etudiant")
+
+    Columns are named by position (the expression is the name) or by
+    keyword (name=expression). Filters, GROUP BY and the sort a merge join
+    needs are pushed down, so only projected, filtered and aggregated rows
+    leave the database. The database is the one holding the first table.
+    """
+
+    def __init__(self, table, *columns, database=None, **expressions):
+        self.table = table
+        self.columns = {column: column for column in columns}
+        self.columns.update(expressions)
+        if not self.columns:
+            raise FederationError(f"{table}: no column selected")
+        self.name = table.split()[0]
+        self.database = database or TABLE_DATABASES.get(self.name)
+        if self.database is None:
+            raise FederationError(f"Unknown table {self.name}: give the source a database")
+        self.conditions = []
+        self.grouping = []
+        self.ordering = []
+
+    def where(self, condition, *params):
+        self.conditions.append((condition, params))
+        return self
+
+    def group_by(self, *expressions):
+        self.grouping.extend(expressions)
+        return self
+
+    def order_by(self, *columns):
+        """Order of the rows, by output column names (the root source's order is kept by the joins)"""
+        for column in columns:
+            if column not in self.columns:
+                raise FederationError(f"{self.name}: cannot order by unknown column {column}")
+        self.ordering.extend(columns)
+        return self
+
+    def build(self, adapter, sgbd_type, order=()):
+        return adapter.get_source_query(sgbd_type, self.table, self.columns, self.conditions, self.grouping,
+                                        [self.columns[column] for column in order])
+
+
+class Join:
+    """One planned join step: right source, key positions and algorithm"""
+
+    def __init__(self, source, left_key, right_key, how, method, defaults):
+        self.source = source
+        self.left_key = left_key
+        self.right_key = right_key
+        self.how = how
+        self.method = method
+        self.defaults = defaults
+        self.left_index = None
+        self.left_sorted = False
+        self.kept = []
+        self.default_row = ()
+
+
+class FederatedQuery:
+    """Sources of several backends joined left to right, declared instead of merged by hand.
+
+    FederatedQuery(students).join(credits, on='id_etudiant', how='left', defaults={'total_credits': 0})
+
+    on names the key column of both sides, or is a (left, right) pair.
+    With method='auto' a join is a sort-merge join when the rows on its left
+    come ordered by the key (the first source is ordered by the first key
+    unless it has an order of its own), otherwise a hash join on its right
+    source. A hash join keeps the order of the left rows, a merge join
+    returns them in key order. Merge joins compare keys
+    in Python: use method='hash' for text keys, whose collation differs
+    between databases. how='left' keeps unmatched left rows, their right
+    columns taken from defaults (None otherwise).
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.joins = []
+        self.predicates = []
+        self.selected = None
+
+    def join(self, source, on, how='inner', method='auto', defaults=None):
+        if how not in ('inner', 'left'):
+            raise FederationError("Join must be 'inner' or 'left'")
+        if method not in ('auto', 'hash', 'merge'):
+            raise FederationError("Join method must be 'auto', 'hash' or 'merge'")
+        left_key, right_key = (on, on) if isinstance(on, str) else on
+        if right_key not in source.columns:
+            raise FederationError(f"{source.name}: no column {right_key} to join on")
+        self.joins.append(Join(source, left_key, right_key, how, method, defaults or {}))
+        return self
+
+    def filter(self, predicate):
+        """Keep the output rows (dicts) for which predicate(row) is true, after the joins"""
+        self.predicates.append(predicate)
+        return self
+
+    def select(self, *columns):
+        self.selected = list(columns)
+        return self
+
+    def plan(self):
+        """Order asked of the first source, and the output columns; completes each Join"""
+        columns = list(self.source.columns)
+        root_order = list(self.source.ordering)
+        if not root_order and self.joins and self.joins[0].method != 'hash':
+            root_order = [self.joins[0].left_key]
+        order = root_order
+        for join in self.joins:
+            if join.left_key not in columns:
+                raise FederationError(f"No column {join.left_key} to join {join.source.name} on")
+            join.left_index = columns.index(join.left_key)
+            join.left_sorted = order[:1] == [join.left_key]
+            if join.method == 'auto':
+                join.method = 'merge' if join.left_sorted else 'hash'
+            right_columns = list(join.source.columns)
+            join.kept = [i for i, name in enumerate(right_columns)
+                         if not (name == join.right_key and name == join.left_key)]
+            kept_names = [right_columns[i] for i in join.kept]
+            for name in kept_names:
+                if name in columns:
+                    raise FederationError(f"Column {name} comes from two sources")
+            join.default_row = tuple(join.defaults.get(name) for name in kept_names)
+            columns.extend(kept_names)
+            if join.method == 'merge':
+                order = [join.left_key]
+        for column in self.selected or ():
+            if column not in columns:
+                raise FederationError(f"Cannot select unknown column {column}")
+        return root_order, columns
+
+
+class Federation:
+    """Runs a FederatedQuery: one pushed-down SELECT per source, joined as the rows stream in.
+
+    The right source of every join is read concurrently on its database's
+    fan-out executor while the first source streams on the calling thread, which keeps one
+    connection for as long as rows are consumed. A hash join holds its right
+    rows in memory up to max_rows_in_memory, then splits both sides into
+    spill_partitions partitions on disk and joins them one at a time; a
+    merge join spools its right rows (already sorted by their database) and
+    sorts its left rows in spilled runs only when they are not in key order.
+    """
+
+    def __init__(self, get_connection, adapter, fanout, fetch_size=1000, build_timeout=60,
+                 max_rows_in_memory=200000, spill_partitions=16, spill_dir=None):
+        self.get_connection = get_connection
+        self.adapter = adapter
+        self.fanout = fanout
+        self.fetch_size = fetch_size
+        self.build_timeout = build_timeout
+        self.max_rows_in_memory = max_rows_in_memory
+        self.spill_partitions = spill_partitions
+        self.spill_dir = spill_dir
+        self.stats = {'sources': [], 'rows': 0}
+
+    def rows(self, query):
+        """Yield the result rows of query as dicts"""
+        start = time.perf_counter()
+        root_order, columns = query.plan()
+        source = query.source
+        root_stats = self._source_stats(source, 'stream')
+        futures = []
+        try:
+            for join in query.joins:
+                executor = self.fanout.executor(join.source.database)
+                futures.append(executor.submit(self._build, join, self._source_stats(join.source, join.method)))
+            with self.get_connection(source.database) as (conn, db_type):
+                sql, params = source.build(self.adapter, db_type, root_order)
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                stream = self._read(cursor, root_stats)
+                for join, future in zip(query.joins, futures):
+                    join_rows = self._merge_join if join.method == 'merge' else self._hash_join
+                    stream = join_rows(stream, join, self._waiter(join, future))
+                for row in stream:
+                    item = dict(zip(columns, row))
+                    if all(predicate(item) for predicate in query.predicates):
+                        self.stats['rows'] += 1
+                        yield item if not query.selected else {column: item[column] for column in query.selected}
+            root_stats['duration_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        finally:
+            for future in futures:
+                future.cancel()
+                future.add_done_callback(_close_built)
+            self.stats['duration_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+    def _source_stats(self, source, method):
+        stats = {'database': source.database, 'table': source.name, 'method': method, 'rows': 0,
+                 'spilled_rows': 0, 'duration_ms': None}
+        self.stats['sources'].append(stats)
+        return stats
+
+    def _read(self, cursor, stats):
+        for row in iter_rows(cursor, self.fetch_size):
+            stats['rows'] += 1
+            yield tuple(row)
+
+    def _build(self, join, stats):
+        """Right rows of a join, as a HashTable or as a Spool of (key, row) in key order"""
+        source = join.source
+        start = time.perf_counter()
+        merge = join.method == 'merge'
+        built = (Spool(self.max_rows_in_memory, self.spill_dir) if merge else
+                 HashTable(self.max_rows_in_memory, self.spill_partitions, self.spill_dir))
+        key_index = list(source.columns).index(join.right_key)
+        pick = _picker(join.kept)
+        previous = None
+        try:
+            with self.get_connection(source.database) as (conn, db_type):
+                query, params = source.build(self.adapter, db_type, [join.right_key] if merge else ())
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                for row in iter_rows(cursor, self.fetch_size):
+                    key = join_key(row[key_index])
+                    if key is None:
+                        continue
+                    if merge:
+                        if previous is not None and key < previous:
+                            raise FederationError(f"{source.database} did not return {source.name} ordered by "
+                                                  f"{join.right_key}: join it with method='hash'")
+                        previous = key
+                        built.append((key, pick(row)))
+                    else:
+                        built.add(key, pick(row))
+                    stats['rows'] += 1
+        except BaseException:
+            built.close()
+            raise
+        stats['spilled_rows'] = built.spilled if merge else sum(p.count for p in built.partitions or ())
+        stats['duration_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return built
+
+    def _waiter(self, join, future):
+        def wait():
+            try:
+                return future.result(timeout=self.build_timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                raise DeadlineExceeded(f"{join.source.database}: no answer within {self.build_timeout}s")
+        return wait
+
+    def _hash_join(self, left, join, built):
+        table = built()
+        key_index = join.left_index
+        outer = join.how == 'left'
+        if not table.spilled:
+            matches_of = table.table.get
+            for row in left:
+                matches = matches_of(join_key(row[key_index]))
+                if matches:
+                    for match in matches:
+                        yield row + match
+                elif outer:
+                    yield row + join.default_row
+            return
+
+        # Right side too large: partition the left rows the same way, numbered so
+        # that the joined partitions can be merged back into the left order
+        count = table.partition_count
+        probes = [Spool(0, self.spill_dir) for _ in range(count)]
+        outputs = []
+        try:
+            for position, row in enumerate(left):
+                key = join_key(row[key_index])
+                probes[hash(key) % count].append((position, key, row))
+            for build, probe in zip(table.partitions, probes):
+                partition = {}
+                for key, row in build:
+                    partition.setdefault(key, []).append(row)
+                build.close()
+                output = Spool(0, self.spill_dir)
+                outputs.append(output)
+                for position, key, row in probe:
+                    matches = partition.get(key)
+                    if matches:
+                        for match in matches:
+                            output.append((position, row + match))
+                    elif outer:
+                        output.append((position, row + join.default_row))
+                probe.close()
+            for _, row in heapq.merge(*outputs, key=itemgetter(0)):
+                yield row
+        finally:
+            for spool in probes + outputs:
+                spool.close()
+
+    def _sorted(self, left, key_index):
+        """Left rows in key order, sorted in runs of max_rows_in_memory spilled to disk and merged.
+
+        Rows without a key come first (a merge join passes them through or drops them).
+        """
+        runs, run = [], []
+        try:
+            for position, row in enumerate(left):
+                run.append((join_key(row[key_index]), position, row))
+                if len(run) >= self.max_rows_in_memory:
+                    runs.append(self._spill_run(run))
+                    run = []
+            run.sort(key=_sort_key)
+            if not runs:
+                for _, _, row in run:
+                    yield row
+                return
+            runs.append(run)
+            for _, _, row in heapq.merge(*runs, key=_sort_key):
+                yield row
+        finally:
+            for spool in runs:
+                if isinstance(spool, Spool):
+                    spool.close()
+
+    def _spill_run(self, run):
+        run.sort(key=_sort_key)
+        spool = Spool(0, self.spill_dir)
+        for item in run:
+            spool.append(item)
+        return spool
+
+    def _merge_join(self, left, join, built):
+        key_index = join.left_index
+        if not join.left_sorted:
+            left = self._sorted(left, key_index)
+        right = iter(built())
+        outer = join.how == 'left'
+        current = next(right, None)
+        group_key, group = _NO_KEY, []
+        previous = None
+        for row in left:
+            key = join_key(row[key_index])
+            if key is None:
+                if outer:
+                    yield row + join.default_row
+                continue
+            if key != group_key:
+                if previous is not None and key < previous:
+                    raise FederationError(f"Rows to join with {join.source.name} are not ordered by "
+                                          f"{join.left_key}: join it with method='hash'")
+                while current is not None and current[0] < key:
+                    current = next(right, None)
+                group = []
+                while current is not None and current[0] == key:
+                    group.append(current[1])
+                    current = next(right, None)
+                group_key = previous = key
+            if group:
+                for match in group:
+                    yield row + match
+            elif outer:
+                yield row + join.default_row
+
+    def summary(self):
+        return self.stats
+
+
+_NO_KEY = object()
+
+
+def _sort_key(item):
+    # (key, position, row): rows without a key first, never compared with keys
+    key, position = item[0], item[1]
+    return (False, 0, position) if key is None else (True, key, position)
+
+
+def _close_built(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
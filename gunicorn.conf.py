@@ -0,0 +1,46 @@
+"""gunicorn settings and worker hooks, for production serving:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Values come from config.SERVER_SETTINGS; command-line flags override them.
+With preload_app the master imports app.py once and forks the workers,
+which start their own pools and background threads in post_worker_init.
+"""
+import multiprocessing
+import signal
+import threading
+
+from config import SERVER_SETTINGS
+
+bind = SERVER_SETTINGS['bind']
+workers = SERVER_SETTINGS['workers'] or multiprocessing.cpu_count()
+worker_class = 'gthread'
+threads = SERVER_SETTINGS['threads']
+preload_app = SERVER_SETTINGS['preload_app']
+max_requests = SERVER_SETTINGS['max_requests']
+max_requests_jitter = SERVER_SETTINGS['max_requests_jitter']
+timeout = SERVER_SETTINGS['timeout']
+graceful_timeout = SERVER_SETTINGS['graceful_timeout']
+keepalive = SERVER_SETTINGS['keepalive']
+
+
+def post_worker_init(worker):
+    """Start the worker's pools and background threads, and wait for the pools to be warm"""
+    import app as portal
+    portal.start_worker()
+    if not portal.warmup.wait(SERVER_SETTINGS['warmup_timeout']):
+        worker.log.warning("Worker %s: pools still warming after %ss, taking requests anyway",
+                           worker.pid, SERVER_SETTINGS['warmup_timeout'])
+    if SERVER_SETTINGS['drain_delay']:
+        def drain(signum, frame):
+            # Keep serving while the load balancer sees /ready fail, then stop gracefully
+            portal.draining.set()
+            threading.Timer(SERVER_SETTINGS['drain_delay'], worker.handle_exit, (signum, frame)).start()
+
+        signal.signal(signal.SIGTERM, drain)
+
+
+def worker_exit(server, worker):
+    """Close the worker's pooled connections once its last request is done"""
+    import app as portal
+    portal.stop_worker()
@@ -0,0 +1,167 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    """Raised instead of contacting a database whose breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one database.
+
+    closed: calls go through; failure_threshold failures in a row open it.
+    open: calls fail at once with CircuitOpen, for reset_timeout seconds.
+    half_open: a single trial (a health probe or a request) is let through;
+    its success closes the breaker, its failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=10.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._trial_at = None
+        self.counters = {'opened': 0, 'rejected': 0, 'failures': 0}
+
+    def _claim_trial(self):
+        # Called with the lock held: True when the caller may go through
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._trial_at = None
+        # A trial that never reported back (e.g. it timed out in the pool) is replaced after reset_timeout
+        if self.state == self.HALF_OPEN and (self._trial_at is None or now - self._trial_at >= self.reset_timeout):
+            self._trial_at = now
+            return True
+        return False
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call to the database may be attempted now"""
+        with self._lock:
+            if self._claim_trial():
+                return
+            self.counters['rejected'] += 1
+            retry_in = 0
+            if self.state == self.OPEN:
+                retry_in = max(self.reset_timeout - (time.monotonic() - self.opened_at), 0)
+        raise CircuitOpen(f"{self.name} unavailable (circuit open, retry in {retry_in:.0f}s): {self.last_error}")
+
+    def try_probe(self):
+        """Whether a health probe should run now (always when closed, as the trial when half-open)"""
+        with self._lock:
+            return self._claim_trial()
+
+    def release_trial(self):
+        """End a half-open trial that got no answer either way: the next call or probe becomes the trial"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_at = None
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.warning("Circuit %s closed", self.name)
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_at = None
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.counters['failures'] += 1
+            self.last_error = str(error)
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.counters['opened'] += 1
+                    logger.warning("Circuit %s opened: %s", self.name, error)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_at = None
+
+    def snapshot(self):
+        with self._lock:
+            opened_for = round(time.monotonic() - self.opened_at, 1) if self.state != self.CLOSED else None
+            return dict(self.counters, state=self.state, consecutive_failures=self.failures,
+                        open_for=opened_for, reset_timeout=self.reset_timeout, last_error=self.last_error)
+
+
+class HealthMonitor:
+    """Probes every database in the background and feeds the results to its breaker.
+
+    probe(db_name) runs on a dedicated thread per database and must raise
+    when the database does not answer, and return False when it could not
+    reach it (every pooled connection busy): the breaker is then left as it
+    is. A probe still running after probe_timeout counts as a failure, and
+    no other probe of that database is started until it returns. While a
+    breaker is open, the probe after its reset_timeout is the half-open
+    trial that closes it again.
+    """
+
+    def __init__(self, probe, breakers, enabled=True, interval=5.0, probe_timeout=5.0):
+        self.probe = probe
+        self.breakers = breakers
+        self.enabled = enabled
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self._pid = None
+        self._lock = threading.Lock()
+        self.databases = {}
+
+    def start(self):
+        """Start the probe threads of this process (again in a forked child)"""
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.databases = {name: {'last_probe': None, 'latency_ms': None, 'healthy': None, 'error': None}
+                              for name in self.breakers}
+        for name in self.breakers:
+            threading.Thread(target=self._monitor, args=(name, self._pid),
+                             name=f'health-{name}', daemon=True).start()
+
+    def _monitor(self, name, pid):
+        breaker = self.breakers[name]
+        status = self.databases[name]
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'probe-{name}')
+        pending = None
+        while self._pid == pid:
+            if pending is not None and not pending.done():
+                breaker.record_failure(f"health probe still running after {self.probe_timeout}s")
+            elif breaker.try_probe():
+                start = time.monotonic()
+                pending = executor.submit(self.probe, name)
+                try:
+                    if pending.result(timeout=self.probe_timeout) is False:
+                        breaker.release_trial()
+                        status.update(error='no idle connection to probe with', latency_ms=None)
+                    else:
+                        breaker.record_success()
+                        status.update(healthy=True, error=None,
+                                      latency_ms=round((time.monotonic() - start) * 1000, 2))
+                except FutureTimeoutError:
+                    breaker.record_failure(f"health probe timed out after {self.probe_timeout}s")
+                    status.update(healthy=False, error='probe timeout', latency_ms=None)
+                except Exception as e:
+                    breaker.record_failure(e)
+                    status.update(healthy=False, error=str(e), latency_ms=None)
+                status['last_probe'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            time.sleep(self.interval)
+        executor.shutdown(wait=False)
+
+    def status(self, db_name):
+        return dict(self.databases.get(db_name, {}), breaker=self.breakers[db_name].snapshot())
@@ -0,0 +1,230 @@
+import bisect
+import threading
+import time
+
+# Latency buckets in seconds, from 1ms to 10s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, one value per label set"""
+
+    type = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label set"""
+
+    type = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                yield self.name + '_bucket', _format_labels(self.labels, key, le), cumulative
+            yield self.name + '_sum', _format_labels(self.labels, key), total
+            yield self.name + '_count', _format_labels(self.labels, key), count
+
+
+class MetricsRegistry:
+    """Metrics of the process, rendered in the Prometheus text exposition format.
+
+    Collectors are callables returning (name, type, description, [(labels_dict, value)])
+    tuples, read at scrape time for values that already live elsewhere
+    (pool sizes, cache counters).
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, description, labels=()):
+        metric = Counter(name, description, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, description, labels=(), buckets=None):
+        metric = Histogram(name, description, labels, buckets or self.buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        for collect in self._collectors:
+            for name, metric_type, description, samples in collect():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    rendered = _format_labels(list(labels), list(labels.values()))
+                    lines.append(f'{name}{rendered} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class QueryMetrics:
+    """The database-side series: acquire, execute and fetch latency, rows, errors"""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.acquire = registry.histogram(
+            'portal_db_acquire_seconds', 'Time spent waiting for a pooled connection', ['backend'])
+        self.execute = registry.histogram(
+            'portal_db_query_seconds', 'cursor.execute latency per SQLAdapter template', ['backend', 'template'])
+        self.fetch = registry.histogram(
+            'portal_db_fetch_seconds', 'Time spent in fetch calls per SQLAdapter template', ['backend', 'template'])
+        self.rows = registry.counter(
+            'portal_db_rows_fetched_total', 'Rows fetched per SQLAdapter template', ['backend', 'template'])
+        self.errors = registry.counter(
+            'portal_db_query_errors_total', 'Failed executions per SQLAdapter template', ['backend', 'template'])
+
+
+class InstrumentedCursor:
+    """Cursor proxy timing execute and fetch calls and counting fetched rows"""
+
+    def __init__(self, cursor, metrics, backend, template='adhoc'):
+        self._cursor = cursor
+        self._metrics = metrics
+        self.backend = backend
+        self.template = template
+
+    def _timed_execute(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        except Exception:
+            self._metrics.errors.inc(backend=self.backend, template=self.template)
+            raise
+        finally:
+            self._metrics.execute.observe(time.perf_counter() - start,
+                                          backend=self.backend, template=self.template)
+
+    def execute(self, *args):
+        self._timed_execute(self._cursor.execute, *args)
+        # pyodbc returns the cursor itself so calls can be chained
+        return self
+
+    def executemany(self, *args):
+        self._timed_execute(self._cursor.executemany, *args)
+        return self
+
+    def _timed_fetch(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        self._metrics.fetch.observe(time.perf_counter() - start, backend=self.backend, template=self.template)
+        return result
+
+    def fetchone(self):
+        row = self._timed_fetch(self._cursor.fetchone)
+        if row is not None:
+            self._metrics.rows.inc(backend=self.backend, template=self.template)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._timed_fetch(self._cursor.fetchmany, *args)
+        if rows:
+            self._metrics.rows.inc(len(rows), backend=self.backend, template=self.template)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed_fetch(self._cursor.fetchall)
+        if rows:
+            self._metrics.rows.inc(len(rows), backend=self.backend, template=self.template)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Connection proxy handing out instrumented cursors labelled with the backend"""
+
+    def __init__(self, conn, metrics, backend):
+        self._conn = conn
+        self._metrics = metrics
+        self.backend = backend
+
+    def cursor(self):
+        return InstrumentedCursor(self._conn.cursor(), self._metrics, self.backend)
+
+    def trace(self, cursor, template):
+        """Label a cursor (e.g. a cached statement cursor) with its SQLAdapter template"""
+        if isinstance(cursor, InstrumentedCursor):
+            cursor.template = template
+            return cursor
+        return InstrumentedCursor(cursor, self._metrics, self.backend, template)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
@@ -0,0 +1,178 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+
+logger = logging.getLogger(__name__)
+
+
+class OverdueScanner:
+    """In-memory set of overdue loans, kept current by an incremental background scan.
+
+    scan(since, until, after, limit) returns one page of open loans due
+    before until (and on or after since, when given) as (id_emprunt,
+    id_etudiant, id_livre, date_retour_prevue) rows ordered by due date and
+    loan id, resuming after the (due date, loan id) keyset `after`. Each run
+    only reads the loans that fell due since the high-water mark left by
+    the previous run; every full_scan_every runs the whole set is rebuilt,
+    which drops loans returned through another process. Loans newly found
+    overdue go to notify(batch) in batches of notification_batch_size (the
+    first run of a process reports every overdue loan; records carry the
+    loan id so consumers can skip ones already handled).
+    """
+
+    def __init__(self, scan, notify=None, enabled=True, interval=300, page_size=1000, full_scan_every=12,
+                 notification_batch_size=100, outbox_size=50, history=20):
+        self.scan = scan
+        self.notify = notify
+        self.enabled = enabled
+        self.interval = interval
+        self.page_size = page_size
+        self.full_scan_every = full_scan_every
+        self.notification_batch_size = notification_batch_size
+        self._loans = {}     # id_emprunt -> (id_etudiant, id_livre, date_retour_prevue)
+        self._order = []     # sorted (date_retour_prevue, id_emprunt)
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self.high_water_mark = None
+        self.runs = 0
+        self.batches = 0
+        self.history = deque(maxlen=history)
+        self.outbox = deque(maxlen=outbox_size)
+        self.last_error = None
+
+    def start(self):
+        """Start the scan thread of this process (again in a forked child)"""
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wake = threading.Event()
+        threading.Thread(target=self._scan_forever, args=(self._pid,), name='overdue-scanner', daemon=True).start()
+
+    def _scan_forever(self, pid):
+        while self._pid == pid:
+            try:
+                self.run()
+            except Exception as e:
+                logger.warning("Overdue scan failed: %s", e)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def request_scan(self):
+        """Scan now rather than at the next interval"""
+        self._wake.set()
+
+    @property
+    def ready(self):
+        return self.high_water_mark is not None
+
+    def _read(self, since, until):
+        after = None
+        while True:
+            rows = self.scan(since, until, after, self.page_size)
+            yield from rows
+            if len(rows) < self.page_size:
+                return
+            after = (rows[-1][3], rows[-1][0])
+
+    def run(self):
+        """One scan (full or since the high-water mark); returns its report"""
+        with self._run_lock:
+            full = self.high_water_mark is None or self.runs % self.full_scan_every == 0
+            since = None if full else self.high_water_mark
+            until = date.today()
+            report = {'run': self.runs + 1, 'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'full': full,
+                      'since': since.isoformat() if since else None, 'until': until.isoformat(),
+                      'rows_scanned': 0, 'new_overdue': 0, 'dropped': 0, 'notification_batches': 0, 'error': None}
+            start = time.perf_counter()
+            try:
+                found = {}
+                for loan_id, student_id, book_id, due_date in self._read(since, until):
+                    if isinstance(due_date, datetime):
+                        due_date = due_date.date()
+                    found[loan_id] = (student_id, book_id, due_date)
+                report['rows_scanned'] = len(found)
+                new = self._merge(found, full, report)
+                report['notification_batches'] = self._emit(new, until)
+                self.high_water_mark = until
+                self.last_error = None
+            except Exception as e:
+                report['error'] = self.last_error = str(e)
+                raise
+            finally:
+                self.runs += 1
+                report['duration_ms'] = round((time.perf_counter() - start) * 1000, 2)
+                self.history.append(report)
+            return report
+
+    def _merge(self, found, full, report):
+        with self._lock:
+            new = [(loan_id, loan) for loan_id, loan in found.items() if loan_id not in self._loans]
+            if full:
+                report['dropped'] = sum(1 for loan_id in self._loans if loan_id not in found)
+                self._loans = found
+                self._order = sorted((loan[2], loan_id) for loan_id, loan in found.items())
+            else:
+                for loan_id, loan in new:
+                    self._loans[loan_id] = loan
+                    bisect.insort(self._order, (loan[2], loan_id))
+        report['new_overdue'] = len(new)
+        return new
+
+    def _emit(self, new, today):
+        emitted = 0
+        for start in range(0, len(new), self.notification_batch_size):
+            self.batches += 1
+            batch = {
+                'batch': self.batches,
+                'run': self.runs + 1,
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'records': [{'loan_id': loan_id, 'student_id': student_id, 'book_id': book_id,
+                             'due_date': due_date.isoformat(), 'days_overdue': (today - due_date).days}
+                            for loan_id, (student_id, book_id, due_date)
+                            in new[start:start + self.notification_batch_size]]
+            }
+            self.outbox.append(batch)
+            if self.notify is not None:
+                try:
+                    self.notify(batch)
+                except Exception as e:
+                    logger.warning("Overdue notification batch %s not delivered: %s", batch['batch'], e)
+            emitted += 1
+        return emitted
+
+    def discard(self, loan_id):
+        """Forget a loan that was returned (this process's /books/return)"""
+        with self._lock:
+            loan = self._loans.pop(loan_id, None)
+            if loan is not None:
+                index = bisect.bisect_left(self._order, (loan[2], loan_id))
+                del self._order[index]
+
+    def page(self, after=None, limit=100):
+        """Overdue loans, oldest due date first, after the (due date, loan id) keyset: (items, next_after)"""
+        with self._lock:
+            start = bisect.bisect_right(self._order, tuple(after)) if after else 0
+            keys = self._order[start:start + limit]
+            has_more = start + limit < len(self._order)
+            items = [(loan_id, *self._loans[loan_id]) for _, loan_id in keys]
+        return items, (keys[-1] if keys and has_more else None)
+
+    def notifications(self, after=0):
+        """Notification batches still in the outbox, with a batch number above after"""
+        return [batch for batch in list(self.outbox) if batch['batch'] > after]
+
+    def stats(self):
+        with self._lock:
+            overdue = len(self._loans)
+        return {'overdue': overdue, 'runs': self.runs, 'notification_batches': self.batches,
+                'high_water_mark': self.high_water_mark.isoformat() if self.high_water_mark else None,
+                'last_run': self.history[-1] if self.history else None, 'last_error': self.last_error}
@@ -0,0 +1,180 @@
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# A last known good answer served in place of a fresh one (stored_at: epoch seconds)
+Stale = namedtuple('Stale', ['value', 'stored_at'])
+
+
+def estimate_size(value):
+    """Rough memory footprint of a cached result, in bytes"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(estimate_size(v) for v in value)
+    return size
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at', 'size', 'tables')
+
+    def __init__(self, value, expires_at, size, tables):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.tables = tables
+
+
+class ResultCache:
+    """In-process read-through cache with LRU + TTL eviction and a memory cap.
+
+    Every entry records the tables it was read from; invalidate_tables()
+    drops all entries depending on a table a writer just modified.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=32 * 1024 * 1024, default_ttl=60, ttl=None, enabled=True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttl = ttl or {}
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._generations = {}
+        self._bytes = 0
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def _remove(self, key):
+        # Called with the lock held
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for table in entry.tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+        return entry
+
+    def get(self, key):
+        """(True, value) for a live entry, (False, None) otherwise"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return False, None
+            if entry.expires_at < time.monotonic():
+                self._remove(key)
+                self.counters['expirations'] += 1
+                self.counters['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return True, entry.value
+
+    def generations(self, tables):
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in tables)
+
+    def put(self, key, value, tables, template=None, generations=None):
+        """Store a result unless one of its tables was written since `generations`"""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        ttl = self.ttl.get(template, self.default_ttl)
+        with self._lock:
+            if generations is not None and generations != tuple(self._generations.get(t, 0) for t in tables):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, time.monotonic() + ttl, size, tuple(tables))
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.counters['evictions'] += 1
+
+    def get_or_load(self, key, tables, load, template=None):
+        """Cached value for key, or load() it and cache the result"""
+        if not self.enabled:
+            return load()
+        found, value = self.get(key)
+        if found:
+            return value
+        # A write landing while load() runs makes the result stale: don't keep it
+        generations = self.generations(tables)
+        value = load()
+        self.put(key, value, tables, template, generations)
+        return value
+
+    def invalidate_tables(self, *tables):
+        """Drop every entry that reads one of the tables"""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._by_table.get(table, ())):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return dict(
+                self.counters,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hit_rate=round(self.counters['hits'] / lookups, 4) if lookups else None,
+                miss_rate=round(self.counters['misses'] / lookups, 4) if lookups else None
+            )
+
+
+class LastKnownGood:
+    """Last successful answer per key, kept after the cache would drop it.
+
+    Served only while the database it came from is unreachable, with the
+    time it was read, so callers can say how old it is.
+    """
+
+    def __init__(self, enabled=True, max_entries=50000, max_age=3600):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.counters = {'stored': 0, 'served': 0, 'missing': 0}
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            self.counters['stored'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """(True, value, stored_at) for a remembered answer not older than max_age"""
+        if not self.enabled:
+            return False, None, None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.max_age and time.time() - entry[1] > self.max_age):
+                self.counters['missing'] += 1
+                return False, None, None
+            self.counters['served'] += 1
+            return True, entry[0], entry[1]
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), max_entries=self.max_entries)
@@ -0,0 +1,262 @@
+import heapq
+import os
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+
+def normalize(text):
+    """Lowercase, accent-free form used for indexing and matching ('Hélène' -> 'helene')"""
+    decomposed = unicodedata.normalize('NFKD', str(text or ''))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def word_trigrams(word):
+    """Trigrams of a word padded like pg_trgm: two spaces before, one after"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def inner_trigrams(word):
+    """Trigrams a word contains wherever it appears inside a longer one"""
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class StudentSearchIndex:
+    """Trigram and word-prefix index over student names (nom and prenom).
+
+    Substring queries intersect the posting lists of the query's trigrams
+    (words shorter than three letters use the prefix lists) and verify the
+    few candidates left; when that finds fewer than `limit` students,
+    trigram similarity adds fuzzy matches for misspelt names.
+    """
+
+    PREFIX_LENGTH = 2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}       # id -> (nom, prenom, ' normalized words ', trigram count)
+        self._trigrams = {}   # trigram -> set of ids
+        self._prefixes = {}   # first letters of a word -> set of ids
+        self.loaded_max_id = None  # highest id read from the database: add() leaves it alone
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _unindex(self, student_id):
+        nom, prenom, text, _ = self._docs.pop(student_id)
+        for word in text.split():
+            for gram in word_trigrams(word):
+                self._trigrams.get(gram, set()).discard(student_id)
+            for k in range(1, self.PREFIX_LENGTH + 1):
+                self._prefixes.get(word[:k], set()).discard(student_id)
+
+    def add(self, student_id, nom, prenom):
+        """Index a student, replacing the previous names of the same id"""
+        text = normalize(f'{nom or ""} {prenom or ""}').strip()
+        grams = set()
+        with self._lock:
+            if student_id in self._docs:
+                self._unindex(student_id)
+            for word in text.split():
+                word_grams = word_trigrams(word)
+                grams |= word_grams
+                for gram in word_grams:
+                    self._trigrams.setdefault(gram, set()).add(student_id)
+                for k in range(1, self.PREFIX_LENGTH + 1):
+                    self._prefixes.setdefault(word[:k], set()).add(student_id)
+            self._docs[student_id] = (nom, prenom, f' {text} ', len(grams))
+
+    def load(self, students):
+        """Index (id_etudiant, nom, prenom) rows read from the database, advancing loaded_max_id"""
+        added = 0
+        for student_id, nom, prenom in students:
+            self.add(student_id, nom, prenom)
+            if self.loaded_max_id is None or student_id > self.loaded_max_id:
+                self.loaded_max_id = student_id
+            added += 1
+        return added
+
+    def _word_candidates(self, word):
+        if len(word) <= self.PREFIX_LENGTH:
+            return self._prefixes.get(word, set())
+        postings = sorted((self._trigrams.get(gram, set()) for gram in inner_trigrams(word)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        return candidates
+
+    def _similarity(self, query_grams, student_id, shared):
+        gram_count = self._docs[student_id][3]
+        return shared / (len(query_grams) + gram_count - shared)
+
+    def search(self, query, limit=10, min_similarity=0.3):
+        """Best matches as [{'id_etudiant', 'nom', 'prenom', 'score'}], exact substrings first"""
+        words = normalize(query).split()
+        if not words:
+            return []
+        query_grams = set().union(*(word_trigrams(word) for word in words))
+
+        # Exact word, word prefix, anywhere: ' dupont ', ' dup', 'pon' against ' dupont jean '
+        patterns = [(f' {word} ', f' {word}', word) for word in words]
+        query_length = sum(len(word) for word in words)
+
+        with self._lock:
+            candidates = None
+            for word in sorted(words, key=len, reverse=True):
+                found = self._word_candidates(word)
+                candidates = found if candidates is None else candidates & found
+                if not candidates:
+                    break
+
+            def substring_matches():
+                for student_id in candidates or ():
+                    text = self._docs[student_id][2]
+                    score = 0.0
+                    for exact, prefix, word in patterns:
+                        if exact in text:
+                            score += 3.0
+                        elif prefix in text:
+                            score += 2.5
+                        elif word in text:
+                            score += 2.0
+                        else:
+                            break
+                    else:
+                        # Shorter names cover more of the query: rank them first
+                        yield score / len(patterns) + query_length / len(text), student_id
+
+            best = heapq.nlargest(limit, substring_matches())
+
+            if len(best) < limit and min_similarity:
+                # Fuzzy: students sharing enough trigrams with the query, e.g. 'dupond' for 'dupont'
+                found = {student_id for _, student_id in best}
+                counts = Counter()
+                for gram in query_grams:
+                    counts.update(self._trigrams.get(gram, ()))
+                fuzzy = ((self._similarity(query_grams, student_id, shared), student_id)
+                         for student_id, shared in counts.items() if student_id not in found)
+                best += heapq.nlargest(limit - len(best), (match for match in fuzzy if match[0] >= min_similarity))
+
+            return [{'id_etudiant': student_id,
+                     'nom': self._docs[student_id][0],
+                     'prenom': self._docs[student_id][1],
+                     'score': round(score, 3)} for score, student_id in best]
+
+
+class StudentSearch:
+    """One StudentSearchIndex per indexed database, kept current in the background.
+
+    load_names(db_name, after_id) yields (id_etudiant, nom, prenom) for the
+    students with an id above after_id (all of them when None). start()
+    runs a background thread that builds each index, then adds new
+    students every refresh_interval seconds and rebuilds everything every
+    full_reload_interval seconds to pick up renamed or deleted students.
+    add() does not move the high-water mark of the delta loads, and is
+    replayed on an index being rebuilt. Until an index is ready, search()
+    returns None and callers query the database instead.
+    """
+
+    def __init__(self, load_names, databases=('oracle',), refresh_interval=60,
+                 full_reload_interval=3600, min_similarity=0.3):
+        self.load_names = load_names
+        self.databases = tuple(databases)
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.min_similarity = min_similarity
+        self._indexes = {}
+        self._loaded_at = {}
+        self._pending = {}    # db_name -> students added while its index is being rebuilt
+        self._full_requested = False
+        self._wake = threading.Event()
+        self._refresher_pid = None
+        self._lock = threading.Lock()
+        self.last_error = None
+        self.counters = {'searches': 0, 'fallbacks': 0, 'full_loads': 0, 'delta_loads': 0, 'added': 0}
+
+    def _build(self, db_name):
+        with self._lock:
+            self._pending[db_name] = []
+        index = StudentSearchIndex()
+        try:
+            index.load(self.load_names(db_name, None))
+        except Exception:
+            with self._lock:
+                del self._pending[db_name]
+            raise
+        with self._lock:
+            # Replayed on the new index: its rows may have been read before these inserts
+            for args in self._pending.pop(db_name):
+                index.add(*args)
+            # Swap in one assignment: searches never see a half-built index
+            self._indexes[db_name] = index
+        self._loaded_at[db_name] = time.monotonic()
+        self.counters['full_loads'] += 1
+
+    def _refresh(self, db_name):
+        index = self._indexes[db_name]
+        added = index.load(self.load_names(db_name, index.loaded_max_id))
+        self.counters['delta_loads'] += 1
+        self.counters['added'] += added
+
+    def refresh_all(self):
+        """Build missing, expired or requested indexes and load new students into the others"""
+        full, self._full_requested = self._full_requested, False
+        for db_name in self.databases:
+            try:
+                loaded_at = self._loaded_at.get(db_name)
+                if full or loaded_at is None or time.monotonic() - loaded_at >= self.full_reload_interval:
+                    self._build(db_name)
+                else:
+                    self._refresh(db_name)
+            except Exception as e:
+                self.last_error = f'{db_name}: {e}'
+
+    def start(self):
+        """Start the loading thread once per process (again in a forked child)"""
+        if self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+            # Indexes built by the parent are fine to keep after a fork
+            self._wake = threading.Event()
+        threading.Thread(target=self._refresh_forever, name='student-search-index', daemon=True).start()
+
+    def _refresh_forever(self):
+        pid = os.getpid()
+        while self._refresher_pid == pid:
+            self.refresh_all()
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+    def request_refresh(self):
+        """Rebuild now rather than at the next interval: a bulk insert may add ids below the loaded ones"""
+        self._full_requested = True
+        self._wake.set()
+
+    def add(self, db_name, student_id, nom, prenom):
+        with self._lock:
+            if db_name in self._pending:
+                self._pending[db_name].append((student_id, nom, prenom))
+            index = self._indexes.get(db_name)
+        if index is not None:
+            index.add(student_id, nom, prenom)
+
+    def search(self, db_name, query, limit=10):
+        """Ranked matches, or None when the database is not indexed (yet)"""
+        self.start()
+        index = self._indexes.get(db_name)
+        if index is None:
+            self.counters['fallbacks'] += 1
+            return None
+        self.counters['searches'] += 1
+        return index.search(query, limit, self.min_similarity)
+
+    def stats(self):
+        return dict(self.counters, indexes={name: len(index) for name, index in self._indexes.items()},
+                    last_error=self.last_error)
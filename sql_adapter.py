@@ -1,9 +1,338 @@
+import threading
+
+# Parameterized statements used by the portal, bound with ? placeholders.
+# 'sql' is either one text for every SGBD or a dict of per-SGBD texts with
+# a 'default' entry. Templates are compiled once per SGBD by SQLAdapter.
+# 'tables' lists the tables a statement reads or writes (cache invalidation).
+STATEMENTS = {
+    # Students (Oracle)
+    'student_enrollment': {
+        'tables': ('etudiants',),
+        'sql': {
+            'ORACLE': "SELECT id_etudiant, nom, prenom, statut FROM etudiants WHERE id_etudiant = ? AND ROWNUM <= 1",
+            'default': "SELECT id_etudiant, nom, prenom, statut FROM etudiants WHERE id_etudiant = ? LIMIT 1"
+        }
+    },
+    'student_details': {
+        'tables': ('etudiants',),
+        'sql': "SELECT * FROM etudiants WHERE id_etudiant = ?"
+    },
+    'student_grades': {
+        'tables': ('notes',),
+        'sql': "SELECT matiere, note, date_evaluation FROM notes WHERE id_etudiant = ?"
+    },
+    'students_by_name': {
+        'tables': ('etudiants',),
+        'sql': {
+            'ORACLE': "SELECT id_etudiant, nom, prenom FROM etudiants WHERE UPPER(nom) LIKE UPPER(?) AND ROWNUM <= 10",
+            'default': "SELECT id_etudiant, nom, prenom FROM etudiants WHERE UPPER(nom) LIKE UPPER(?) LIMIT 10"
+        }
+    },
+    'enrollment_count': {
+        'tables': ('etudiants',),
+        'sql': "SELECT COUNT(*) as total FROM etudiants WHERE statut = 'INSCRIT'"
+    },
+    'student_profile': {
+        'tables': ('etudiants',),
+        'sql': "SELECT id_etudiant, nom, prenom, email, telephone, adresse FROM etudiants WHERE id_etudiant = ?"
+    },
+    'tuition_payment': {
+        'tables': ('paiements',),
+        'sql': "SELECT COUNT(*) as frais_payes FROM paiements "
+               "WHERE id_etudiant = ? AND type_paiement = 'SCOLARITE' AND statut = 'PAYE'"
+    },
+    'insert_payment': {
+        'tables': ('paiements',),
+        'sql': "INSERT INTO paiements (id_etudiant, type_paiement, montant, date_paiement, statut) "
+               "VALUES (?, ?, ?, ?, ?)"
+    },
+    'insert_student': {
+        'tables': ('etudiants',),
+        'sql': "INSERT INTO etudiants (id_etudiant, nom, prenom, email, telephone, adresse, statut) "
+               "VALUES (?, ?, ?, ?, ?, ?, 'INSCRIT')"
+    },
+    # Grades (MySQL)
+    'student_gpa': {
+        'tables': ('notes',),
+        'sql': "SELECT AVG(note) as moyenne_generale FROM notes WHERE id_etudiant = ?"
+    },
+    'credits_validation': {
+        'tables': ('notes', 'matieres'),
+        'sql': "SELECT SUM(credits) as total_credits FROM notes n JOIN matieres m ON n.id_matiere = m.id_matiere "
+               "WHERE n.id_etudiant = ? AND n.note >= 10"
+    },
+    'subject_credits': {
+        'tables': ('matieres',),
+        'sql': "SELECT credits FROM matieres WHERE id_matiere = ?"
+    },
+    'insert_grade': {
+        'tables': ('notes',),
+        'sql': "INSERT INTO notes (id_etudiant, id_matiere, note, date_evaluation) VALUES (?, ?, ?, ?)"
+    },
+    # Library (PostgreSQL)
+    'borrowed_books_count': {
+        'tables': ('emprunts',),
+        'sql': "SELECT COUNT(*) as livres_empruntes FROM emprunts WHERE id_etudiant = ? AND date_retour IS NULL"
+    },
+    'overdue_books': {
+        'tables': ('emprunts',),
+        'sql': "SELECT COUNT(*) as livres_en_retard FROM emprunts "
+               "WHERE id_etudiant = ? AND date_retour IS NULL AND date_retour_prevue < CURRENT_DATE"
+    },
+    'available_books': {
+        'tables': ('livres',),
+        'sql': "SELECT id_livre, titre, auteur, categorie FROM livres WHERE disponible = true ORDER BY titre"
+    },
+    'book_availability': {
+        'tables': ('livres',),
+        'sql': "SELECT disponible FROM livres WHERE id_livre = ?"
+    },
+    'borrow_book': {
+        'tables': ('emprunts',),
+        'sql': {
+            'ORACLE': "INSERT INTO emprunts (id_etudiant, id_livre, date_emprunt, date_retour_prevue) "
+                      "VALUES (?, ?, CURRENT_DATE, CURRENT_DATE + 30)",
+            'MYSQL': "INSERT INTO emprunts (id_etudiant, id_livre, date_emprunt, date_retour_prevue) "
+                     "VALUES (?, ?, CURRENT_DATE, CURRENT_DATE + INTERVAL 30 DAY)",
+            'default': "INSERT INTO emprunts (id_etudiant, id_livre, date_emprunt, date_retour_prevue) "
+                       "VALUES (?, ?, CURRENT_DATE, CURRENT_DATE + INTERVAL '30 days')"
+        }
+    },
+    'create_loan': {
+        'tables': ('emprunts',),
+        'sql': "INSERT INTO emprunts (id_etudiant, id_livre, date_emprunt, date_retour_prevue) VALUES (?, ?, ?, ?)"
+    },
+    'update_book_availability': {
+        'tables': ('livres',),
+        'sql': "UPDATE livres SET disponible = ? WHERE id_livre = ?"
+    },
+    'claim_book': {
+        'tables': ('livres',),
+        'sql': "UPDATE livres SET disponible = false WHERE id_livre = ? AND disponible = true"
+    },
+    'student_current_loans': {
+        'tables': ('emprunts', 'livres'),
+        'sql': "SELECT e.id_emprunt, l.titre, l.auteur, e.date_emprunt, e.date_retour_prevue "
+               "FROM emprunts e JOIN livres l ON e.id_livre = l.id_livre "
+               "WHERE e.id_etudiant = ? AND e.date_retour IS NULL ORDER BY e.date_emprunt DESC"
+    },
+    'loan_book': {
+        'tables': ('emprunts',),
+        'sql': "SELECT id_livre, id_etudiant FROM emprunts WHERE id_emprunt = ?"
+    },
+    'return_book': {
+        'tables': ('emprunts',),
+        'sql': "UPDATE emprunts SET date_retour = CURRENT_DATE WHERE id_emprunt = ?"
+    },
+    'close_loan': {
+        'tables': ('emprunts',),
+        'sql': "UPDATE emprunts SET date_retour = CURRENT_DATE WHERE id_emprunt = ? AND date_retour IS NULL"
+    },
+    'insert_book': {
+        'tables': ('livres',),
+        'sql': "INSERT INTO livres (id_livre, titre, auteur, categorie, disponible) VALUES (?, ?, ?, ?, true)"
+    }
+}
+
+# Tables read by the dynamic (paginated and batch) query builders
+QUERY_TABLES = {
+    'students_page': ('etudiants',),
+    'all_books_page': ('livres',),
+    'available_books_page': ('livres',),
+    'all_loans_page': ('emprunts', 'livres'),
+    'student_loans_page': ('emprunts', 'livres'),
+    'student_profiles_batch': ('etudiants',),
+    'students_gpa_batch': ('notes',),
+    'borrowed_books_count_batch': ('emprunts',),
+    'tuition_paid_batch': ('paiements',),
+    'total_credits_batch': ('notes', 'matieres'),
+    'open_loans_batch': ('emprunts',),
+    'borrow_books': ('livres', 'emprunts'),
+    'return_loan': ('emprunts', 'livres'),
+    'overdue_scan': ('emprunts',)
+}
+
+SGBD_TYPES = ('ORACLE', 'MYSQL', 'POSTGRESQL')
+
+
+class Statement:
+    """One template compiled for one SGBD, with execution counters"""
+
+    def __init__(self, name, sgbd_type, sql, tables=()):
+        self.name = name
+        self.sgbd_type = sgbd_type
+        self.sql = sql
+        self.tables = tables
+        self.executions = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            self.executions += 1
+            if hit:
+                self.hits += 1
+
+    def stats(self):
+        return {'executions': self.executions, 'hits': self.hits}
+
+
+def row_limit_clause(sgbd_type, limit=None, offset=None):
+    """Row limit and offset placed after ORDER BY: OFFSET / FETCH FIRST on Oracle (12c+), LIMIT / OFFSET elsewhere"""
+    if sgbd_type.upper() == 'ORACLE':
+        parts = [f"OFFSET {int(offset)} ROWS" if offset else '',
+                 f"FETCH {'NEXT' if offset else 'FIRST'} {int(limit)} ROWS ONLY" if limit is not None else '']
+        return ' '.join(part for part in parts if part)
+    if sgbd_type.upper() == 'MYSQL' and offset and limit is None:
+        # MySQL has no OFFSET without LIMIT: the largest row count stands for "all"
+        limit = 18446744073709551615
+    parts = [f"LIMIT {int(limit)}" if limit is not None else '', f"OFFSET {int(offset)}" if offset else '']
+    return ' '.join(part for part in parts if part)
+
+
+class Query:
+    """SELECT assembled from parts, rendered per SGBD as (sql, params) with ? placeholders.
+
+    Query("SELECT id_livre, titre FROM livres").where("disponible = true")
+        .after(("titre", "id_livre"), ("Dune", 12)).order_by("titre", "id_livre").limit(20).offset(40)
+
+    Predicates are ANDed in the order given and their values bound; GROUP BY
+    goes between WHERE and ORDER BY; the row limit and offset go after ORDER
+    BY in the SGBD's own syntax, so they compose with any WHERE (unlike an
+    appended ROWNUM filter).
+    """
+
+    def __init__(self, select, *params):
+        self.select = select
+        self.select_params = list(params)
+        self.conditions = []
+        self.condition_params = []
+        self.grouping = []
+        self.ordering = []
+        self.row_limit = None
+        self.row_offset = None
+
+    def where(self, condition, *params):
+        self.conditions.append(condition)
+        self.condition_params.extend(params)
+        return self
+
+    def where_in(self, column, values):
+        return self.where(f"{column} IN ({', '.join(['?'] * len(values))})", *values)
+
+    def after(self, columns, values, descending=False):
+        """Rows past the keyset cursor `values` of the sort columns, spelled out
+        as OR / AND comparisons (Oracle has no row value comparison)"""
+        operator = '<' if descending else '>'
+        alternatives, params = [], []
+        for i, column in enumerate(columns):
+            terms = [f"{previous} = ?" for previous in columns[:i]] + [f"{column} {operator} ?"]
+            alternatives.append(' AND '.join(terms) if i == 0 else f"({' AND '.join(terms)})")
+            params.extend(values[:i + 1])
+        condition = alternatives[0] if len(alternatives) == 1 else f"({' OR '.join(alternatives)})"
+        return self.where(condition, *params)
+
+    def group_by(self, *columns):
+        self.grouping.extend(columns)
+        return self
+
+    def order_by(self, *columns):
+        self.ordering.extend(columns)
+        return self
+
+    def limit(self, limit):
+        self.row_limit = limit
+        return self
+
+    def offset(self, offset):
+        self.row_offset = offset
+        return self
+
+    def build(self, sgbd_type):
+        parts = [self.select]
+        if self.conditions:
+            parts.append(f"WHERE {' AND '.join(self.conditions)}")
+        if self.grouping:
+            parts.append(f"GROUP BY {', '.join(self.grouping)}")
+        if self.ordering:
+            parts.append(f"ORDER BY {', '.join(self.ordering)}")
+        parts.append(row_limit_clause(sgbd_type, self.row_limit, self.row_offset))
+        return ' '.join(part for part in parts if part), self.select_params + self.condition_params
+
+
 class SQLAdapter:
-    def get_limit_clause(self, sgbd_type, limit):
+    # Maximum number of values sent in a single IN (...) list
+    IN_LIST_LIMITS = {
+        'ORACLE': 1000,       # ORA-01795 above 1000 expressions
+        'MYSQL': 5000,        # bounded by max_allowed_packet only
+        'POSTGRESQL': 5000    # bounded by the 32767 bind parameters of psqlODBC
+    }
+
+    # Maximum number of bind parameters in a single statement
+    BIND_PARAMETER_LIMITS = {
+        'ORACLE': 65535,
+        'MYSQL': 65535,
+        'POSTGRESQL': 32767
+    }
+
+    # Rows per multi-row INSERT ... VALUES statement, before the bind limit applies
+    MULTIROW_INSERT_ROWS = 1000
+
+    def __init__(self, statements=STATEMENTS):
+        # Compile every template once, for every SGBD
+        self.statements = {}
+        for name, template in statements.items():
+            for sgbd_type in SGBD_TYPES:
+                sql = template['sql']
+                if isinstance(sql, dict):
+                    sql = sql.get(sgbd_type, sql['default'])
+                self.statements[(name, sgbd_type)] = Statement(name, sgbd_type, sql, template.get('tables', ()))
+
+    def statement(self, name, sgbd_type):
+        """Compiled statement for a template name, e.g. statement('student_profile', 'ORACLE')"""
+        return self.statements[(name, sgbd_type.upper())]
+
+    def execute(self, conn, name, sgbd_type, params=()):
+        """Execute a registered statement with bound parameters and return the cursor.
+
+        Pooled connections keep one cursor per statement, so re-running a
+        template on the same connection reuses the driver's prepared plan.
+        """
+        statement = self.statement(name, sgbd_type)
+        if hasattr(conn, 'statement_cursor'):
+            cursor, hit = conn.statement_cursor(statement.sql)
+        else:
+            cursor, hit = conn.cursor(), False
+        if hasattr(conn, 'trace'):
+            # Instrumented connection: label the cursor's timings with the template
+            cursor = conn.trace(cursor, name)
+        cursor.execute(statement.sql, list(params))
+        statement.record(hit)
+        return cursor
+
+    def tables(self, name):
+        """Tables a registered statement or query builder depends on"""
+        if name in QUERY_TABLES:
+            return QUERY_TABLES[name]
+        return self.statements[(name, SGBD_TYPES[0])].tables
+
+    def statement_stats(self):
+        """{template: {sgbd_type: {'executions': n, 'hits': n}}} for executed statements"""
+        stats = {}
+        for (name, sgbd_type), statement in self.statements.items():
+            if statement.executions:
+                stats.setdefault(name, {})[sgbd_type] = statement.stats()
+        return stats
+
+    def get_limit_clause(self, sgbd_type, limit, offset=None):
+        """Trailing row limit, valid after any WHERE / ORDER BY (see Query for whole statements)"""
+        return row_limit_clause(sgbd_type, limit, offset)
+
+    def get_validation_query(self, sgbd_type):
+        """Cheap query used to check a pooled connection is still alive"""
         if sgbd_type.upper() == 'ORACLE':
-            return f"WHERE ROWNUM <= {limit}"
-        elif sgbd_type.upper() in ['MYSQL', 'POSTGRESQL']:
-            return f"LIMIT {limit}"
+            return "SELECT 1 FROM DUAL"
+        return "SELECT 1"
 
     def get_isnull_function(self, sgbd_type, column, default):
         if sgbd_type.upper() == 'ORACLE':
@@ -13,78 +342,178 @@ class SQLAdapter:
         elif sgbd_type.upper() == 'POSTGRESQL':
             return f"COALESCE({column}, {default})"
 
-    def get_student_enrollment_query(self, sgbd_type, student_id):
-        """Check if student is enrolled"""
-        limit_clause = self.get_limit_clause(sgbd_type, 1)
-        return f"SELECT id_etudiant, nom, prenom, statut FROM etudiants WHERE id_etudiant = {student_id} {limit_clause}"
+    def chunk_ids(self, sgbd_type, ids):
+        """Split ids into lists small enough for one IN (...) list"""
+        size = self.IN_LIST_LIMITS.get(sgbd_type.upper(), 1000)
+        ids = list(ids)
+        return [ids[i:i + size] for i in range(0, len(ids), size)]
 
-    def get_student_details_query(self, sgbd_type, student_id):
-        """Get complete student details"""
-        return f"SELECT * FROM etudiants WHERE id_etudiant = {student_id}"
+    def get_in_placeholders(self, count):
+        return ', '.join(['?'] * count)
 
-    def get_student_grades_query(self, sgbd_type, student_id):
-        """Get student grades (assuming grades table exists)"""
-        return f"SELECT matiere, note, date_evaluation FROM notes WHERE id_etudiant = {student_id}"
+    def get_student_profiles_batch_queries(self, sgbd_type, student_ids):
+        """Profiles of many students, one (query, params) per IN chunk (Oracle)"""
+        return [
+            (f"SELECT id_etudiant, nom, prenom, email, telephone, adresse FROM etudiants "
+             f"WHERE id_etudiant IN ({self.get_in_placeholders(len(chunk))})", chunk)
+            for chunk in self.chunk_ids(sgbd_type, student_ids)
+        ]
 
-    def get_students_by_name_query(self, sgbd_type, name):
-        """Search students by name"""
-        limit_clause = self.get_limit_clause(sgbd_type, 10)
-        return f"SELECT id_etudiant, nom, prenom FROM etudiants WHERE UPPER(nom) LIKE UPPER('%{name}%') {limit_clause}"
+    def get_students_gpa_batch_queries(self, sgbd_type, student_ids):
+        """Grade average of many students, one (query, params) per IN chunk (MySQL)"""
+        return [
+            (f"SELECT id_etudiant, AVG(note) as moyenne_generale FROM notes "
+             f"WHERE id_etudiant IN ({self.get_in_placeholders(len(chunk))}) GROUP BY id_etudiant", chunk)
+            for chunk in self.chunk_ids(sgbd_type, student_ids)
+        ]
 
-    def get_enrollment_count_query(self, sgbd_type):
-        """Get total number of enrolled students"""
-        if sgbd_type.upper() == 'ORACLE':
-            return "SELECT COUNT(*) as total FROM etudiants WHERE statut = 'INSCRIT'"
-        elif sgbd_type.upper() in ['MYSQL', 'POSTGRESQL']:
-            return "SELECT COUNT(*) as total FROM etudiants WHERE statut = 'INSCRIT'"
-
-    def get_student_profile_query(self, sgbd_type, student_id):
-        """Get student personal information (Oracle)"""
-        return f"SELECT id_etudiant, nom, prenom, email, telephone, adresse FROM etudiants WHERE id_etudiant = {student_id}"
-
-    def get_student_gpa_query(self, sgbd_type, student_id):
-        """Get student GPA from grades (MySQL)"""
-        if sgbd_type.upper() == 'MYSQL':
-            return f"SELECT AVG(note) as moyenne_generale FROM notes WHERE id_etudiant = {student_id}"
-        else:
-            # For other databases, return a compatible query (though ideally this would be MySQL specific)
-            return f"SELECT AVG(note) as moyenne_generale FROM notes WHERE id_etudiant = {student_id}"
+    def get_borrowed_books_count_batch_queries(self, sgbd_type, student_ids):
+        """Current loans of many students, one (query, params) per IN chunk (PostgreSQL)"""
+        return [
+            (f"SELECT id_etudiant, COUNT(*) as livres_empruntes FROM emprunts "
+             f"WHERE id_etudiant IN ({self.get_in_placeholders(len(chunk))}) AND date_retour IS NULL "
+             f"GROUP BY id_etudiant", chunk)
+            for chunk in self.chunk_ids(sgbd_type, student_ids)
+        ]
 
-    def get_borrowed_books_count_query(self, sgbd_type, student_id):
-        """Get count of currently borrowed books (PostgreSQL)"""
-        return f"SELECT COUNT(*) as livres_empruntes FROM emprunts WHERE id_etudiant = {student_id} AND date_retour IS NULL"
+    def get_tuition_paid_batch_queries(self, sgbd_type, student_ids):
+        """Students among student_ids whose tuition is paid, one (query, params) per IN chunk (Oracle)"""
+        return [
+            (f"SELECT DISTINCT id_etudiant FROM paiements "
+             f"WHERE id_etudiant IN ({self.get_in_placeholders(len(chunk))}) "
+             f"AND type_paiement = 'SCOLARITE' AND statut = 'PAYE'", chunk)
+            for chunk in self.chunk_ids(sgbd_type, student_ids)
+        ]
 
-    def get_tuition_payment_query(self, sgbd_type, student_id):
-        """Check if student has paid tuition fees (Oracle)"""
-        return f"SELECT COUNT(*) as frais_payes FROM paiements WHERE id_etudiant = {student_id} AND type_paiement = 'SCOLARITE' AND statut = 'PAYE'"
+    def get_total_credits_batch_queries(self, sgbd_type, student_ids):
+        """Credits of passed subjects of many students, one (query, params) per IN chunk (MySQL)"""
+        return [
+            (f"SELECT n.id_etudiant, SUM(m.credits) as total_credits FROM notes n "
+             f"JOIN matieres m ON n.id_matiere = m.id_matiere "
+             f"WHERE n.id_etudiant IN ({self.get_in_placeholders(len(chunk))}) AND n.note >= 10 "
+             f"GROUP BY n.id_etudiant", chunk)
+            for chunk in self.chunk_ids(sgbd_type, student_ids)
+        ]
 
-    def get_credits_validation_query(self, sgbd_type, student_id):
-        """Check if student has enough credits (MySQL)"""
-        if sgbd_type.upper() == 'MYSQL':
-            return f"SELECT SUM(credits) as total_credits FROM notes n JOIN matieres m ON n.id_matiere = m.id_matiere WHERE n.id_etudiant = {student_id} AND n.note >= 10"
-        else:
-            return f"SELECT SUM(credits) as total_credits FROM notes n JOIN matieres m ON n.id_matiere = m.id_matiere WHERE n.id_etudiant = {student_id} AND n.note >= 10"
+    def get_open_loans_batch_queries(self, sgbd_type, student_ids):
+        """Book and due date of the open loans of many students, one (query, params) per IN chunk (PostgreSQL)"""
+        return [
+            (f"SELECT id_etudiant, id_livre, date_retour_prevue FROM emprunts "
+             f"WHERE id_etudiant IN ({self.get_in_placeholders(len(chunk))}) AND date_retour IS NULL", chunk)
+            for chunk in self.chunk_ids(sgbd_type, student_ids)
+        ]
+
+    def get_borrow_books_query(self, sgbd_type, student_id, book_ids):
+        """Claim the available books and record their loans in one statement, or None
+        where data-modifying CTEs are not supported (claim_book then borrow_book per book).
+
+        Returns one (id_emprunt, id_livre, date_retour_prevue) row per book that
+        was available; a book lent by a concurrent transaction is left out.
+        """
+        if sgbd_type.upper() != 'POSTGRESQL':
+            return None
+        query = ("WITH claimed AS ("
+                 f"UPDATE livres SET disponible = false WHERE id_livre IN ({self.get_in_placeholders(len(book_ids))}) "
+                 "AND disponible = true RETURNING id_livre) "
+                 "INSERT INTO emprunts (id_etudiant, id_livre, date_emprunt, date_retour_prevue) "
+                 "SELECT CAST(? AS INTEGER), id_livre, CURRENT_DATE, CURRENT_DATE + INTERVAL '30 days' FROM claimed "
+                 "RETURNING id_emprunt, id_livre, date_retour_prevue")
+        return query, list(book_ids) + [student_id]
+
+    def get_return_loan_query(self, sgbd_type, loan_id):
+        """Close an open loan and make its book available in one statement, or None
+        where data-modifying CTEs are not supported (close_loan, loan_book, update_book_availability).
+
+        Returns the (id_livre, id_etudiant) of the loan, no row when it is unknown or already returned.
+        """
+        if sgbd_type.upper() != 'POSTGRESQL':
+            return None
+        query = ("WITH returned AS ("
+                 "UPDATE emprunts SET date_retour = CURRENT_DATE WHERE id_emprunt = ? AND date_retour IS NULL "
+                 "RETURNING id_livre, id_etudiant), "
+                 "released AS (UPDATE livres SET disponible = true "
+                 "WHERE id_livre IN (SELECT id_livre FROM returned) RETURNING id_livre) "
+                 "SELECT id_livre, id_etudiant FROM returned")
+        return query, [loan_id]
+
+    def get_source_query(self, sgbd_type, table, columns, conditions=(), group_by=(), order_by=()):
+        """SELECT of one federated source: {name: expression} columns of table, with its
+        (condition, params) filters, GROUP BY and ORDER BY run by the SGBD"""
+        select = ', '.join(expression if expression == name else f"{expression} AS {name}"
+                           for name, expression in columns.items())
+        query = Query(f"SELECT {select} FROM {table}")
+        for condition, params in conditions:
+            query.where(condition, *params)
+        return query.group_by(*group_by).order_by(*order_by).build(sgbd_type)
+
+    def get_overdue_scan_query(self, sgbd_type, since=None, until=None, after=None, limit=None):
+        """Open loans due before until (and on or after since), by due date, after the
+        (date_retour_prevue, id_emprunt) keyset cursor (PostgreSQL)"""
+        query = (Query("SELECT id_emprunt, id_etudiant, id_livre, date_retour_prevue FROM emprunts")
+                 .where("date_retour IS NULL").where("date_retour_prevue < ?", until))
+        if since:
+            query.where("date_retour_prevue >= ?", since)
+        if after:
+            query.after(("date_retour_prevue", "id_emprunt"), after)
+        return query.order_by("date_retour_prevue", "id_emprunt").limit(limit).build(sgbd_type)
+
+    def get_student_names_query(self, sgbd_type, after_id=None):
+        """Names of every student, or of those with an id above after_id, for the search index"""
+        query = Query("SELECT id_etudiant, nom, prenom FROM etudiants")
+        if after_id is not None:
+            query.after(("id_etudiant",), (after_id,))
+        return query.order_by("id_etudiant").build(sgbd_type)
+
+    def get_multirow_insert_size(self, sgbd_type, column_count):
+        """Rows per multi-row INSERT that stay below the bind parameter limit"""
+        limit = self.BIND_PARAMETER_LIMITS.get(sgbd_type.upper(), 2000)
+        return max(1, min(self.MULTIROW_INSERT_ROWS, limit // column_count))
+
+    def get_bulk_insert_query(self, sgbd_type, table, columns, row_count):
+        """INSERT with row_count VALUES tuples (row_count=1 for executemany/array binding)"""
+        row = f"({self.get_in_placeholders(len(columns))})"
+        values = ', '.join([row] * row_count)
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES {values}"
+
+    def get_copy_query(self, sgbd_type, table, columns):
+        """COPY FROM STDIN in CSV format (PostgreSQL)"""
+        return f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
 
-    def get_overdue_books_query(self, sgbd_type, student_id):
-        """Check for overdue books (PostgreSQL)"""
-        return f"SELECT COUNT(*) as livres_en_retard FROM emprunts WHERE id_etudiant = {student_id} AND date_retour IS NULL AND date_retour_prevue < CURRENT_DATE"
+    def _page_query(self, query, keyset, after, limit, offset, descending=False):
+        """query ordered by the keyset columns, from after the cursor `after`, limit and offset applied"""
+        if after:
+            query.after(keyset, after, descending)
+        order = [f"{column} DESC" for column in keyset] if descending else keyset
+        return query.order_by(*order).limit(limit).offset(offset)
 
-    def get_available_books_query(self, sgbd_type):
-        """Get list of available books (PostgreSQL)"""
-        return "SELECT id_livre, titre, auteur, categorie FROM livres WHERE disponible = true ORDER BY titre"
+    def get_students_page_query(self, sgbd_type, after=None, limit=None, offset=None):
+        """Students ordered by id, starting after the (id_etudiant,) keyset cursor"""
+        return self._page_query(Query("SELECT * FROM etudiants"), ("id_etudiant",),
+                                after, limit, offset).build(sgbd_type)
 
-    def borrow_book_query(self, sgbd_type, student_id, book_id):
-        """Borrow a book - insert into loans table (PostgreSQL)"""
-        return f"INSERT INTO emprunts (id_etudiant, id_livre, date_emprunt, date_retour_prevue) VALUES ({student_id}, {book_id}, CURRENT_DATE, CURRENT_DATE + INTERVAL '30 days')"
+    def get_all_books_page_query(self, sgbd_type, after=None, limit=None, offset=None):
+        """All books ordered by id, starting after the (id_livre,) keyset cursor (PostgreSQL)"""
+        return self._page_query(Query("SELECT id_livre, titre, auteur, categorie, disponible FROM livres"),
+                                ("id_livre",), after, limit, offset).build(sgbd_type)
 
-    def update_book_availability_query(self, sgbd_type, book_id, available):
-        """Update book availability (PostgreSQL)"""
-        return f"UPDATE livres SET disponible = {available} WHERE id_livre = {book_id}"
+    def get_available_books_page_query(self, sgbd_type, after=None, limit=None, offset=None):
+        """Available books by title, starting after the (titre, id_livre) keyset cursor (PostgreSQL)"""
+        query = Query("SELECT id_livre, titre, auteur, categorie FROM livres").where("disponible = true")
+        return self._page_query(query, ("titre", "id_livre"), after, limit, offset).build(sgbd_type)
 
-    def get_student_current_loans_query(self, sgbd_type, student_id):
-        """Get student's current book loans (PostgreSQL)"""
-        return f"SELECT e.id_emprunt, l.titre, l.auteur, e.date_emprunt, e.date_retour_prevue FROM emprunts e JOIN livres l ON e.id_livre = l.id_livre WHERE e.id_etudiant = {student_id} AND e.date_retour IS NULL ORDER BY e.date_emprunt DESC"
+    def get_all_loans_page_query(self, sgbd_type, after=None, limit=None, offset=None):
+        """Loans, newest first, starting after the (date_emprunt, id_emprunt) keyset cursor (PostgreSQL)"""
+        query = Query("SELECT e.id_emprunt, e.id_etudiant, e.id_livre, l.titre, l.auteur, "
+                      "e.date_emprunt, e.date_retour_prevue, e.date_retour "
+                      "FROM emprunts e LEFT JOIN livres l ON e.id_livre = l.id_livre")
+        return self._page_query(query, ("e.date_emprunt", "e.id_emprunt"), after, limit, offset,
+                                descending=True).build(sgbd_type)
 
-    def return_book_query(self, sgbd_type, loan_id):
-        """Return a book - update loan with return date (PostgreSQL)"""
-        return f"UPDATE emprunts SET date_retour = CURRENT_DATE WHERE id_emprunt = {loan_id}"
\ No newline at end of file
+    def get_student_loans_page_query(self, sgbd_type, student_id, after=None, limit=None, offset=None):
+        """Open loans of a student, newest first, starting after the (date_emprunt, id_emprunt)
+        keyset cursor (PostgreSQL)"""
+        query = (Query("SELECT e.id_emprunt, l.titre, l.auteur, e.date_emprunt, e.date_retour_prevue "
+                       "FROM emprunts e JOIN livres l ON e.id_livre = l.id_livre")
+                 .where("e.id_etudiant = ?", student_id).where("e.date_retour IS NULL"))
+        return self._page_query(query, ("e.date_emprunt", "e.id_emprunt"), after, limit, offset,
+                                descending=True).build(sgbd_type)
@@ -0,0 +1,93 @@
+import base64
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'n': str(value)}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'n' in value:
+            return Decimal(value['n'])
+    return value
+
+
+def encode_cursor(values):
+    """Opaque pagination token holding the sort key of the last row sent"""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Sort key of the last row of the previous page, or raise ValueError"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return tuple(_decode_value(v) for v in values)
+
+
+def iter_rows(cursor, fetch_size):
+    """Rows of an executed cursor, read fetch_size at a time"""
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield row
+
+
+def json_array_stream(items, collection, dumps, head=None, tail=None):
+    """Yield {"...head, "<collection>": [items...], ...tail()} piece by piece.
+
+    tail is a callable so that values known only at the end (next cursor,
+    execution time) can be appended after the last item.
+    """
+    prefix = dumps(head or {})[:-1]
+    yield f'{prefix}{", " if head else ""}"{collection}": ['
+    first = True
+    for item in items:
+        yield ('' if first else ', ') + dumps(item)
+        first = False
+    suffix = dumps(tail() if tail else {})[1:]
+    yield ']' + (', ' + suffix if suffix != '}' else '}')
+
+
+def ndjson_stream(items, dumps, tail=None):
+    """Yield one JSON document per line, then the tail() object if any"""
+    for item in items:
+        yield dumps(item) + '\n'
+    extra = tail() if tail else None
+    if extra:
+        yield dumps(extra) + '\n'
+
+
+def csv_stream(items, columns, chunk_size=65536):
+    """Yield a header line and one CSV line per dict, grouped in ~chunk_size pieces"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for item in items:
+        writer.writerow([item.get(column) for column in columns])
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,68 @@
+import time
+
+from db_pool import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCursor:
+    def execute(self, sql):
+        pass
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+def make_pool(**settings):
+    raws = []
+
+    def connect():
+        raws.append(FakeConnection())
+        return raws[-1]
+
+    return ConnectionPool('test', connect, 'SELECT 1', **settings), raws
+
+
+def test_prune_closes_idle_connection_without_checkout():
+    pool, raws = make_pool(min_size=1, max_size=3, max_idle_time=300, max_lifetime=3600)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    # first sits at the bottom of the idle deque: checkouts keep taking second
+    first.last_used -= 301
+
+    pool.prune()
+
+    assert raws[0].closed and not raws[1].closed
+    assert pool.stats()['idle'] == 1
+    assert pool.counters['recycled'] == 1
+
+
+def test_prune_keeps_min_size_idle_but_recycles_past_lifetime():
+    pool, raws = make_pool(min_size=1, max_size=3, max_idle_time=300, max_lifetime=3600)
+    pool.fill()
+    conn = pool._idle[0]
+    conn.last_used -= 301
+    pool.prune()
+    assert not raws[0].closed
+
+    conn.created_at = time.monotonic() - 3601
+    pool.prune()
+    assert raws[0].closed
+    pool.fill()
+    assert pool.stats()['size'] == 1 and len(raws) == 2